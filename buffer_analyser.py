@@ -0,0 +1,75 @@
+"""
+Module supporting the reuse of output buffers. A function returning a
+list, set or dictionary allocates a new one every time it is called.
+Where the function just builds up its result and returns it, we also
+write a variant that clears and refills a collection owned by the
+caller, so callers in a loop can keep reusing the same allocation.
+"""
+
+import ast
+from typing import Optional
+from generator_analyser import contains_yield
+
+# Annotations of the collections we can refill
+BUFFER_ANNOTATIONS = { "List", "Dict", "Set" }
+
+# Calls that create an empty collection
+EMPTY_CONSTRUCTORS = { "list", "dict", "set" }
+
+def is_empty_collection(node) -> bool:
+    """
+    Is this expression a new, empty collection, such as [] or set()?
+    """
+    if isinstance(node, (ast.List, ast.Set)):
+        return not node.elts
+    elif isinstance(node, ast.Dict):
+        return not node.keys
+    elif isinstance(node, ast.Call):
+        return (isinstance(node.func, ast.Name) and node.func.id in EMPTY_CONSTRUCTORS and
+            not node.args and not node.keywords)
+    else:
+        return False
+
+def returns_collection(node) -> bool:
+    returns = node.returns
+    return (isinstance(returns, ast.Subscript) and isinstance(returns.value, ast.Name) and
+        returns.value.id in BUFFER_ANNOTATIONS)
+
+def output_buffer(node) -> Optional[str]:
+    """
+    Given a function, works out whether it can fill a buffer owned by
+    the caller instead of returning a new collection. That is the case
+    for functions that either:
+
+    1. just return a comprehension, for which we return ""
+    2. start by assigning an empty collection to a variable, only ever
+       add to it, and always return it. We return the name of the
+       variable.
+
+    Returns None if the function must allocate its own result.
+    """
+    if not returns_collection(node) or contains_yield(node):
+        return None
+    body = node.body
+    if (len(body) == 1 and isinstance(body[0], ast.Return) and
+            isinstance(body[0].value, (ast.ListComp, ast.SetComp, ast.DictComp))):
+        return ""
+
+    first = body[0]
+    last = body[-1]
+    if (len(body) < 2 or not isinstance(first, ast.Assign) or len(first.targets) != 1 or
+            not isinstance(first.targets[0], ast.Name) or not is_empty_collection(first.value) or
+            not isinstance(last, ast.Return) or not isinstance(last.value, ast.Name)):
+        return None
+    name = first.targets[0].id
+
+    for n in ast.walk(node):
+        if isinstance(n, ast.Return) and (not isinstance(n.value, ast.Name) or
+                n.value.id != name):
+            return None
+        if (isinstance(n, ast.Name) and n.id == name and not isinstance(n.ctx, ast.Load) and
+                n is not first.targets[0]):
+            return None
+        if isinstance(n, (ast.FunctionDef, ast.Lambda)) and n is not node:
+            return None
+    return name
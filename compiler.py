@@ -9,7 +9,8 @@ from rust_generator import RustGenerator
 from dependency_analyser import DependencyAnalyser
 from var_analyser import FunctionHeaderFinder
 
-def compile_to_rust(source, filename: str) -> bool:
+def compile_to_rust(source, filename: str, enum_dispatch: bool = False,
+        fast_reductions: bool = False, fused_multiply_add: bool = False) -> bool:
     """
     Compiles a Python source file, generating Rust source in
     stdout that does the same thing. Warnings and compiler errors are
@@ -20,6 +21,20 @@ def compile_to_rust(source, filename: str) -> bool:
     (see ast.parse).
     
     filename_in is only used for prettifying the error output.
+
+    If enum_dispatch is set, each trait whose implementations are all
+    in this module also gets an enum wrapper, which dispatches calls
+    statically.
+
+    If fast_reductions is set, sums of floats are split across several
+    independent accumulators, which can be vectorised. As floating point
+    addition is not associative, results may differ from Python's in
+    the last few bits.
+
+    If fused_multiply_add is set, float expressions of the form a * b + c
+    are written as a.mul_add(b, c), which rounds just once. This is
+    only faster where the target has a fused multiply-add instruction,
+    for example with -C target-cpu=native.
     """
 
     # compile the python source into an AST
@@ -35,11 +50,13 @@ def compile_to_rust(source, filename: str) -> bool:
     dependencies.write_preamble()
 
     # Walk the tree, outputting Rust code as we go (rather like XSLT)
-    RustGenerator(ff.headers, ff.class_headers).visit(tree)
+    RustGenerator(ff.headers, ff.class_headers, enum_dispatch, fast_reductions,
+        fused_multiply_add).visit(tree)
 
     return True
 
-def compile_file_to_rust(filename: str) -> bool:
+def compile_file_to_rust(filename: str, enum_dispatch: bool = False,
+        fast_reductions: bool = False, fused_multiply_add: bool = False) -> bool:
     """
     Compiles a Python source file, generating Rust source in
     stdout that does the same thing. Warnings and compiler errors are
@@ -51,14 +68,26 @@ def compile_file_to_rust(filename: str) -> bool:
     file = open(filename, 'r')
     source = file.read()
     file.close()
-    ok = compile_to_rust(source, filename)
+    ok = compile_to_rust(source, filename, enum_dispatch, fast_reductions,
+        fused_multiply_add)
     assert(ok)
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print(f"usage: {sys.argv[0]} <file_to_compile>", file=sys.stderr)
+    args = sys.argv[1:]
+    enum_dispatch = "--enum-dispatch" in args
+    if enum_dispatch:
+        args.remove("--enum-dispatch")
+    fast_reductions = "--fast-reductions" in args
+    if fast_reductions:
+        args.remove("--fast-reductions")
+    fused_multiply_add = "--fma" in args
+    if fused_multiply_add:
+        args.remove("--fma")
+    if len(args) != 1:
+        print(f"usage: {sys.argv[0]} [--enum-dispatch] [--fast-reductions] [--fma] "
+            "<file_to_compile>", file=sys.stderr)
         exit(1)
 
-    compile_file_to_rust(sys.argv[1])
+    compile_file_to_rust(args[0], enum_dispatch, fast_reductions, fused_multiply_add)
 
     # compile_file_to_rust("../pdl-sandbox/src/ImpliedVolHints.py")
\ No newline at end of file
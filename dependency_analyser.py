@@ -4,23 +4,31 @@ Results in a set of use statements at the head of a Rust
 source file.
 """
 
-from typing import Dict
+from typing import Dict, Set
 import ast
 import sys
 import filecmp
 import os
 from var_analyser import FunctionHeader
+from var_utils import constant_elements, constant_bound
+from library_functions import helpers_called
+from rust_helpers import write_helpers
+from matrix_analyser import find_flat_matrices
 
 class DependencyAnalyser(ast.NodeVisitor):
     """
     Visitor of the Python AST which analyses usage of standard
-    library types like HashMap and HashSet. Results are retained 
+    library types like HashMap and HashSet, and of the helper functions
+    standing in for Python library functions. Results are retained 
     internally.
     """
 
     def __init__(self, headers: Dict[str, FunctionHeader]):
         self.wants_hashmap = False
         self.wants_hashset = False
+        self.wants_cow = False
+        self.helpers: Set[str] = set()
+        self.functions = set(headers)
         
         for func in headers.values():
             self.check_dependencies(func.returns)
@@ -32,6 +40,8 @@ class DependencyAnalyser(ast.NodeVisitor):
             self.wants_hashmap = True
         if text.find("HashSet") != -1:
             self.wants_hashset = True
+        if text.find("Cow") != -1:
+            self.wants_cow = True
 
     def write_preamble(self):
         """
@@ -42,8 +52,28 @@ class DependencyAnalyser(ast.NodeVisitor):
             print("use std::collections::HashSet;")
         if self.wants_hashmap:
             print("use std::collections::HashMap;")
-        if self.wants_hashmap or self.wants_hashset:
+        if self.wants_cow:
+            print("use std::borrow::Cow;")
+        if self.wants_hashmap or self.wants_hashset or self.wants_cow:
             print()
+        write_helpers(self.helpers)
+
+    def visit_FunctionDef(self, node):
+        """
+        Elements of matrices stored flat are found using a helper
+        """
+        if find_flat_matrices(node):
+            self.helpers.add("flat_index")
+        self.generic_visit(node)
+
+    def visit_Slice(self, node):
+        """
+        Slice bounds that are not constant are clamped using a helper
+        """
+        for bound in (node.lower, node.upper):
+            if bound and not constant_bound(bound):
+                self.helpers.add("slice_bound")
+        self.generic_visit(node)
 
     def visit_Set(self, node):
         self.wants_hashset = True
@@ -70,12 +100,26 @@ class DependencyAnalyser(ast.NodeVisitor):
         self.visit(node.key)
         self.visit(node.value)
 
+    def visit_Compare(self, node):
+        """
+        An "in" test against a literal of constants does not create
+        the container, so does not need its type
+        """
+        self.visit(node.left)
+        for op, comparator in zip(node.ops, node.comparators):
+            if (not isinstance(op, (ast.In, ast.NotIn)) or
+                    constant_elements(comparator) is None):
+                self.visit(comparator)
+
     def visit_Call(self, node):
         """
-        Check for the "dict" function, which creates a HashMap
+        Check for the "dict" function, which creates a HashMap, and
+        for functions written using helpers, such as math.erf
         """
         for a in node.args:
             self.visit(a)
+        if not isinstance(node.func, ast.Name) or node.func.id not in self.functions:
+            self.helpers.update(helpers_called(node))
 
         if isinstance(node.func, ast.Name) and node.func.id == "dict":
             self.wants_hashmap = True
@@ -0,0 +1,159 @@
+"""
+Module supporting the translation of Python generators (functions
+containing yield) into Rust iterators. A generator is compiled to a
+struct holding its state, whose next method carries on from where the
+previous call left off.
+"""
+
+import ast
+from typing import Dict, List, Set
+
+def contains_yield(node) -> bool:
+    """
+    Does the given function or statement contain a yield? Yields within
+    nested functions or lambdas belong to them, so do not count.
+    """
+    nodes = list(ast.iter_child_nodes(node))
+    while nodes:
+        child = nodes.pop()
+        if isinstance(child, (ast.Yield, ast.YieldFrom)):
+            return True
+        if not isinstance(child, (ast.FunctionDef, ast.Lambda, ast.ClassDef)):
+            nodes.extend(ast.iter_child_nodes(child))
+    return False
+
+def is_yield_statement(node) -> bool:
+    return isinstance(node, ast.Expr) and isinstance(node.value, ast.Yield)
+
+def is_jump_statement(node) -> bool:
+    """
+    Does this statement leave the current iteration of the loop?
+    """
+    return is_yield_statement(node) or isinstance(node, (ast.Break, ast.Continue))
+
+def yields_only_at_end(lines) -> bool:
+    """
+    Are all the yields in this list of statements the last thing that
+    is executed? That is, the final statement is a yield, or an if
+    statement whose branches end in yields.
+    """
+    for line in lines[:-1]:
+        if contains_yield(line):
+            return False
+    if not lines or not contains_yield(lines[-1]):
+        return True
+    last = lines[-1]
+    if is_yield_statement(last):
+        return True
+    elif isinstance(last, ast.If):
+        return yields_only_at_end(last.body) and yields_only_at_end(last.orelse)
+    else:
+        return False
+
+class GeneratorShape:
+    """
+    The parts of a generator function that we can translate:
+
+    1. init: statements that run once, when the generator is created
+    2. loop: a single for or while loop, containing every yield
+    3. segments: the body of the loop, split after each statement that
+       contains a yield. Each call to next resumes at the start of a
+       segment. The last segment contains no yield, and runs on to the
+       end of the body.
+    4. jumps: the break and continue statements of the loop itself
+    """
+    def __init__(self, init: List[object], loop, segments: List[List[object]]):
+        self.init = init
+        self.loop = loop
+        self.segments = segments
+        self.jumps = loop_jumps(loop)
+
+    def is_simple(self) -> bool:
+        """
+        Is the yield the last thing in each iteration? If so, the loop
+        always resumes from the top, so we need not record where it
+        left off. After a break, the generator must stay finished, so
+        that needs recording too.
+        """
+        return (len(self.segments) == 2 and not self.segments[1] and
+            not any(isinstance(jump, ast.Break) for jump in self.jumps))
+
+    def finished_state(self) -> int:
+        """
+        The state of a generator that has broken out of its loop
+        """
+        return len(self.segments)
+
+def loop_jumps(loop) -> List[object]:
+    """
+    Returns the break and continue statements that belong to the given
+    loop, rather than to a loop nested within it.
+    """
+    jumps = []
+    nodes = list(loop.body)
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, (ast.Break, ast.Continue)):
+            jumps.append(node)
+        elif not isinstance(node, (ast.For, ast.While, ast.FunctionDef, ast.Lambda, ast.ClassDef)):
+            nodes.extend(ast.iter_child_nodes(node))
+    return jumps
+
+def analyse_generator(node) -> GeneratorShape:
+    """
+    Given a generator function, split it into a GeneratorShape. Raises an
+    exception if the generator is not one we can handle.
+    """
+    body = node.body
+    if (body and isinstance(body[-1], ast.Return) and body[-1].value is None and
+            len(body) > 1):
+        body = body[:-1]    # return at the end is implicit
+    loops = [i for i, line in enumerate(body) if contains_yield(line)]
+    if len(loops) != 1 or loops[0] != len(body) - 1:
+        raise Exception(f"Generator {node.name} must end in a loop containing all its yields")
+
+    loop = body[-1]
+    if not isinstance(loop, (ast.For, ast.While)) or loop.orelse:
+        raise Exception(f"Generator {node.name} must end in a for or while loop")
+    if isinstance(loop, ast.While) and contains_yield(loop.test):
+        raise Exception(f"Generator {node.name} cannot yield in a loop condition")
+
+    segments = [[]]
+    for line in loop.body:
+        segments[-1].append(line)
+        if not contains_yield(line):
+            continue
+        if not yields_only_at_end([line]):
+            raise Exception(f"Generator {node.name} must yield as the last statement of an if or loop")
+        segments.append([])
+
+    return GeneratorShape(body[:-1], loop, segments)
+
+def mutated_names(nodes) -> Set[str]:
+    """
+    Returns the names of the variables that the given nodes change after
+    first assigning them, either by assigning them again or by calling
+    a method on them.
+    """
+    stores: Dict[str, int] = {}
+    mutated = set()
+    for node in nodes:
+        for n in ast.walk(node):
+            if isinstance(n, ast.Name) and not isinstance(n.ctx, ast.Load):
+                stores[n.id] = stores.get(n.id, 0) + 1
+            elif (isinstance(n, ast.Call) and isinstance(n.func, ast.Attribute) and
+                    isinstance(n.func.value, ast.Name)):
+                mutated.add(n.func.value.id)
+    return mutated | {name for name, count in stores.items() if count > 1}
+
+def names_in(nodes, stored_only: bool = False) -> Set[str]:
+    """
+    Returns the names of all the variables used in the given nodes, or
+    just those that are assigned to.
+    """
+    names = set()
+    for node in nodes:
+        for n in ast.walk(node):
+            if isinstance(n, ast.Name) and (not stored_only or not isinstance(n.ctx, ast.Load)):
+                names.add(n.id)
+    return names
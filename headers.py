@@ -2,13 +2,34 @@ import ast
 import sys
 import os
 import filecmp
-from typing import Dict, List
-from var_utils import type_from_annotation, numeric_type
+from typing import Dict, List, Set, Optional
+from var_utils import type_from_annotation, numeric_type, strip_container, dereference, \
+    boxed_function_type, is_function_type
+from generator_analyser import contains_yield
+from string_analyser import string_return, COW_STRING
+from library_functions import is_read_only_method
 
 class FunctionHeader:
-    def __init__(self, returns: str, args: [(str, str)]):
+    def __init__(self, returns: str, args: [(str, str)], yields: str = "",
+            string_return: str = ""):
         self.returns = returns
         self.args = args
+        self.yields = yields    # type of item, if this is a generator
+        self.string_return = string_return  # Rust type, if a str is returned without copying
+        self.mutates_self = False   # for methods, whether self must be &mut
+
+def function_returns(node) -> (str, str):
+    """
+    Given a function definition, returns its return type, and if it
+    returns a str without copying, the Rust type it returns.
+    """
+    returns = type_from_annotation(node.returns, f"{node.name} return", True)
+    string = string_return(node)
+    if string == COW_STRING:
+        returns = "Cow<str>"
+    elif string:
+        returns = "&str"
+    return returns, string
 
 class ClassHeader:
     def __init__(
@@ -19,6 +40,11 @@ class ClassHeader:
         self.bases = bases
         self.instance_attributes = instance_attributes
         self.methods = methods
+        self.derives: List[str] = []    # traits derived by the Rust struct
+        self.dataclass = False          # __init__ is generated from the fields
+        self.frozen = False             # instances cannot be modified
+        self.columnar = False           # lists are held as a struct of arrays
+        self.defaults: Dict[str, object] = {}   # dataclass field default values
 
     def is_trait(self):
         """
@@ -26,6 +52,128 @@ class ClassHeader:
         """
         return not self.instance_attributes
 
+    def is_copy(self):
+        return "Copy" in self.derives
+
+# Types of fields that allow a struct to derive each group of traits
+PLAIN_DATA_TYPES = { "bool", "i64", "f64" }
+HASHABLE_TYPES = { "bool", "i64" }
+
+def stored_attributes(node) -> Set[str]:
+    """
+    Returns the names of the attributes that are assigned or deleted
+    through anything other than self, such as p.x in p.x = 3.0.
+    """
+    return {n.attr for n in ast.walk(node) if isinstance(n, ast.Attribute) and
+        not isinstance(n.ctx, ast.Load) and
+        not (isinstance(n.value, ast.Name) and n.value.id == "self")}
+
+def find_derives(class_headers: Dict[str, ClassHeader], stored: Set[str]):
+    """
+    Works out which standard traits each class can derive. A class is
+    plain data if all its fields are scalars or other plain data
+    classes. Plain data can be Copy, Clone and PartialEq, and if it
+    contains no floats, Eq and Hash as well, so it can be the key of a
+    HashMap or HashSet. The given attributes are modified from outside
+    their classes.
+    """
+    plain = {name for name, header in class_headers.items() if not header.is_trait()}
+    hashable = set(plain)
+    changed = True
+    while changed:
+        changed = False
+        for name in list(plain):
+            types = [dereference(t) for t in class_headers[name].instance_attributes.values()]
+            if not all(t in PLAIN_DATA_TYPES or t in plain for t in types):
+                plain.remove(name)
+                changed = True
+        for name in list(hashable):
+            types = [dereference(t) for t in class_headers[name].instance_attributes.values()]
+            if name not in plain or not all(t in HASHABLE_TYPES or t in hashable for t in types):
+                hashable.remove(name)
+                changed = True
+
+    # Python objects are shared, not copied, so a copy would not see
+    # changes made through another reference. Only classes that are
+    # never modified, by their own methods or from outside, are Copy,
+    # and only if their fields are too.
+    copyable = {name for name in plain if class_headers[name].frozen or (
+        not any(m.mutates_self for m in class_headers[name].methods.values()) and
+        not any(field in stored for field in class_headers[name].instance_attributes))}
+    changed = True
+    while changed:
+        changed = False
+        for name in list(copyable):
+            types = [dereference(t) for t in class_headers[name].instance_attributes.values()]
+            if not all(t in PLAIN_DATA_TYPES or t in copyable for t in types):
+                copyable.remove(name)
+                changed = True
+
+    for name, header in class_headers.items():
+        copy = ["Copy"] if name in copyable else []
+        if name in hashable:
+            header.derives = ["Clone"] + copy + ["PartialEq", "Eq", "Hash"]
+        elif name in plain:
+            header.derives = ["Clone"] + copy + ["PartialEq"]
+
+def dataclass_options(node) -> Optional[bool]:
+    """
+    Given a class definition, returns None if it is not a dataclass.
+    Otherwise returns whether it is frozen.
+    """
+    for decorator in node.decorator_list:
+        call = decorator if isinstance(decorator, ast.Call) else None
+        func = call.func if call else decorator
+        name = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", "")
+        if name == "dataclass":
+            return any(k.arg == "frozen" and isinstance(k.value, ast.Constant) and k.value.value
+                for k in (call.keywords if call else []))
+    return None
+
+def self_root(node) -> bool:
+    """
+    Is this expression, such as self.a[3], rooted at self?
+    """
+    while isinstance(node, (ast.Attribute, ast.Subscript)):
+        node = node.value
+    return isinstance(node, ast.Name) and node.id == "self"
+
+class SelfMutationFinder(ast.NodeVisitor):
+    """
+    Given the AST of a method, finds whether it modifies self, either
+    by assigning to or deleting from a member, or by invoking a method
+    on a member that changes it. Calls to other methods on self are
+    recorded, as they may modify self in turn.
+    """
+    def __init__(self, attributes: Dict[str, str]):
+        self.attributes = attributes
+        self.mutates = False
+        self.self_calls: Set[str] = set()
+
+    def visit_Attribute(self, node):
+        if not isinstance(node.ctx, ast.Load) and self_root(node):
+            self.mutates = True
+        self.generic_visit(node)
+
+    def visit_Subscript(self, node):
+        if not isinstance(node.ctx, ast.Load) and self_root(node):
+            self.mutates = True
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        func = node.func
+        if isinstance(func, ast.Attribute) and self_root(func.value):
+            receiver = func.value
+            if isinstance(receiver, ast.Name):
+                # calling a closure held in a field leaves it unchanged
+                if not is_function_type(self.attributes.get(func.attr, "")):
+                    self.self_calls.add(func.attr)
+            elif (not isinstance(receiver, ast.Attribute) or
+                    not isinstance(receiver.value, ast.Name) or
+                    not is_read_only_method(self.attributes.get(receiver.attr, ""), func.attr)):
+                self.mutates = True
+        self.generic_visit(node)
+
 class InstanceAttributeFinder(ast.NodeVisitor):
     """
     Given an AST representing part of the __init__ method
@@ -78,17 +226,72 @@ class ClassHeaderFinder(ast.NodeVisitor):
     def __init__(self):
         self.methods : Dict[str, FunctionHeader] = {}
         self.instance_attributes : Dict[str, str] = {}
+        self.self_calls: Dict[str, Set[str]] = {}
+        self.method_nodes = []
+        self.annotations: Dict[str, str] = {}   # class level, such as dataclass fields
+        self.defaults: Dict[str, object] = {}
+        self.slots: List[str] = []
+        self.columnar = False
+
+    def visit_AnnAssign(self, node):
+        if isinstance(node.target, ast.Name):
+            name = node.target.id
+            typed = type_from_annotation(node.annotation, name, False)
+            self.annotations[name] = boxed_function_type(typed)
+            if node.value is not None:
+                if isinstance(node.value, ast.Call):
+                    raise Exception(f"We only handle constant defaults for field {name}")
+                self.defaults[name] = node.value
+
+    def visit_Assign(self, node):
+        if len(node.targets) != 1 or not isinstance(node.targets[0], ast.Name):
+            return
+        name = node.targets[0].id
+        if name == "__slots__" and isinstance(node.value, (ast.Tuple, ast.List)):
+            self.slots = [e.value for e in node.value.elts if isinstance(e, ast.Constant)]
+        elif name == "__columnar__" and isinstance(node.value, ast.Constant):
+            self.columnar = bool(node.value.value)
+
+    def find_attributes(self, dataclass: bool):
+        """
+        After visiting the class, works out its fields. The fields of a
+        dataclass are its annotations, and its __init__ takes them in
+        order. The fields of a class with __slots__ are exactly those
+        named. Class level annotations give the types of fields where
+        we could not deduce them from __init__.
+        """
+        if dataclass:
+            self.instance_attributes = dict(self.annotations)
+            if "__init__" not in self.methods:
+                args = [("self", "None")] + list(self.annotations.items())
+                self.methods["__init__"] = FunctionHeader("None", args)
+            return
+
+        attributes = self.instance_attributes
+        names = self.slots if self.slots else list(attributes.keys())
+        for name in attributes:
+            if name not in names:
+                print(f"Warning: attribute {name} is not in __slots__", file=sys.stderr)
+        self.instance_attributes = {}
+        for name in names:
+            typed = attributes.get(name, "unknown")
+            if typed == "unknown":
+                typed = self.annotations.get(name, typed)
+            self.instance_attributes[name] = typed
 
     def visit_FunctionDef(self, node):
         name = node.name
-        returns = type_from_annotation(node.returns, f"{name} return", True)
+        returns, string = function_returns(node)
         args = []
         for arg in node.args.args:
             argname = arg.arg
             typed = type_from_annotation(arg.annotation, f"{name}: {argname}", False)
+            if name == "__init__":
+                typed = boxed_function_type(typed)  # to be stored in a field
             args.append((argname, typed))
         
-        self.methods[name] = FunctionHeader(returns, args)
+        self.methods[name] = FunctionHeader(returns, args, string_return=string)
+        self.method_nodes.append(node)
 
         # If this is the __init__ method, any assignments to self.<something>
         # are effectively variable declarations.
@@ -99,6 +302,30 @@ class ClassHeaderFinder(ast.NodeVisitor):
             
             self.instance_attributes = finder.attributes
 
+    def find_mutating_methods(self):
+        """
+        After visiting the class, works out which of its methods modify
+        self. A method calling another that modifies self does so too.
+        """
+        for node in self.method_nodes:
+            if node.name == "__init__":
+                continue
+            finder = SelfMutationFinder(self.instance_attributes)
+            finder.visit(node)
+            self.methods[node.name].mutates_self = finder.mutates
+            self.self_calls[node.name] = finder.self_calls
+
+        changed = True
+        while changed:
+            changed = False
+            for name, calls in self.self_calls.items():
+                method = self.methods[name]
+                if not method.mutates_self and any(
+                        call not in self.methods or self.methods[call].mutates_self
+                        for call in calls):
+                    method.mutates_self = True
+                    changed = True
+
 class FunctionHeaderFinder(ast.NodeVisitor):
     """
     Given an AST representing a module, find all the function
@@ -109,16 +336,39 @@ class FunctionHeaderFinder(ast.NodeVisitor):
         self.headers : Dict[str, FunctionHeader] = {}
         self.class_headers : Dict[str, ClassHeader] = {}
 
+    def visit_Module(self, node):
+        self.generic_visit(node)
+
+        # A method implementing a trait must take self in the same way
+        # as the trait declares it, so if any of them modifies self,
+        # they all must take it as &mut.
+        changed = True
+        while changed:
+            changed = False
+            for class_header in self.class_headers.values():
+                for base in class_header.bases:
+                    if base not in self.class_headers:
+                        continue
+                    for name, method in class_header.methods.items():
+                        base_method = self.class_headers[base].methods.get(name)
+                        if base_method and method.mutates_self != base_method.mutates_self:
+                            method.mutates_self = base_method.mutates_self = True
+                            changed = True
+
+        find_derives(self.class_headers, stored_attributes(node))
+
     def visit_FunctionDef(self, node):
         name = node.name
-        returns = type_from_annotation(node.returns, f"{name} return", True)
+        returns, string = function_returns(node)
         args = []
         for arg in node.args.args:
             argname = arg.arg
             typed = type_from_annotation(arg.annotation, f"{name}: {argname}", False)
             args.append((argname, typed))
-        
-        self.headers[name] = FunctionHeader(returns, args)
+
+        # a generator returns an iterator, written as [T]
+        yields = strip_container(returns) if contains_yield(node) else ""
+        self.headers[name] = FunctionHeader(returns, args, yields, string)
 
     def visit_ClassDef(self, node):
         # visit the whole of the class definition via a ClassHeaderFinder
@@ -126,10 +376,20 @@ class FunctionHeaderFinder(ast.NodeVisitor):
         for line in node.body:
             method_finder.visit(line)
 
+        frozen = dataclass_options(node)
+        method_finder.find_attributes(frozen is not None)
+        method_finder.find_mutating_methods()
+
         # Use this to construct the class headers
         baseclasses = [base.id for base in node.bases]
-        self.class_headers[node.name] = ClassHeader(baseclasses, 
+        class_header = ClassHeader(baseclasses,
             method_finder.methods, method_finder.instance_attributes)
+        class_header.dataclass = frozen is not None
+        class_header.frozen = bool(frozen)
+        if frozen is not None:
+            class_header.defaults = method_finder.defaults
+        class_header.columnar = method_finder.columnar
+        self.class_headers[node.name] = class_header
 
 def test_headers(filename):
     input_filename = f"tests/{filename}.py"
@@ -151,6 +411,8 @@ def test_headers(filename):
     for (name, header) in function_finder.headers.items():
         print(f"Function {name}:")
         print(f"    returns {header.returns}")
+        if header.yields:
+            print(f"    yields {header.yields}")
         for arg in header.args:
             print(f"    {arg[0]}: {arg[1]},")
         print()
@@ -159,6 +421,10 @@ def test_headers(filename):
         print(f"Class {name}:")
         for base in class_header.bases:
             print(f"    baseclass: {base}")
+        if class_header.derives:
+            print(f"    derives: {', '.join(class_header.derives)}")
+        if class_header.columnar:
+            print("    columnar")
         for (attr_name, attr_type) in class_header.instance_attributes.items():
             print(f"    {attr_name}: {attr_type}")
         if class_header.instance_attributes:
@@ -166,6 +432,8 @@ def test_headers(filename):
         for (method_name, method) in class_header.methods.items():
             print(f"    method: {method_name}")
             print(f"        returns {method.returns}")
+            if method.mutates_self:
+                print("        mutates self")
             for arg in method.args:
                 print(f"        {arg[0]}: {arg[1]},")
             print()
@@ -194,3 +462,8 @@ if __name__ == "__main__":
     test_headers("dictionaries")
     test_headers("classes")
     test_headers("traits")
+    test_headers("generators")
+    test_headers("numpy_arrays")
+    test_headers("reductions")
+    test_headers("maths")
+    test_headers("monte_carlo")
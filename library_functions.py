@@ -5,9 +5,11 @@ conversions into Rust
 
 import sys
 import ast
+from typing import List
 from var_utils import is_iterator_type, is_reference_type, \
     dict_type_from_list, strip_container, detemplatise, \
-    extract_types, UNKNOWN_TYPE
+    extract_types, is_copy_type, container_type, dereference, constant_elements, \
+    UNKNOWN_TYPE
 
 ALLOWED_COMPARISON_OPERATORS = { "Eq", "NotEq", "Lt", "LtE", "Gt", "GtE" }
 
@@ -38,6 +40,9 @@ OPERATOR_PRECEDENCE = {
 # One bigger than any actual precedence. Use this to force parentheses
 MAX_PRECEDENCE = 14
 
+OPEN_BRACE = '{'
+CLOSE_BRACE = '}'
+
 STANDARD_METHOD_RETURNS = {
     ("HashMap<_>", "keys"):    lambda types: f"[{types[0]}]",
     ("HashMap<_>", "values"):  lambda types: f"[{types[1]}]",
@@ -64,6 +69,7 @@ STANDARD_METHOD_RETURNS = {
     ("HashSet<_>", "symmetric_difference_update"): lambda types: "()",
     ("HashSet<_>", "union"):        lambda types: f"HashSet<{types[0]}>",
     ("HashSet<_>", "union_update"): lambda types: "()",
+    ("HashSet<_>", "update"):       lambda types: "()",
     ("Vec<_>", "append"):      lambda types: "()",
     ("Vec<_>", "insert"):      lambda types: "()",
     ("Vec<_>", "extend"):      lambda types: "()",
@@ -81,25 +87,23 @@ STANDARD_METHODS = {
     ("HashMap<_>", "get")  :   lambda v, n: handle_get_or_default("get", v, n, True),
     ("HashMap<_>", "items"):   lambda v, n: handle_items(v, n),
     ("HashMap<_>", "pop")  :   lambda v, n: handle_get_or_default("remove", v, n, False),
-    ("HashMap<_>", "popitem"): lambda v, n: handle_popitem(v, n),
     ("HashMap<_>", "setdefault"): lambda v, n: handle_set_default(v, n),
     ("HashMap<_>", "update"):  lambda v, n: handle_update(v, n),
     ("HashSet<_>", "add")  :   lambda v, n: handle_method("insert", v, n),
     ("HashSet<_>", "clear"):   lambda v, n: handle_method("clear", v, n),
     ("HashSet<_>", "copy"):    lambda v, n: handle_method("clone", v, n),
-    ("HashSet<_>", "difference"):   lambda v, n: handle_collect("difference", v, n),
-    ("HashSet<_>", "difference_update"): lambda v, n: handle_todo("difference_update", v, n),
+    ("HashSet<_>", "difference"):   lambda v, n: handle_filter_collect("difference", v, n, False),
+    ("HashSet<_>", "difference_update"): lambda v, n: handle_retain(v, n, False),
     ("HashSet<_>", "discard"):      lambda v, n: handle_refargs("remove", v, n),
-    ("HashSet<_>", "intersection"): lambda v, n: handle_collect("intersection", v, n),
-    ("HashSet<_>", "intersection_update"): lambda v, n: handle_todo("intersection_update", v, n),
+    ("HashSet<_>", "intersection"): lambda v, n: handle_filter_collect("intersection", v, n, True),
+    ("HashSet<_>", "intersection_update"): lambda v, n: handle_retain(v, n, True),
     ("HashSet<_>", "isdisjoint"):   lambda v, n: handle_refargs("is_disjoint", v, n),
     ("HashSet<_>", "issubset"):     lambda v, n: handle_refargs("is_subset", v, n),
     ("HashSet<_>", "issuperset"):   lambda v, n: handle_refargs("is_superset", v, n),
     ("HashSet<_>", "remove"):       lambda v, n: handle_refargs("remove", v, n),
     ("HashSet<_>", "symmetric_difference"): lambda v, n: handle_collect("symmetric_difference", v, n),
-    ("HashSet<_>", "symmetric_difference_update"): lambda v, n: handle_todo("symmetric_difference_update", v, n),
-    ("HashSet<_>", "union"):        lambda v, n: handle_collect("union", v, n),
-    ("HashSet<_>", "union_update"): lambda v, n: handle_method("union_update", v, n),
+    ("HashSet<_>", "union_update"): lambda v, n: handle_extend(v, n),
+    ("HashSet<_>", "update"):       lambda v, n: handle_extend(v, n),
     ("Vec<_>", "append")   :   lambda v, n: handle_method("push", v, n),
     ("Vec<_>", "insert"):      lambda v, n: handle_method("insert", v, n),
     ("Vec<_>", "extend"):      lambda v, n: handle_method("extend", v, n),
@@ -113,6 +117,15 @@ STANDARD_METHODS = {
     ("Vec<_>", "pop"):         lambda v, n: handle_method_unwrapped("pop", v, n),
 }
 
+# Methods that cannot be written as a single method call on the
+# receiver, so are written as a Rust statement or block expression.
+# Unlike STANDARD_METHODS, the handler writes the receiver itself.
+STANDARD_BLOCK_METHODS = {
+    ("HashMap<_>", "popitem"): lambda v, n: handle_popitem(v, n),
+    ("HashSet<_>", "symmetric_difference_update"): lambda v, n: handle_symmetric_difference_update(v, n),
+    ("HashSet<_>", "union"):   lambda v, n: handle_union(v, n),
+}
+
 # Mapping from Python function name to Rust return type
 STANDARD_FUNCTION_RETURNS = {
     "dict":  lambda args: dict_type_from_list(args[0]),
@@ -123,23 +136,264 @@ STANDARD_FUNCTION_RETURNS = {
     "abs":   lambda args: args[0],
     "exp":   lambda args: "f64",
     "log":   lambda args: "f64",
-    "min":   lambda args: args[0],    
-    "max":   lambda args: args[0],    
+    "sqrt":  lambda args: "f64",
+    "sin":   lambda args: "f64",
+    "cos":   lambda args: "f64",
+    "tan":   lambda args: "f64",
+    "atan2": lambda args: "f64",
+    "hypot": lambda args: "f64",
+    "log1p": lambda args: "f64",
+    "expm1": lambda args: "f64",
+    "erf":   lambda args: "f64",
+    "erfc":  lambda args: "f64",
+    "floor": lambda args: "i64",
+    "ceil":  lambda args: "i64",
+    "trunc": lambda args: "i64",
+    "fsum":  lambda args: "f64",
+    "isclose": lambda args: "bool",
+    "isnan": lambda args: "bool",
+    "isinf": lambda args: "bool",
+    "isfinite": lambda args: "bool",
+    "min":   lambda args: args[0] if len(args) > 1 else strip_container(args[0]),
+    "max":   lambda args: args[0] if len(args) > 1 else strip_container(args[0]),
+    "sum":   lambda args: strip_container(args[0]),
+    "any":   lambda args: "bool",
+    "all":   lambda args: "bool",
 }
 
 STANDARD_FUNCTIONS = {
     "abs":   lambda visitor, node: handle_postfix(visitor, node, "abs"),
     "dict":  lambda visitor, node: handle_dict(visitor, node),
-    "len":   lambda visitor, node: handle_postfix(visitor, node, "len"),
+    "len":   lambda visitor, node: handle_len(visitor, node),
     "print": lambda visitor, node: handle_print(visitor, node),
     "range": lambda visitor, node: handle_range(visitor, node),
     "zip":   lambda visitor, node: handle_zip(visitor, node),
-    "exp":   lambda visitor, node: handle_postfix(visitor, node, "exp"),
-    "log":   lambda visitor, node: handle_postfix(visitor, node, "ln"),
+    "exp":   lambda visitor, node: handle_float_postfix(visitor, node, "exp"),
+    "log":   lambda visitor, node: handle_float_postfix(visitor, node,
+        "log" if len(node.args) == 2 else "ln"),
+    "sqrt":  lambda visitor, node: handle_float_postfix(visitor, node, "sqrt"),
+    "sin":   lambda visitor, node: handle_float_postfix(visitor, node, "sin"),
+    "cos":   lambda visitor, node: handle_float_postfix(visitor, node, "cos"),
+    "tan":   lambda visitor, node: handle_float_postfix(visitor, node, "tan"),
+    "atan2": lambda visitor, node: handle_float_postfix(visitor, node, "atan2"),
+    "hypot": lambda visitor, node: handle_float_postfix(visitor, node, "hypot"),
+    "log1p": lambda visitor, node: handle_float_postfix(visitor, node, "ln_1p"),
+    "expm1": lambda visitor, node: handle_float_postfix(visitor, node, "exp_m1"),
+    "erf":   lambda visitor, node: handle_helper(visitor, node, "math_erf"),
+    "erfc":  lambda visitor, node: handle_helper(visitor, node, "math_erfc"),
+    "floor": lambda visitor, node: handle_float_to_int(visitor, node, "floor"),
+    "ceil":  lambda visitor, node: handle_float_to_int(visitor, node, "ceil"),
+    "trunc": lambda visitor, node: handle_float_to_int(visitor, node, "trunc"),
+    "fsum":  lambda visitor, node: handle_iterator_helper(visitor, node, "math_fsum"),
+    "isclose": lambda visitor, node: handle_isclose(visitor, node),
+    "isnan": lambda visitor, node: handle_float_postfix(visitor, node, "is_nan"),
+    "isinf": lambda visitor, node: handle_float_postfix(visitor, node, "is_infinite"),
+    "isfinite": lambda visitor, node: handle_float_postfix(visitor, node, "is_finite"),
     "min":   lambda visitor, node: handle_minmax(visitor, node, "min"),
     "max":   lambda visitor, node: handle_minmax(visitor, node, "max"),
+    "sum":   lambda visitor, node: handle_sum_function(visitor, node),
+    "any":   lambda visitor, node: handle_any_all(visitor, node, "any"),
+    "all":   lambda visitor, node: handle_any_all(visitor, node, "all"),
+}
+
+# Functions from the math module that are written as calls to one of
+# the helpers in rust_helpers
+MATH_HELPERS = {
+    "erf":     "math_erf",
+    "erfc":    "math_erfc",
+    "fsum":    "math_fsum",
+    "isclose": "math_isclose",
+}
+
+# Constants from the math module
+MATH_CONSTANTS = {
+    "pi":  "std::f64::consts::PI",
+    "e":   "std::f64::consts::E",
+    "tau": "std::f64::consts::TAU",
+    "inf": "f64::INFINITY",
+    "nan": "f64::NAN",
+}
+
+# Functions from the statistics module. These are only recognised when
+# qualified, as in statistics.mean(a), so as not to hide functions of
+# our own with the same names. All are helpers taking an iterator of
+# floats, so comprehensions are not collected.
+STATISTICS_HELPERS = {
+    "mean":      "statistics_mean",
+    "fmean":     "statistics_mean",
+    "variance":  "statistics_variance",
+    "stdev":     "statistics_stdev",
+    "pvariance": "statistics_pvariance",
+    "pstdev":    "statistics_pstdev",
+}
+
+# Methods of statistics.NormalDist, as helpers for the standard normal
+NORMAL_DIST_HELPERS = {
+    "cdf": "normal_cdf",
+    "pdf": "normal_pdf",
 }
 
+# Functions from the random module, written as calls to helpers around
+# a xoshiro256** generator for each thread, with the Python parameters
+# and their defaults
+RANDOM_HELPERS = {
+    "random":        ("random_random", ()),
+    "uniform":       ("random_uniform", (("a", None), ("b", None))),
+    "gauss":         ("random_gauss", (("mu", 0.0), ("sigma", 1.0))),
+    "normalvariate": ("random_gauss", (("mu", 0.0), ("sigma", 1.0))),
+    "seed":          ("random_seed", (("a", None),)),
+}
+
+# Seed used by random.seed(), with no argument
+RANDOM_TIME_SEED = ("std::time::SystemTime::now().duration_since(std::time::UNIX_EPOCH)"
+    ".unwrap().as_nanos() as i64")
+
+def is_random_call(node) -> bool:
+    """
+    Is this a call to one of the random functions we support, such as
+    random.gauss(0.0, 1.0)?
+    """
+    func = node.func
+    return (isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and
+        func.value.id == "random" and func.attr in RANDOM_HELPERS)
+
+def is_statistics_call(node) -> bool:
+    """
+    Is this a call to one of the statistics functions we support, such
+    as statistics.stdev(a)?
+    """
+    func = node.func
+    return (isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and
+        func.value.id == "statistics" and func.attr in STATISTICS_HELPERS)
+
+def normal_dist(node):
+    """
+    If this is a call such as NormalDist(mu, sigma).cdf(x), returns the
+    call creating the distribution. Otherwise returns None.
+    """
+    func = node.func
+    if (not isinstance(func, ast.Attribute) or func.attr not in NORMAL_DIST_HELPERS or
+            not isinstance(func.value, ast.Call)):
+        return None
+    constructor = func.value.func
+    if isinstance(constructor, ast.Name) and constructor.id == "NormalDist":
+        return func.value
+    if (isinstance(constructor, ast.Attribute) and constructor.attr == "NormalDist" and
+            isinstance(constructor.value, ast.Name) and constructor.value.id == "statistics"):
+        return func.value
+    return None
+
+def helpers_called(node) -> List[str]:
+    """
+    Returns the names of the helpers in rust_helpers that the given
+    call is written with, if any.
+    """
+    func = node.func
+    name = func.id if isinstance(func, ast.Name) else ""
+    if (isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and
+            func.value.id == "math"):
+        name = func.attr
+    if name in MATH_HELPERS:
+        return [MATH_HELPERS[name]]
+    if is_statistics_call(node):
+        return [STATISTICS_HELPERS[func.attr]]
+    if is_random_call(node):
+        return [RANDOM_HELPERS[func.attr][0]]
+    if normal_dist(node):
+        return [NORMAL_DIST_HELPERS[func.attr]]
+    return []
+
+# Names under which numpy is usually imported
+NUMPY_MODULES = { "np", "numpy" }
+
+# Type of a new numpy array, given the type of its shape. Two dimensional
+# arrays are typed as lists of lists, though they are held flat.
+def numpy_array_type(shape: str) -> str:
+    return "Vec<Vec<f64>>" if shape.startswith("(") else "Vec<f64>"
+
+# Mapping from numpy function name to Rust return type. Arrays of
+# floats are held in a contiguous Vec<f64>.
+NUMPY_FUNCTION_RETURNS = {
+    "zeros":   lambda args: numpy_array_type(args[0]),
+    "ones":    lambda args: numpy_array_type(args[0]),
+    "full":    lambda args: numpy_array_type(args[0]),
+    "array":   lambda args: "Vec<f64>",
+    "sum":     lambda args: "f64",
+    "mean":    lambda args: "f64",
+    "dot":     lambda args: "f64",
+    "max":     lambda args: "f64",
+    "min":     lambda args: "f64",
+}
+
+# Numpy functions acting on each element of an array in turn. Within
+# an elementwise expression, each is written as it would be for a
+# single float.
+NUMPY_ELEMENTWISE = {
+    "exp":     lambda visitor, node: handle_postfix(visitor, node, "exp"),
+    "log":     lambda visitor, node: handle_postfix(visitor, node, "ln"),
+    "sqrt":    lambda visitor, node: handle_postfix(visitor, node, "sqrt"),
+    "abs":     lambda visitor, node: handle_postfix(visitor, node, "abs"),
+    "maximum": lambda visitor, node: handle_minmax(visitor, node, "max"),
+    "minimum": lambda visitor, node: handle_minmax(visitor, node, "min"),
+    "where":   lambda visitor, node: handle_numpy_where(visitor, node),
+}
+NUMPY_ELEMENTWISE_FUNCTIONS = set(NUMPY_ELEMENTWISE)
+
+NUMPY_FUNCTIONS = {
+    "zeros":   lambda visitor, node: handle_numpy_full(visitor, node, "0.0"),
+    "ones":    lambda visitor, node: handle_numpy_full(visitor, node, "1.0"),
+    "full":    lambda visitor, node: handle_numpy_full(visitor, node, ""),
+    "array":   lambda visitor, node: handle_numpy_array(visitor, node),
+    "sum":     lambda visitor, node: print_float_sum(visitor, node.args[0]),
+    "mean":    lambda visitor, node: handle_numpy_mean(visitor, node),
+    "dot":     lambda visitor, node: handle_numpy_dot(visitor, node),
+    "max":     lambda visitor, node: handle_numpy_reduce(visitor, node, ".reduce(f64::max).unwrap()"),
+    "min":     lambda visitor, node: handle_numpy_reduce(visitor, node, ".reduce(f64::min).unwrap()"),
+}
+
+def is_numpy_call(node) -> bool:
+    """
+    Is this a call to one of the numpy functions we support, such as
+    np.zeros(n)?
+    """
+    func = node.func
+    return (isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and
+        func.value.id in NUMPY_MODULES and
+        (func.attr in NUMPY_FUNCTIONS or func.attr in NUMPY_ELEMENTWISE))
+
+# Methods that only read the object they are invoked on, so need no
+# more than a shared reference to it. Any other method, including any
+# we do not recognise, is assumed to modify the object.
+READ_ONLY_METHODS = {
+    ("HashMap<_>", "copy"),
+    ("HashMap<_>", "get"),
+    ("HashMap<_>", "items"),
+    ("HashMap<_>", "keys"),
+    ("HashMap<_>", "values"),
+    ("HashSet<_>", "copy"),
+    ("HashSet<_>", "difference"),
+    ("HashSet<_>", "intersection"),
+    ("HashSet<_>", "isdisjoint"),
+    ("HashSet<_>", "issubset"),
+    ("HashSet<_>", "issuperset"),
+    ("HashSet<_>", "symmetric_difference"),
+    ("HashSet<_>", "union"),
+    ("Vec<_>", "copy"),
+    ("Vec<_>", "count"),
+    ("Vec<_>", "index"),
+    ("Vec<_>", "max"),
+    ("Vec<_>", "min"),
+    ("Vec<_>", "sum"),
+}
+
+def is_read_only_method(class_type: str, method_name: str) -> bool:
+    """
+    Given the type of an object and a standard method invoked on it,
+    is the object left unchanged?
+    """
+    typed = container_type(dereference(class_type)) if class_type else ""
+    return (detemplatise(typed), method_name) in READ_ONLY_METHODS
+
 def method_return_type(class_type: str, method_name: str) -> str:
     """
     Given the name of a class and a method on the class, return
@@ -225,6 +479,139 @@ def handle_collect(method_name: str, visitor, node):
     typed = visitor.type_by_node[node.func]
     print(f").cloned().collect::<{typed}>()", end='')
 
+def handle_filter_collect(method_name: str, visitor, node, keep_if_contained: bool):
+    """
+    Handle a method such as intersection or difference, which in Python
+    can take any number of other sets. Rust's methods only take one, so
+    with more than one we filter the receiver's elements in a single pass.
+    """
+    if len(node.args) == 1:
+        handle_collect(method_name, visitor, node)
+        return
+
+    tmp = visitor.temp_variable()
+    print(f".iter().filter(|{tmp}| ", end='')
+    print_contains_all(visitor, node.args, tmp, keep_if_contained)
+    typed = visitor.type_by_node[node.func]
+    print(f").cloned().collect::<{typed}>()", end='')
+
+def handle_retain(visitor, node, keep_if_contained: bool):
+    """
+    Python's intersection_update and difference_update remove from the
+    set any elements that are not (or are) in the other sets. In Rust,
+    retain does the same in place, without allocating.
+    """
+    tmp = visitor.temp_variable()
+    print(f".retain(|{tmp}| ", end='')
+    print_contains_all(visitor, node.args, tmp, keep_if_contained)
+    print(")", end='')
+
+def print_contains_all(visitor, others, tmp: str, contained: bool):
+    """
+    Writes a boolean expression that is true if the item named tmp is
+    in all of the others (contained=True) or in none of them
+    (contained=False).
+    """
+    separator = ""
+    for other in others:
+        print(separator, end='')
+        if not contained:
+            print("!", end='')
+        elements = constant_elements(other)
+        if elements and isinstance(elements[0].value, str):
+            # the item is a reference to a String, and literals are &str
+            print(f"matches!(&{tmp}[..], ", end='')
+            for i, element in enumerate(elements):
+                print(" | " if i else "", end='')
+                visitor.visit(element)
+            print(")", end='')
+        else:
+            visit_literal_or_container(visitor, other)
+            print(f".contains({tmp})", end='')
+        separator = " && "
+
+def visit_literal_or_container(visitor, node):
+    """
+    Writes a container that is only going to be read. There is no
+    point building a HashSet from a literal set just to read it, so
+    we leave literals as a slice.
+    """
+    if isinstance(node, (ast.Set, ast.List)):
+        visitor.do_visit_List(node)
+    else:
+        visitor.precedence = MAX_PRECEDENCE * 2
+        visitor.visit(node)
+
+def handle_extend(visitor, node):
+    """
+    Python's update adds the elements of any number of other sets. In
+    Rust this is extend, fed by a chain of borrowed iterators. Copy
+    types such as i64 can be extended from references directly, but
+    other types must be cloned.
+    """
+    print(".extend(", end='')
+    print_chained_iter(visitor, node.args)
+    print(")", end='')
+
+def print_chained_iter(visitor, others):
+    """
+    Writes an iterator over the elements of all the given containers,
+    cloned if they are not Copy types.
+    """
+    element = ""
+    for i, other in enumerate(others):
+        if i > 0:
+            print(".chain(", end='')
+        visit_literal_or_container(visitor, other)
+        print(".iter()", end='')
+        if i > 0:
+            print(")", end='')
+        element = extract_types(visitor.type_by_node[other])[0]
+    if not is_copy_type(element):
+        print(".cloned()", end='')
+
+def handle_union(visitor, node):
+    """
+    Python's union returns a new set. Rather than collecting both sets
+    element by element, which rehashes everything and grows the new set
+    as it goes, we clone the receiver (copying its table wholesale) and
+    extend the clone with the others.
+    """
+    tmp = visitor.temp_variable()
+    print(f"{OPEN_BRACE} let mut {tmp} = ", end='')
+    visitor.visit(node.func.value)
+    print(f".clone(); {tmp}.extend(", end='')
+    print_chained_iter(visitor, node.args)
+    print(f"); {tmp} {CLOSE_BRACE}", end='')
+
+def handle_symmetric_difference_update(visitor, node):
+    """
+    In Python, symmetric_difference_update removes from the set any
+    elements that are also in the other, and adds those that are not.
+    Rust has no such method, so we toggle each element of the other
+    set in place.
+    """
+    if len(node.args) != 1:
+        raise Exception("symmetric_difference_update takes exactly one arg")
+
+    tmp = visitor.temp_variable()
+    element = extract_types(visitor.type_by_node[node.func])[0]
+    value = f"*{tmp}" if is_copy_type(element) else f"{tmp}.clone()"
+    indent = visitor.pretty()
+    print(f"for {tmp} in ", end='')
+    visitor.precedence = MAX_PRECEDENCE * 2
+    visitor.visit(node.args[0])
+    print(f".iter() {OPEN_BRACE}")
+    print(f"{indent}    if !", end='')
+    visitor.visit(node.func.value)
+    print(f".remove({tmp}) {OPEN_BRACE}")
+    print(f"{indent}        ", end='')
+    visitor.visit(node.func.value)
+    print(f".insert({value});")
+    print(f"{indent}    {CLOSE_BRACE}")
+    print(f"{indent}{CLOSE_BRACE}", end='')
+    visitor.block_statement = True
+
 def handle_get_or_default(method_name: str, visitor, node, returns_ref: bool):
     """
     Handle a method on a Map that returns either a value from
@@ -276,26 +663,69 @@ def print_iter_if_needed(typed: str):
 def handle_items(visitor, node):
     """
     Returns an iterator to a (key, value) pair. In Rust this is tricky
-    because iter() returns an iterator to (&key, &value) so we need
+    because iter() returns an iterator to (&key, &value) so we may need
     to convert this.
 
-    This is an example of a place where Rust is really hard to handle
-    because of its rules about borrowing, and the lack of overloaded
-    functions.
+    Copy types such as f64 are dereferenced. Other types are left as
+    references if the loop only reads them, and only cloned if they
+    escape, for example into another container.
+    """
+    borrowing = visitor.borrowing
+    visitor.borrowing = False
+    types = extract_types(visitor.type_by_node[node.func])
+    key = owned_element("k", types[0], borrowing)
+    value = owned_element("v", types[1], borrowing)
+    print(".iter()", end='')
+    if key != "k" or value != "v":
+        print(f".map(|(k, v)| ({key}, {value}))", end='')
+
+def owned_element(name: str, typed: str, borrowing: bool) -> str:
+    """
+    Given the name of a reference to an element of a container, return
+    an expression for the element, as a value if it is a Copy type,
+    cloned if it must be owned, or otherwise left as a reference.
+    """
+    if is_copy_type(typed):
+        return f"*{name}"
+    elif borrowing:
+        return name
+    else:
+        return f"{name}.clone()"
+
+def iter_elements(typed: str, borrowing: bool) -> str:
     """
-    print(".iter().map(|(ref k, ref v)| ((*k).clone(), (*v).clone()))", end='')
+    Returns the Rust to iterate over the elements of a container of the
+    given type, as values if they are Copy types, cloned if they must
+    be owned, or otherwise as references.
+    """
+    element = strip_container(typed)
+    if is_copy_type(element):
+        return ".iter().copied()"
+    elif borrowing:
+        return ".iter()"
+    else:
+        return ".iter().cloned()"
 
 def handle_popitem(visitor, node):
     """
     In Python returns some arbitrary (key, value) pair, which is removed.
 
-    Rust has a similar remove_entry, but this requires a key. We use
-    drain, which returns an iterator, and just take the first entry.
+    Rust has a similar remove_entry, but this requires a key. We clone
+    the first key we find and remove just that entry. (Using drain
+    would empty the whole map.) Finding the first key scans past the
+    slots already emptied, so popping every item this way takes time
+    quadratic in the size of the map. A loop doing so is written using
+    drain instead: see RustGenerator.visit_Drain_While.
 
-    If the iterator is exhausted, in other words there are no more elements,
-    Rust like Python just panics. (Why is this sensible behaviour?)
+    If there are no more elements, Rust like Python just panics.
+    (Why is this sensible behaviour?)
     """
-    print(".drain().next().unwrap()", end='')
+    tmp = visitor.temp_variable()
+    print(f"{OPEN_BRACE} let {tmp} = ", end='')
+    visitor.visit(node.func.value)
+    print(".keys().next().cloned().unwrap(); ", end='')
+    visitor.visit(node.func.value)
+    print(f".remove_entry(&{tmp}).unwrap() {CLOSE_BRACE}", end='')
 
 def handle_update(visitor, node):
     """
@@ -377,9 +807,11 @@ def handle_print(visitor, node):
         print("print!(", end='')
         suffix = endline
     
-    # Of there is only one or zero argument and no suffix, just print it
+    # If there is no argument or just a literal string, and no suffix,
+    # just print it
     n = len(node.args)
-    if n <= 1 and suffix == "":
+    is_literal = n == 1 and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str)
+    if (n == 0 or is_literal) and suffix == "":
         if n == 1:
             visitor.visit(node.args[0])
 
@@ -458,18 +890,24 @@ def handle_zip(visitor, node):
 
     We also need to force the iterator to be an iterator with
     an "iter" method, as the normal rules you'd get in a for
-    loop do not apply.
+    loop do not apply. The elements are copied, borrowed or
+    cloned depending on their type and how they are used.
     """
     # Really hard to handle more than two args to a zip in
     # Rust, though there are third party libraries that do.
     if len(node.args) != 2:
         raise Exception("We currently only handle zip with two args")
 
+    borrowing = visitor.borrowing
+    visitor.borrowing = False
     visitor.precedence = MAX_PRECEDENCE * 2    # make sure we put brackets if needed
     visitor.visit(node.args[0])
-    print(".iter().cloned().zip(", end='')
+    print(iter_elements(visitor.type_by_node[node.args[0]], borrowing), end='')
+    print(".zip(", end='')
+    visitor.precedence = MAX_PRECEDENCE * 2
     visitor.visit(node.args[1])
-    print(".iter().cloned())", end='')
+    print(iter_elements(visitor.type_by_node[node.args[1]], borrowing), end='')
+    print(")", end='')
 
 def handle_postfix(visitor, node, operator):
     """
@@ -481,11 +919,376 @@ def handle_postfix(visitor, node, operator):
     visitor.visit(node.args[0])
     print(f").{operator}()", end='')
 
+def print_as_float(visitor, node):
+    """
+    Writes an expression that must be an f64, such as an argument of a
+    math function, converting it if it is an integer.
+    """
+    if isinstance(node, ast.Constant) and not isinstance(node.value, bool):
+        print(float(node.value), end='')
+    elif visitor.type_by_node.get(node) == "f64":
+        visitor.visit(node)
+    else:
+        visitor.parens_if_needed("as", lambda: visitor.visit(node))
+        print(" as f64", end='')
+
+def print_float_receiver(visitor, node, wrap: str = ""):
+    """
+    Writes a float on which a method is to be called. A literal needs a
+    suffix, as Rust cannot call a method on a float of unknown type.
+    Anything else is wrapped in parentheses if given wrap is "(", and
+    otherwise only as its precedence requires.
+    """
+    try:
+        literal = float(ast.literal_eval(node))
+    except (ValueError, TypeError):
+        literal = None
+    if literal is not None:
+        print(f"{literal}_f64" if literal >= 0 else f"({literal}_f64)", end='')
+    elif wrap:
+        print("(", end='')
+        print_as_float(visitor, node)
+        print(")", end='')
+    else:
+        visitor.precedence = MAX_PRECEDENCE * 2
+        print_as_float(visitor, node)
+
+def handle_float_postfix(visitor, node, operator):
+    """
+    Functions from the math module, such as sqrt(x), are written as
+    methods of f64, as in (x).sqrt(). Integers are converted. Any second
+    argument, as in atan2(y, x), is passed to the method.
+    """
+    old_prec = visitor.precedence
+    visitor.precedence = 0
+    print_float_receiver(visitor, node.args[0], "(")
+    print(f".{operator}(", end='')
+    for arg in node.args[1:]:
+        print_as_float(visitor, arg)
+    print(")", end='')
+    visitor.precedence = old_prec
+
+def handle_float_to_int(visitor, node, operator):
+    """
+    In Python, math.floor(x) returns an int, so in Rust we round and
+    then convert, as in (x).floor() as i64. Same with ceil and trunc.
+    """
+    def visit():
+        handle_float_postfix(visitor, node, operator)
+        print(" as i64", end='')
+    visitor.parens_if_needed("as", visit)
+
+def print_helper_call(visitor, helper: str, args):
+    """
+    Writes a call to one of the helpers in rust_helpers, all of whose
+    arguments are floats.
+    """
+    old_prec = visitor.precedence
+    print(f"{helper}(", end='')
+    for i, arg in enumerate(args):
+        print(", " if i else "", end='')
+        visitor.precedence = 0
+        print_as_float(visitor, arg)
+    print(")", end='')
+    visitor.precedence = old_prec
+
+def handle_helper(visitor, node, helper: str):
+    print_helper_call(visitor, helper, node.args)
+
+def positional_arguments(node, parameters):
+    """
+    Returns the arguments of a call in the order of the given parameters,
+    which are pairs of name and default. Keyword arguments are put in
+    place, and missing ones are replaced by their defaults.
+    """
+    keywords = {k.arg: k.value for k in node.keywords}
+    args = list(node.args)
+    for name, default in parameters[len(args):]:
+        args.append(keywords.get(name, ast.Constant(value=default)))
+    return args
+
+def handle_isclose(visitor, node):
+    """
+    math.isclose(a, b, rel_tol=1e-09, abs_tol=0.0) calls a helper, which
+    is always passed both tolerances.
+    """
+    args = positional_arguments(node, (("a", None), ("b", None),
+        ("rel_tol", 1e-09), ("abs_tol", 0.0)))
+    print_helper_call(visitor, "math_isclose", args)
+
+def handle_random_call(visitor, node):
+    """
+    random.gauss(mu, sigma) and friends call helpers, which draw from a
+    generator belonging to the current thread. random.seed takes an
+    integer, or if it has none, seeds from the time.
+    """
+    helper, parameters = RANDOM_HELPERS[node.func.attr]
+    if helper != "random_seed":
+        print_helper_call(visitor, helper, positional_arguments(node, parameters))
+        return
+    print("random_seed(", end='')
+    if node.args:
+        old_prec = visitor.precedence
+        visitor.precedence = 0
+        visitor.visit(node.args[0])
+        visitor.precedence = old_prec
+    else:
+        print(RANDOM_TIME_SEED, end='')
+    print(")", end='')
+
+def handle_iterator_helper(visitor, node, helper: str):
+    """
+    Helpers such as math_fsum take an iterator of floats, so are passed
+    a lazy iterator over a container or comprehension, without
+    collecting it. Integers are converted as they are read.
+    """
+    old_prec = visitor.precedence
+    arg = node.args[0]
+    print(f"{helper}(", end='')
+    visitor.print_lazy_iterator(arg)
+    if strip_container(visitor.type_by_node[arg]) != "f64":
+        print(".map(|x| x as f64)", end='')
+    print(")", end='')
+    visitor.precedence = old_prec
+
+def handle_statistics_call(visitor, node):
+    """
+    statistics.stdev(a) and friends are written as helpers, which make
+    a single pass over the data.
+    """
+    handle_iterator_helper(visitor, node, STATISTICS_HELPERS[node.func.attr])
+
+def handle_normal_dist(visitor, node):
+    """
+    NormalDist(mu, sigma).cdf(x) is written in terms of the standard
+    normal distribution, as normal_cdf((x - mu) / sigma). The pdf is
+    also divided by sigma.
+    """
+    dist = normal_dist(node)
+    params = dict(zip(("mu", "sigma"), dist.args))
+    params.update({k.arg: k.value for k in dist.keywords})
+    mu = params.get("mu")
+    sigma = params.get("sigma")
+    helper = NORMAL_DIST_HELPERS[node.func.attr]
+
+    def visit():
+        print(f"{helper}(", end='')
+        visitor.precedence = 0
+        if mu and sigma:
+            print("(", end='')
+        if mu:
+            visitor.precedence = OPERATOR_PRECEDENCE["Sub"] * 2
+            print_as_float(visitor, node.args[0])
+            print(" - ", end='')
+            visitor.precedence += 1
+            print_as_float(visitor, mu)
+        else:
+            visitor.precedence = OPERATOR_PRECEDENCE["Div"] * 2 if sigma else 0
+            print_as_float(visitor, node.args[0])
+        if sigma:
+            print(") / " if mu else " / ", end='')
+            visitor.precedence = OPERATOR_PRECEDENCE["Div"] * 2 + 1
+            print_as_float(visitor, sigma)
+        print(")", end='')
+        if sigma and helper == "normal_pdf":
+            print(" / ", end='')
+            visitor.precedence = OPERATOR_PRECEDENCE["Div"] * 2 + 1
+            print_as_float(visitor, sigma)
+    if sigma and helper == "normal_pdf":
+        visitor.parens_if_needed("Div", visit)
+    else:
+        old_prec = visitor.precedence
+        visit()
+        visitor.precedence = old_prec
+def is_comprehension(node) -> bool:
+    """
+    Is this a list comprehension or generator expression that we can
+    write as a lazy iterator chain, without collecting it?
+    """
+    return (isinstance(node, (ast.ListComp, ast.GeneratorExp)) and
+        len(node.generators) == 1)
+
+def handle_numpy_call(visitor, node):
+    """
+    Numpy functions acting on whole arrays are written as a single pass
+    over the elements, fused with any arithmetic around them, so there
+    are no temporary arrays:
+
+        np.exp(-a) * b      a.iter().copied().zip(b.iter().copied())
+                                .map(|(a, b)| (-a).exp() * b).collect::<Vec<_>>()
+    """
+    name = node.func.attr
+    if name in NUMPY_FUNCTIONS:
+        NUMPY_FUNCTIONS[name](visitor, node)
+    elif not visitor.unpacking and visitor.elementwise_arrays(node):
+        visitor.visit_Elementwise(node)
+    else:
+        NUMPY_ELEMENTWISE[name](visitor, node)
+
+def handle_numpy_full(visitor, node, fill: str):
+    """
+    np.zeros(n) is written as vec![0.0; n as usize]. Two dimensional
+    arrays are only handled where they can be stored flat, which is
+    done when they are assigned.
+    """
+    if isinstance(node.args[0], ast.Tuple):
+        raise Exception("Two dimensional arrays must be local variables, only indexed, measured or reduced")
+    print("vec![", end='')
+    if fill:
+        print(fill, end='')
+    else:
+        visitor.precedence = 0
+        visitor.visit(node.args[1])
+    print("; ", end='')
+    visitor.precedence = OPERATOR_PRECEDENCE["as"] * 2
+    visitor.visit(node.args[0])
+    print(" as usize]", end='')
+
+def handle_numpy_array(visitor, node):
+    """
+    np.array(a) copies a list of floats into a new array.
+    """
+    visitor.precedence = MAX_PRECEDENCE * 2
+    visitor.visit(node.args[0])
+    print(".to_vec()", end='')
+
+def handle_numpy_reduce(visitor, node, reduction: str):
+    """
+    Reductions such as np.sum consume the elements of an array as they
+    are generated, so np.sum(a * b) needs no temporary array.
+    """
+    visitor.print_lazy_iterator(node.args[0])
+    print(reduction, end='')
+
+def handle_numpy_mean(visitor, node):
+    """
+    np.mean(a) is the sum of the elements over their number. The length
+    is read from the first array in the expression.
+    """
+    arrays = visitor.elementwise_arrays(node.args[0])
+    print("(", end='')
+    print_float_sum(visitor, node.args[0])
+    print(" / ", end='')
+    if arrays:
+        print(arrays[0], end='')
+    else:
+        visitor.precedence = MAX_PRECEDENCE * 2
+        visitor.visit(node.args[0])
+    print(".len() as f64)", end='')
+
+def handle_numpy_dot(visitor, node):
+    """
+    np.dot(a, b) of two one dimensional arrays is the sum of the products
+    of their elements, written as a single pass with no temporary.
+    """
+    product = ast.BinOp(left=node.args[0], op=ast.Mult(), right=node.args[1])
+    visitor.type_by_node[product] = visitor.type_by_node[node.args[0]]
+    visitor.type_by_node[product.op] = visitor.type_by_node[node.args[0]]
+    print_float_sum(visitor, product)
+
+def print_float_sum(visitor, node):
+    """
+    Writes the sum of a list of floats, or of an elementwise expression
+    on lists. If fast reductions are enabled, the sum is split across
+    several accumulators.
+    """
+    if visitor.is_fast_sum(node):
+        visitor.visit_Fast_Sum(node)
+    else:
+        visitor.print_lazy_iterator(node)
+        print(".sum::<f64>()", end='')
+
+def handle_numpy_where(visitor, node):
+    """
+    np.where(c, x, y) picks each element from x where c is true, and
+    otherwise from y.
+    """
+    wrap = visitor.precedence > 0
+    print("(if " if wrap else "if ", end='')
+    for i, arg in enumerate(node.args):
+        visitor.precedence = 0
+        visitor.visit(arg)
+        print([f" {OPEN_BRACE} ", f" {CLOSE_BRACE} else {OPEN_BRACE} ", f" {CLOSE_BRACE}"][i], end='')
+    print(")" if wrap else "", end='')
+
+def handle_len(visitor, node):
+    """
+    The length of a list comprehension is just the number of items
+    its iterator yields, so there is no need to collect it. The length
+    of a flat matrix or one of its rows is held in a variable.
+    """
+    dimension = visitor.matrix_dimension(node.args[0]) if node.args else ""
+    if dimension:
+        print(dimension, end='')
+    elif node.args and is_comprehension(node.args[0]):
+        visitor.print_lazy_iterator(node.args[0])
+        print(".count()", end='')
+    else:
+        handle_postfix(visitor, node, "len")
+
+def handle_sum_function(visitor, node):
+    """
+    In Python, sum(foo) adds up the items in a container or generator.
+    In Rust, we sum an iterator, which must be told the type. A
+    comprehension is summed as it is generated, without collecting it.
+    Any start value is added to the total.
+    """
+    start = node.args[1] if len(node.args) > 1 else next(
+        (k.value for k in node.keywords if k.arg == "start"), None)
+    if start:
+        def visit():
+            visitor.visit(start)
+            print(" + ", end='')
+            print_sum(visitor, node)
+        visitor.parens_if_needed("Add", visit)
+    else:
+        print_sum(visitor, node)
+
+def print_sum(visitor, node):
+    """
+    Writes the sum of the items in the first argument of a call to sum.
+    """
+    typed = visitor.type_by_node[node]
+    if typed == "f64":
+        print_float_sum(visitor, node.args[0])
+        return
+    visitor.print_lazy_iterator(node.args[0])
+    print(f".sum::<{typed}>()", end='')
+
+def handle_any_all(visitor, node, operator):
+    """
+    In Python, any(x > 0 for x in a) tests the items yielded by a
+    generator. In Rust, the test is passed to any or all as a closure,
+    so the iteration stops as soon as the result is known:
+
+        a.iter().copied().any(|x| x > 0)
+    """
+    arg = node.args[0]
+    if is_comprehension(arg):
+        visitor.do_visit_Comprehension(arg, operator)
+    else:
+        visitor.print_lazy_iterator(arg)
+        print(f".{operator}(|x| x)", end='')
+
 def handle_minmax(visitor, node, operator):
     """
     In Python, min(foo, bar) returns the smaller of foo and bar. The
     equivalent in Rust is foo.min(bar). Same with max
+
+    With a single argument, min returns the smallest item in a container
+    or generator. Floats are not totally ordered in Rust, so cannot use
+    the iterator min method. Instead, we reduce using f64::min.
     """
+    if node.keywords:
+        raise Exception(f"We do not handle {operator} with a key or default")
+    if len(node.args) == 1:
+        visitor.print_lazy_iterator(node.args[0])
+        if visitor.type_by_node[node] == "f64":
+            print(f".reduce(f64::{operator}).unwrap()", end='')
+        else:
+            print(f".{operator}().unwrap()", end='')
+        return
+
     # TODO could be clever with the parentheses here, and only output if needed
     print("(", end='')
     visitor.visit(node.args[0])
@@ -0,0 +1,431 @@
+"""
+Module supporting analysis of loops, so that work which does not
+change from one iteration to the next can be moved out of the loop.
+"""
+
+import ast
+from typing import Dict, List, Optional, Set, Tuple
+from var_analyser import get_node_path
+from var_utils import is_copy_type, constant_elements
+from buffer_analyser import is_empty_collection
+
+# Standard functions that have no side-effects and cannot panic, so
+# they can safely be evaluated before a loop, even if the loop body
+# never runs.
+PURE_FUNCTIONS = { "len", "abs", "exp", "log", "min", "max" }
+
+# Of those, the functions that given a single argument reduce a
+# container, and panic if it is empty. Only the forms comparing several
+# values are pure.
+REDUCING_FUNCTIONS = { "min", "max" }
+
+def root_name(node) -> str:
+    """
+    Given an expression such as a[3].b, returns the name of the
+    variable at its root (in this case "a"), or "" if there is none.
+    """
+    while isinstance(node, (ast.Attribute, ast.Subscript)):
+        node = node.value
+    return node.id if isinstance(node, ast.Name) else ""
+
+def is_standard_call(node) -> bool:
+    """
+    Is this a call to one of the standard functions with no side-effects,
+    such as len(a) or math.exp(x)? Methods of our own objects, such as
+    obj.log(x), may do anything.
+    """
+    if not isinstance(node, ast.Call) or node.keywords:
+        return False
+    try:
+        path = get_node_path(node.func)
+    except Exception:
+        return False
+    return (len(path) == 1 or (len(path) == 2 and path[0] == "math")) and \
+        path[-1] in PURE_FUNCTIONS
+
+def is_pure_call(node) -> bool:
+    """
+    Is this a call to a standard function with no side-effects, which
+    also cannot panic?
+    """
+    if not is_standard_call(node):
+        return False
+    return not (get_node_path(node.func)[-1] in REDUCING_FUNCTIONS and len(node.args) < 2)
+
+class WrittenNamesFinder(ast.NodeVisitor):
+    """
+    Given the AST of a loop, find all the variables that may be
+    modified within it. We are conservative: a variable passed to a
+    function we do not know, or which has a method invoked on it, is
+    assumed to be modified.
+    """
+    def __init__(self):
+        self.written: Set[str] = set()
+
+    def visit_Name(self, node):
+        if not isinstance(node.ctx, ast.Load):
+            self.written.add(node.id)
+
+    def visit_Subscript(self, node):
+        if not isinstance(node.ctx, ast.Load):
+            self.written.add(root_name(node))
+        self.generic_visit(node)
+
+    def visit_Attribute(self, node):
+        if not isinstance(node.ctx, ast.Load):
+            self.written.add(root_name(node))
+        self.generic_visit(node)
+
+    def visit_arg(self, node):
+        # arguments of lambdas are rebound on every call
+        self.written.add(node.arg)
+
+    def visit_Call(self, node):
+        if isinstance(node.func, ast.Attribute):
+            self.written.add(root_name(node.func.value))
+        if not is_standard_call(node):
+            for arg in node.args:
+                name = root_name(arg)
+                if name:
+                    self.written.add(name)
+        self.generic_visit(node)
+
+class LoopInvariantFinder(ast.NodeVisitor):
+    """
+    Given the body of a loop and the set of variables written within
+    it, finds the largest expressions that give the same result on
+    every iteration and are worth evaluating only once. These are:
+
+    1. calls to pure standard functions such as len or exp, and any
+       arithmetic including them. The results are always Copy types.
+    2. literal lists, sets and dictionaries used as the right hand
+       side of an "in" test. These are only read, so a single
+       allocation before the loop can be shared by every iteration.
+       (Literals of constants need no allocation at all, so are
+       left in place.)
+
+    Literals that are converted and moved into some other container
+    (such as "foo" in l.append("foo")) are not hoisted, as they would
+    have to be cloned on every iteration anyway.
+    """
+    def __init__(self, written: Set[str], type_by_node: Dict[object, str],
+            hoisted: Dict[object, str]):
+        self.written = written
+        self.type_by_node = type_by_node
+        self.hoisted = hoisted
+        self.invariants: List[object] = []
+
+    def is_invariant(self, node) -> bool:
+        """
+        Is this expression guaranteed to give the same value each time
+        round the loop, without side-effects or the risk of panicking?
+        """
+        if node in self.hoisted:
+            return True
+        elif isinstance(node, ast.Constant):
+            return True
+        elif isinstance(node, ast.Name):
+            return node.id not in self.written
+        elif isinstance(node, ast.Attribute):
+            return root_name(node) not in self.written and root_name(node) != ""
+        elif isinstance(node, ast.BinOp):
+            # integer division and modulus can panic in Rust
+            if (isinstance(node.op, (ast.Div, ast.FloorDiv, ast.Mod)) and
+                    self.type_by_node.get(node) != "f64"):
+                return False
+            return self.is_invariant(node.left) and self.is_invariant(node.right)
+        elif isinstance(node, ast.UnaryOp):
+            return self.is_invariant(node.operand)
+        elif isinstance(node, ast.BoolOp):
+            return all(self.is_invariant(v) for v in node.values)
+        elif isinstance(node, ast.Compare):
+            return (self.is_invariant(node.left) and
+                all(self.is_invariant(c) for c in node.comparators))
+        elif isinstance(node, ast.Call):
+            return is_pure_call(node) and all(self.is_invariant(a) for a in node.args)
+        elif isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+            return all(self.is_invariant(e) for e in node.elts)
+        elif isinstance(node, ast.Dict):
+            return (all(k is not None and self.is_invariant(k) for k in node.keys) and
+                all(self.is_invariant(v) for v in node.values))
+        else:
+            return False
+
+    def contains_pure_call(self, node) -> bool:
+        return any(is_pure_call(n) for n in ast.walk(node))
+
+    def visit(self, node):
+        # never hoist the same expression twice (e.g. from nested loops)
+        if node in self.hoisted:
+            return
+        if (isinstance(node, (ast.BinOp, ast.UnaryOp, ast.Call)) and
+                is_copy_type(self.type_by_node.get(node, "")) and
+                self.contains_pure_call(node) and self.is_invariant(node)):
+            self.invariants.append(node)
+            return
+        super().visit(node)
+
+    def visit_Compare(self, node):
+        self.visit(node.left)
+        for op, comparator in zip(node.ops, node.comparators):
+            if (isinstance(op, (ast.In, ast.NotIn)) and
+                    isinstance(comparator, (ast.List, ast.Set, ast.Dict)) and
+                    constant_elements(comparator) is None and
+                    comparator not in self.hoisted and
+                    self.is_invariant(comparator)):
+                self.invariants.append(comparator)
+            else:
+                self.visit(comparator)
+
+def find_loop_invariants(node, type_by_node: Dict[object, str],
+        hoisted: Dict[object, str]) -> List[object]:
+    """
+    Given a For or While node, returns a list of the expression nodes
+    within it that can be evaluated once before the loop starts.
+    """
+    finder = WrittenNamesFinder()
+    finder.visit(node)
+
+    invariants = LoopInvariantFinder(finder.written, type_by_node, hoisted)
+    if isinstance(node, ast.While):
+        invariants.visit(node.test)
+    for line in node.body:
+        invariants.visit(line)
+    return invariants.invariants
+
+# Nodes whose children are only read, so can be references rather than
+# owned values. (Subscript indices are wrapped in Index nodes before
+# Python 3.9.)
+READING_PARENTS = (ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare,
+    ast.Subscript, ast.Attribute, ast.AugAssign, ast.If, ast.While,
+    ast.IfExp, ast.Assert, ast.Expr) + ((ast.Index,) if hasattr(ast, "Index") else ())
+
+# Functions that only read their arguments
+READING_FUNCTIONS = { "print", "len" }
+
+class TargetUsageFinder(ast.NodeVisitor):
+    """
+    Given the names bound by a loop or comprehension, finds whether
+    any of them escapes the iteration: stored, returned, moved into
+    some other variable or container, or passed to a function that
+    might keep it. Also finds whether any has a method called on it,
+    such as v.append(x), which may change it.
+    """
+    def __init__(self, names: Set[str], ignored: Set[object] = set()):
+        self.names = names
+        self.ignored = ignored
+        self.parents: List[object] = []
+        self.escapes = False
+        self.method_called = False
+
+    def visit(self, node):
+        if node in self.ignored:
+            return
+        if isinstance(node, ast.Name) and node.id in self.names:
+            if self.is_method_call(node):
+                self.method_called = True
+            elif not self.is_read_only(node):
+                self.escapes = True
+            return
+        self.parents.append(node)
+        super().visit(node)
+        self.parents.pop()
+
+    def is_method_call(self, node) -> bool:
+        if len(self.parents) < 2 or not isinstance(self.parents[-1], ast.Attribute):
+            return False
+        call = self.parents[-2]
+        return isinstance(call, ast.Call) and call.func is self.parents[-1]
+
+    def is_read_only(self, node) -> bool:
+        if not isinstance(node.ctx, ast.Load) or not self.parents:
+            return False
+        parent = self.parents[-1]
+        if isinstance(parent, ast.AugAssign):
+            return node is parent.value
+        if isinstance(parent, ast.BinOp) and isinstance(parent.op, ast.Add):
+            # adding strings needs an owned value on the left
+            return False
+        if isinstance(parent, READING_PARENTS):
+            return True
+        if isinstance(parent, ast.Call):
+            return (isinstance(parent.func, ast.Name) and
+                parent.func.id in READING_FUNCTIONS)
+        return False
+
+def targets_only_read(target, nodes) -> bool:
+    """
+    Given the target of a for loop or comprehension, and the nodes
+    (such as the body) that use it, returns True if the values bound
+    to the target are only ever read, so can be borrowed rather than
+    owned.
+    """
+    names = {n.id for n in ast.walk(target) if isinstance(n, ast.Name)}
+    finder = TargetUsageFinder(names)
+    for node in nodes:
+        finder.visit(node)
+    return not finder.escapes and not finder.method_called
+
+def draining_loop(node):
+    """
+    If the given while loop empties a dict one item at a time, as in
+
+        while d:
+            k, v = d.popitem()
+            ...
+
+    and the rest of the body neither uses the dict nor leaves the loop
+    early, returns the statement popping each item. Otherwise None.
+    """
+    if not isinstance(node.test, ast.Name) or not node.body or node.orelse:
+        return None
+    first = node.body[0]
+    if (not isinstance(first, ast.Assign) or len(first.targets) != 1 or
+            not isinstance(first.value, ast.Call) or first.value.args or
+            not isinstance(first.value.func, ast.Attribute) or
+            first.value.func.attr != "popitem" or
+            not isinstance(first.value.func.value, ast.Name) or
+            first.value.func.value.id != node.test.id):
+        return None
+    for line in node.body[1:]:
+        for n in ast.walk(line):
+            if isinstance(n, ast.Name) and n.id == node.test.id:
+                return None
+            if isinstance(n, (ast.Break, ast.Return, ast.Yield)):
+                return None
+    return first
+
+class ScratchCollectionFinder(ast.NodeVisitor):
+    """
+    Records the loops enclosing each use of a variable, and each
+    assignment of an empty collection to a variable within a loop.
+    """
+    def __init__(self):
+        self.loops: List[object] = []
+        self.uses: Dict[str, List[List[object]]] = {}
+        self.stores: Dict[str, int] = {}
+        self.candidates: List[Tuple[object, List[object]]] = []
+
+    def visit_loop(self, node):
+        self.loops.append(node)
+        self.generic_visit(node)
+        self.loops.pop()
+
+    def visit_For(self, node):
+        self.visit_loop(node)
+
+    def visit_While(self, node):
+        self.visit_loop(node)
+
+    def visit_Assign(self, node):
+        if (self.loops and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name) and
+                is_empty_collection(node.value)):
+            self.candidates.append((node, list(self.loops)))
+        self.generic_visit(node)
+
+    def visit_AnnAssign(self, node):
+        if self.loops and isinstance(node.target, ast.Name) and is_empty_collection(node.value):
+            self.candidates.append((node, list(self.loops)))
+        self.generic_visit(node)
+
+    def visit_Name(self, node):
+        self.uses.setdefault(node.id, []).append(list(self.loops))
+        if not isinstance(node.ctx, ast.Load):
+            self.stores[node.id] = self.stores.get(node.id, 0) + 1
+
+def scratch_name(assign) -> str:
+    """
+    Returns the name of the variable created by an Assign or AnnAssign.
+    """
+    return assign.target.id if isinstance(assign, ast.AnnAssign) else assign.targets[0].id
+
+def find_scratch_collections(node) -> Dict[object, object]:
+    """
+    Given a function, finds the collections that are created empty on
+    every iteration of a loop, then filled and read without escaping
+    the loop:
+
+        for x in a:
+            seen = set()
+            ...
+
+    Rather than allocating a new collection each time round, we can
+    create it once before the loop and clear it on each iteration,
+    keeping its capacity. Returns a map from each such assignment to
+    the outermost loop before which the collection can be created.
+    """
+    finder = ScratchCollectionFinder()
+    finder.visit(node)
+
+    scratch = {}
+    for assign, loops in finder.candidates:
+        name = scratch_name(assign)
+        if finder.stores[name] != 1:
+            continue
+        outermost = next((loop for loop in loops
+            if all(loop in enclosing for enclosing in finder.uses[name])), None)
+        if outermost is None:
+            continue
+        usage = TargetUsageFinder({name}, {assign})
+        usage.visit(outermost)
+        if not usage.escapes:
+            scratch[assign] = outermost
+    return scratch
+
+# Operators of the reductions we can split across several accumulators,
+# and the value each accumulator starts with
+REDUCTION_IDENTITIES = { "Add": "0.0", "Mult": "1.0" }
+
+def float_slice(node, type_by_node: Dict[object, str]) -> bool:
+    typed = type_by_node.get(node, "")
+    return isinstance(node, ast.Name) and typed in ("&[f64]", "Vec<f64>")
+
+def reduction_loop(node, type_by_node: Dict[object, str]) -> Optional[Tuple[List[str], List[str]]]:
+    """
+    Is this a loop that only accumulates floats from one or more lists,
+    such as:
+
+        for x, y in zip(a, b):
+            total += x * y
+
+    If so, returns the names of the lists and of the loop variables
+    bound to their elements. Otherwise returns None.
+
+    The accumulators must be float variables, only added to (or
+    multiplied into), and not otherwise read within the loop.
+    """
+    if node.orelse or not node.body:
+        return None
+    if float_slice(node.iter, type_by_node) and isinstance(node.target, ast.Name):
+        arrays = [node.iter.id]
+        targets = [node.target.id]
+    elif (isinstance(node.iter, ast.Call) and isinstance(node.iter.func, ast.Name) and
+            node.iter.func.id == "zip" and not node.iter.keywords and
+            all(float_slice(a, type_by_node) for a in node.iter.args) and
+            isinstance(node.target, ast.Tuple) and
+            len(node.target.elts) == len(node.iter.args) and
+            all(isinstance(e, ast.Name) for e in node.target.elts)):
+        arrays = [a.id for a in node.iter.args]
+        targets = [e.id for e in node.target.elts]
+    else:
+        return None
+
+    accumulators = set()
+    for line in node.body:
+        if (not isinstance(line, ast.AugAssign) or not isinstance(line.target, ast.Name) or
+                line.op.__class__.__name__ not in REDUCTION_IDENTITIES or
+                type_by_node.get(line.target) != "f64"):
+            return None
+        accumulators.add(line.target.id)
+    if accumulators & set(targets) or len(accumulators) != len(node.body):
+        return None
+
+    # the values added must not depend on the accumulators, or on anything
+    # else that changes within the loop
+    for line in node.body:
+        for n in ast.walk(line.value):
+            if isinstance(n, ast.Name) and n.id in accumulators:
+                return None
+            if isinstance(n, (ast.NamedExpr, ast.Lambda, ast.Yield, ast.YieldFrom)):
+                return None
+    return arrays, targets
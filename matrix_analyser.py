@@ -0,0 +1,242 @@
+"""
+Module supporting the storage of rectangular matrices as a single flat
+list. A list of lists in Rust is a Vec of separately allocated Vecs, so
+reading an element follows two pointers and checks two bounds. Where a
+matrix is built with a known number of rows and columns, and only ever
+accessed one element at a time, we hold it in one contiguous Vec in
+row-major order instead, and index it as a[i * columns + j].
+
+Two dimensional numpy arrays, such as np.zeros((n, m)), are stored in
+the same way.
+"""
+
+import ast
+from typing import Dict, List, Optional, Set, Tuple
+from library_functions import NUMPY_MODULES
+
+# numpy functions creating an array of the given shape, with the
+# constant fill they use, or None if it is the second argument
+NUMPY_CONSTRUCTORS = { "zeros": 0.0, "ones": 1.0, "full": None }
+
+# numpy reductions over every element of an array, which need not
+# know its shape
+NUMPY_WHOLE_REDUCTIONS = { "sum", "mean", "max", "min" }
+
+class MatrixShape:
+    """
+    The shape of a matrix created as [[fill] * columns for _ in range(rows)]
+    or np.full((rows, columns), fill)
+    """
+    def __init__(self, rows, columns, fill):
+        self.rows = rows
+        self.columns = columns
+        self.fill = fill
+
+def repeated_element(node):
+    """
+    If the given expression is a single element list repeated, such as
+    [0.0] * n or n * [0.0], returns the element and the number of times
+    it is repeated. Otherwise returns None.
+    """
+    if not isinstance(node, ast.BinOp) or not isinstance(node.op, ast.Mult):
+        return None
+    for row, count in ((node.left, node.right), (node.right, node.left)):
+        if isinstance(row, ast.List) and len(row.elts) == 1:
+            return row.elts[0], count
+    return None
+
+def is_numpy_function(node, names) -> bool:
+    """
+    Is this a call to one of the given numpy functions?
+    """
+    return (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and
+        isinstance(node.func.value, ast.Name) and node.func.value.id in NUMPY_MODULES and
+        node.func.attr in names)
+
+def find_numpy_arrays(node) -> Set[str]:
+    """
+    Given a function, returns the names of the arguments annotated as
+    numpy arrays, and of the variables assigned from numpy functions or
+    from other arrays, such as b in b = np.zeros(n) or c in c = a * 2.0.
+    Lists of floats are held in the same way as arrays, but only arrays
+    act elementwise in augmented assignment. For a list, a += b extends.
+    Some of the variables may be scalars, such as np.sum(a), so callers
+    must also check the type.
+    """
+    arrays = set()
+    for a in node.args.args:
+        annotation = a.annotation
+        if (isinstance(annotation, ast.Attribute) and annotation.attr == "ndarray" or
+                isinstance(annotation, ast.Name) and annotation.id == "ndarray"):
+            arrays.add(a.arg)
+
+    assigned = [(n.targets[0].id, n.value) for n in ast.walk(node)
+        if isinstance(n, ast.Assign) and len(n.targets) == 1 and
+            isinstance(n.targets[0], ast.Name)]
+    changed = True
+    while changed:
+        changed = False
+        for name, value in assigned:
+            if name not in arrays and any(
+                    isinstance(n, ast.Name) and (n.id in arrays or n.id in NUMPY_MODULES)
+                    for n in ast.walk(value)):
+                arrays.add(name)
+                changed = True
+    return arrays
+
+def numpy_matrix_shape(node) -> Optional[MatrixShape]:
+    """
+    Is this expression a new two dimensional numpy array of constants,
+    such as np.zeros((n, m))? If so, returns its shape.
+    """
+    if (not is_numpy_function(node, NUMPY_CONSTRUCTORS) or not node.args or
+            not isinstance(node.args[0], ast.Tuple) or len(node.args[0].elts) != 2):
+        return None
+    fill = NUMPY_CONSTRUCTORS[node.func.attr]
+    if fill is not None:
+        fill = ast.Constant(value=fill, kind=None)
+    elif len(node.args) == 2:
+        fill = node.args[1]
+    if not isinstance(fill, ast.Constant):
+        return None
+    rows, columns = node.args[0].elts
+    return MatrixShape(rows, columns, fill)
+
+def matrix_shape(node) -> Optional[MatrixShape]:
+    """
+    Is this expression a new rectangular matrix of constants, such as
+    [[0.0] * m for _ in range(n)]? If so, returns its shape.
+    """
+    if is_numpy_function(node, NUMPY_CONSTRUCTORS):
+        return numpy_matrix_shape(node)
+    if not isinstance(node, ast.ListComp) or len(node.generators) != 1:
+        return None
+    generator = node.generators[0]
+    repeated = repeated_element(node.elt)
+    if (repeated is None or generator.ifs or not isinstance(generator.target, ast.Name) or
+            not isinstance(generator.iter, ast.Call) or
+            not isinstance(generator.iter.func, ast.Name) or
+            generator.iter.func.id != "range" or len(generator.iter.args) != 1):
+        return None
+    fill, columns = repeated
+    if not isinstance(fill, ast.Constant):
+        return None
+
+    # each row must be the same, so cannot depend on the loop variable
+    rows = generator.iter.args[0]
+    target = generator.target.id
+    if any(isinstance(n, ast.Name) and n.id == target for n in ast.walk(columns)):
+        return None
+    return MatrixShape(rows, columns, fill)
+
+def is_negative_index(node) -> bool:
+    """
+    Is this index a negative constant, such as a[-1], which counts back
+    from the end of the list?
+    """
+    if hasattr(ast, "Index") and isinstance(node, ast.Index):
+        node = node.value
+    return (isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub) and
+        isinstance(node.operand, ast.Constant))
+
+def matrix_indices(node) -> Optional[Tuple[object, object]]:
+    """
+    If the given subscript reads a single element of a matrix, as
+    a[i][j] or a[i, j], returns the matrix and the row and column
+    indices. Otherwise returns None.
+    """
+    index = node.slice
+    if hasattr(ast, "Index") and isinstance(index, ast.Index):
+        index = index.value
+    if isinstance(index, ast.Tuple) and len(index.elts) == 2:
+        matrix = node.value
+        row, column = index.elts
+    elif isinstance(node.value, ast.Subscript) and not isinstance(index, ast.Slice):
+        matrix = node.value.value
+        row, column = node.value.slice, node.slice
+    else:
+        return None
+    if (not isinstance(matrix, ast.Name) or
+            any(isinstance(i, ast.Slice) or is_negative_index(i) for i in (row, column))):
+        return None
+    return matrix, row, column
+
+def shape_index(node) -> Optional[int]:
+    """
+    If the given subscript is a.shape[0] or a.shape[1], returns the
+    dimension. Otherwise returns None.
+    """
+    index = node.slice
+    if hasattr(ast, "Index") and isinstance(index, ast.Index):
+        index = index.value
+    if (isinstance(node.value, ast.Attribute) and node.value.attr == "shape" and
+            isinstance(node.value.value, ast.Name) and
+            isinstance(index, ast.Constant) and index.value in (0, 1)):
+        return index.value
+    return None
+
+class MatrixUsageFinder(ast.NodeVisitor):
+    """
+    Finds the variables in a function which are ever used other than as
+    a[i][j], a[i, j], len(a), len(a[i]), a.shape[0], a.shape[1] or a
+    numpy reduction over the whole of a, or by the given assignment
+    targets. Negative indices count from the end of a row or of the
+    matrix, so cannot be flattened.
+    """
+    def __init__(self, allowed: Set[object]):
+        self.allowed = allowed
+        self.escaping: Set[str] = set()
+
+    def visit_Subscript(self, node):
+        indices = matrix_indices(node)
+        if indices is not None:
+            self.allowed.add(indices[0])
+        elif shape_index(node) is not None:
+            self.allowed.add(node.value.value)
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        if (is_numpy_function(node, NUMPY_WHOLE_REDUCTIONS) and len(node.args) == 1 and
+                isinstance(node.args[0], ast.Name)):
+            self.allowed.add(node.args[0])
+        elif (isinstance(node.func, ast.Name) and node.func.id == "len" and
+                len(node.args) == 1):
+            arg = node.args[0]
+            if isinstance(arg, ast.Subscript) and not isinstance(arg.slice, ast.Slice):
+                arg = arg.value
+            if isinstance(arg, ast.Name):
+                self.allowed.add(arg)
+        self.generic_visit(node)
+
+    def visit_Name(self, node):
+        if node not in self.allowed:
+            self.escaping.add(node.id)
+
+def find_flat_matrices(node) -> Dict[str, Tuple[object, MatrixShape]]:
+    """
+    Given a function, finds the local matrices that can be stored flat.
+    Each is created just once as a rectangular matrix and never passed,
+    returned, reassigned or used a row at a time. Returns a map from the
+    name of each matrix to the statement creating it and its shape.
+    """
+    created: Dict[str, List[Tuple[object, Optional[MatrixShape]]]] = {}
+    targets = set()
+    for n in ast.walk(node):
+        if (isinstance(n, ast.Assign) and len(n.targets) == 1 and
+                isinstance(n.targets[0], ast.Name)):
+            created.setdefault(n.targets[0].id, []).append((n, matrix_shape(n.value)))
+            targets.add(n.targets[0])
+        elif isinstance(n, ast.AnnAssign) and isinstance(n.target, ast.Name) and n.value:
+            created.setdefault(n.target.id, []).append((n, matrix_shape(n.value)))
+            targets.add(n.target)
+
+    finder = MatrixUsageFinder(targets)
+    finder.visit(node)
+    args = {a.arg for a in node.args.args}
+
+    matrices = {}
+    for name, assignments in created.items():
+        if (len(assignments) == 1 and assignments[0][1] is not None and
+                name not in finder.escaping and name not in args):
+            matrices[name] = assignments[0]
+    return matrices
@@ -7,37 +7,70 @@ import sys
 from enum import Enum
 import filecmp
 import os
-from typing import Dict, Tuple, List
+import io
+import contextlib
+from typing import Dict, Optional, Set, Tuple, List
 from var_analyser import VariableAnalyser, FunctionHeaderFinder, \
     FunctionHeader, ClassHeader, get_node_path
 from var_utils import type_from_annotation, container_type_needed, is_list, \
     detemplatise, extract_container, is_reference_type, is_iterator_type, \
-    is_dict, is_string, is_int, container_type, dereference
+    is_dict, is_string, is_int, container_type, dereference, constant_elements, \
+    strip_container, is_copy_type, is_function_type, \
+    is_boxed_function_type, boxed_function_type, CONTAINER_CONVERSIONS
 from dependency_analyser import DependencyAnalyser
+from loop_analyser import find_loop_invariants, targets_only_read, \
+    find_scratch_collections, scratch_name, reduction_loop, float_slice, \
+    draining_loop, REDUCTION_IDENTITIES
+from generator_analyser import analyse_generator, names_in, is_jump_statement, mutated_names
+from buffer_analyser import output_buffer
+from matrix_analyser import find_flat_matrices, repeated_element, matrix_indices, \
+    shape_index, find_numpy_arrays, MatrixShape
+from string_analyser import find_borrowed_strings, is_borrowed_string, static_functions, \
+    find_checked_strings, BORROWED_STRING, COW_STRING
 from library_functions import STANDARD_METHODS, STANDARD_FUNCTIONS, \
-    print_iter_if_needed, add_reference_if_needed, \
+    STANDARD_BLOCK_METHODS, \
+    print_iter_if_needed, add_reference_if_needed, is_comprehension, iter_elements, \
     OPERATOR_PRECEDENCE, MAX_PRECEDENCE, \
-    REPLACE_CONSTANTS, ALLOWED_COMPARISON_OPERATORS
+    REPLACE_CONSTANTS, ALLOWED_COMPARISON_OPERATORS, \
+    NUMPY_ELEMENTWISE_FUNCTIONS, is_numpy_call, handle_numpy_call, \
+    MATH_CONSTANTS, is_statistics_call, handle_statistics_call, \
+    normal_dist, handle_normal_dist, print_float_receiver, \
+    is_random_call, handle_random_call
 
 OPEN_BRACE = '{'
 CLOSE_BRACE = '}'
+
+# Constant powers up to this are written as products, e.g. x * x * x
+MAX_INLINE_POWER = 4
+
+# Number of independent accumulators used by fast reductions
+REDUCTION_LANES = 8
+
+# Filtered comprehensions reserve room for at most this many items up
+# front, however many their source may yield
+MAX_RESERVED_CAPACITY = 1024
+
+# Membership tests against constant literals with up to this many
+# elements are written as a match. Larger ones use a binary search.
+MAX_MATCHED_ELEMENTS = 8
+
 # ALLOWED_BINARY_OPERATORS = { "Add", "Mult", "Sub", "Div", "FloorDiv",
 #     "Mod", "LShift", "RShift", "BitOr", "BitXor", "BitAnd" }
 
-def target_as_string(node) -> str:
+def target_as_string(node, mutable: Set[str] = set()) -> str:
     """
     Given a node that is either a Tuple or a Name, return
-    a representation as a string
+    a representation as a string, binding the given names mutably
     """
     if isinstance(node, ast.Name):
-        return node.id
+        return ("mut " if node.id in mutable else "") + node.id
     elif isinstance(node, ast.Tuple):
         result = "("
         # separator = "&"         # iterator returns references. Convert these to values
         separator = ""
         for element in node.elts:
             result += separator
-            result += target_as_string(element)
+            result += target_as_string(element, mutable)
             # separator = ", &"
             separator = ", "
         result += ")"
@@ -45,6 +78,34 @@ def target_as_string(node) -> str:
     else:
         raise Exception("We only support tuples and names as the target of comprehensions")
 
+def generator_member_type(typed: str) -> str:
+    """
+    Returns the type of a member of a generator struct, holding a
+    variable of the given type. References borrow for the lifetime of
+    the generator. Iterators are not handled here, as the struct is
+    generic over their types.
+    """
+    if is_reference_type(typed):
+        return f"&'a {typed[1:]}"
+    else:
+        return typed
+
+def generator_parameter(generics: Dict[str, str], typed: str) -> str:
+    """
+    Adds a type parameter for an iterator over the elements of the given
+    type to a generator struct, and returns its name.
+    """
+    name = f"I{len(generics)}" if generics else "I"
+    generics[name] = f"Iterator<Item = {strip_container(typed)}>"
+    return name
+
+def generic_list(parameters: List[str]) -> str:
+    """
+    Returns the given lifetimes and type parameters in angle brackets,
+    or nothing if there are none.
+    """
+    return f"<{', '.join(parameters)}>" if parameters else ""
+
 def string_repeat_needed(visitor, node):
     """
     Should we treat this * operator as a string repeat?
@@ -61,10 +122,16 @@ class RustGenerator(ast.NodeVisitor):
     def __init__(
             self, 
             headers: Dict[str, FunctionHeader],
-            class_headers: Dict[str, ClassHeader]):
+            class_headers: Dict[str, ClassHeader],
+            enum_dispatch: bool = False,
+            fast_reductions: bool = False,
+            fused_multiply_add: bool = False):
 
         self.headers = headers
         self.class_headers = class_headers
+        self.enum_dispatch = enum_dispatch
+        self.fast_reductions = fast_reductions
+        self.fused_multiply_add = fused_multiply_add
         self.current_self = ""
         self.indent = 0
         self.next_separator = ""
@@ -73,12 +140,44 @@ class RustGenerator(ast.NodeVisitor):
         self.variables = set()
         self.mutable_vars = set()
         self.mutable_ref_vars = set()
+        self.constant_containers = {}
+        self.array_vars = {}
+        self.in_place_loops: Set[object] = set()
+        self.numpy_arrays: Set[str] = set()
+        self.renamed_vars = {}
         self.type_by_node = {}
         self.target = ""
         self.unpacking = False
+        self.borrowing = False
+        self.block_statement = False
         self.is_init = False
         self.in_trait = False
         self.in_trait_definition = False
+        self.trait_signatures: Dict[str, Dict[str, str]] = {}
+        self.hoisted: Dict[object, str] = {}
+        self.scratch: Dict[object, object] = {}
+        self.matrices: Dict[str, Tuple[object, MatrixShape]] = {}
+        self.in_generator = False
+        self.yield_state = None
+        self.generator_state = None
+        self.generator_jumps: Set[object] = set()
+        self.finished_state = None
+        self.borrowed_strings = set()
+        self.ascii_strings: Set[str] = set()
+        self.string_return = ""
+        self.lifetime = ""
+        self.output_buffer = ""
+        self.generator_structs: Dict[str, Optional[str]] = {}
+
+    def visit(self, node):
+        """
+        Expressions that have been hoisted out of a loop are replaced
+        by the name of the variable holding their value.
+        """
+        if node in self.hoisted:
+            print(self.hoisted[node], end='')
+        else:
+            return super().visit(node)
 
     def pretty(self):
         return '    ' * self.indent
@@ -121,7 +220,13 @@ class RustGenerator(ast.NodeVisitor):
         if prec < self.precedence:
             print(")", end='')
 
-    def visit_and_optionally_convert(self, node):
+    def visit_and_optionally_convert(self, node, convert: bool = True):
+        if not convert:
+            self.visit(node)
+            return
+        if isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Slice):
+            self.visit_Slice_Subscript(node, True)
+            return
         conversion = container_type_needed(node, self.type_by_node)
         if conversion:
             self.precedence = MAX_PRECEDENCE * 2
@@ -188,8 +293,9 @@ class RustGenerator(ast.NodeVisitor):
             return True, True, True, isdict
 
         elif isinstance(target, ast.Attribute):
-            # Member variable such as self.a or foo.b
-            return False, False, True, False
+            # Member variable such as self.a or foo.b. These are only
+            # declared in __init__, where they are written as locals.
+            return False, not self.is_init, True, False
 
         else:
             # unrecognised type. Add a warning and continue
@@ -223,36 +329,338 @@ class RustGenerator(ast.NodeVisitor):
         # method not found
         return ""
 
-    def unpack_lists(self, node) -> List[str]:
+    def elementwise_arrays(self, node) -> List[str]:
         """
-        Is this a binary operator that we want to unpack, as its
-        operands are lists? If so, return a list of all the
-        operand variables that are lists, including those that are
-        included indirectly, as operands of operands.
+        Is this an expression acting on each element of one or more
+        lists or numpy arrays in turn, such as (a + b) * 2.0 or
+        np.exp(-a)? If so, return the names of the lists, in the order
+        they first appear. Otherwise return an empty list.
         """
-        if self.unpacking:
-            return None     # do not recurse
+        if isinstance(node, ast.Name):
+            return []       # just the list itself
+        arrays = []
+        if not self.find_elementwise_arrays(node, arrays):
+            return []
+        return arrays
+
+    def find_elementwise_arrays(self, node, arrays: List[str],
+            scalars: Optional[List[object]] = None) -> bool:
+        """
+        Not part of the visitor pattern. Adds to arrays the names of
+        the lists used by an elementwise expression, and to scalars any
+        scalar subexpressions that read the lists, such as np.mean(a)
+        in a - np.mean(a). Returns False if the expression cannot be
+        written as a single pass over them.
+        """
+        typed = self.type_by_node.get(node) or " "
+        if isinstance(node, ast.Name) and is_list(typed) and node.id in self.variables:
+            if node.id not in arrays:
+                arrays.append(node.id)
+            return True
+        elif isinstance(node, ast.BinOp):
+            return (self.find_elementwise_arrays(node.left, arrays, scalars) and
+                self.find_elementwise_arrays(node.right, arrays, scalars))
+        elif isinstance(node, ast.UnaryOp):
+            return self.find_elementwise_arrays(node.operand, arrays, scalars)
+        elif isinstance(node, ast.Compare):
+            return all(self.find_elementwise_arrays(n, arrays, scalars)
+                for n in [node.left] + node.comparators)
+        elif isinstance(node, ast.BoolOp):
+            return all(self.find_elementwise_arrays(n, arrays, scalars) for n in node.values)
+        elif (isinstance(node, ast.Call) and is_numpy_call(node) and
+                node.func.attr in NUMPY_ELEMENTWISE_FUNCTIONS):
+            return all(self.find_elementwise_arrays(n, arrays, scalars) for n in node.args)
+        elif is_copy_type(typed):
+            # a scalar, which is used for every element. Within the
+            # loop, the names of the lists refer to their elements, so
+            # a scalar reading a list is worked out before the loop.
+            if scalars is not None and any(isinstance(n, ast.Name) and
+                    is_list(self.type_by_node.get(n) or " ") for n in ast.walk(node)):
+                scalars.append(node)
+            return True
+        else:
+            return False
 
-        elif not is_list(self.type_by_node[node]):
-            return None     # not a list
-        
-        elif isinstance(node, ast.Name) and node.id in self.variables:
-            # found a variable which is a list
-            return [node.id]
+    def print_elementwise_iterator(self, node, arrays: List[str]):
+        """
+        Not part of the visitor pattern. Writes an elementwise expression
+        as a single iterator over its lists, zipped together, with the
+        expression applied to each element:
 
-        elif isinstance(node, ast.BinOp):
-            left = self.unpack_lists(node.left)
-            right = self.unpack_lists(node.right)
-            result = []
-            if left:
-                result.extend(left)
-            if right:
-                result.extend(right)
-            return result
-        
+            (a + b) * c     a.iter().copied().zip(b.iter().copied())
+                                .zip(c.iter().copied()).map(|((a, b), c)| (a + b) * c)
+
+        Within the closure, the name of each list refers to its element.
+        Scalars that read the lists are worked out first, in a block
+        around the iterator:
+
+            a - np.mean(a)  { let tmp = (a.iter().copied().sum::<f64>() / a.len() as f64);
+                                a.iter().copied().map(move |a| a - tmp) }
+        """
+        scalars: List[object] = []
+        self.find_elementwise_arrays(node, [], scalars)
+        if scalars:
+            print(f"{OPEN_BRACE} ", end='')
+            self.print_elementwise_scalars(scalars, True)
+        types = {n.id: self.type_by_node[n] for n in ast.walk(node)
+            if isinstance(n, ast.Name) and n.id in arrays}
+        pattern = ""
+        for i, name in enumerate(arrays):
+            typed = types[name]
+            if i == 0:
+                print(f"{name}{iter_elements(typed, False)}", end='')
+                pattern = name
+            else:
+                print(f".zip({name}{iter_elements(typed, False)})", end='')
+                pattern = f"({pattern}, {name})"
+        print(f".map({'move ' if scalars else ''}|{pattern}| ", end='')
+        self.unpacking = True
+        self.precedence = 0
+        self.visit(node)
+        self.unpacking = False
+        print(")", end='')
+        if scalars:
+            print(f" {CLOSE_BRACE}", end='')
+            self.forget_elementwise_scalars(scalars)
+
+    def print_elementwise_scalars(self, scalars: List[object], inline: bool):
+        """
+        Not part of the visitor pattern. Writes a let for each scalar
+        read from the lists of an elementwise expression, so it is worked
+        out once rather than for every element. Within the expression,
+        the scalar is then replaced by its variable.
+        """
+        for scalar in scalars:
+            name = self.temp_variable()
+            print(f"let {name} = " if inline else f"{self.pretty()}let {name} = ", end='')
+            self.precedence = 0
+            self.visit(scalar)
+            print("; " if inline else ";", end='' if inline else '\n')
+            self.hoisted[scalar] = name
+
+    def forget_elementwise_scalars(self, scalars: List[object]):
+        """
+        Not part of the visitor pattern. Stops replacing the scalars of
+        an elementwise expression by their variables.
+        """
+        for scalar in scalars:
+            del self.hoisted[scalar]
+
+    def print_reduction_lanes(self, arrays: List[str], body):
+        """
+        Not part of the visitor pattern. Writes loops over the given
+        lists in chunks of REDUCTION_LANES elements, followed by a loop
+        over the elements left over. The body is called with the names
+        of the chunks, and writes the statements for the element at
+        index lane within them. A list zipped with itself, as in
+        zip(a, a), is split into chunks just once.
+        """
+        unique = list(dict.fromkeys(arrays))
+
+        # like zip, stop at the end of the shortest list
+        length = ""
+        if len(unique) > 1:
+            length = self.temp_variable()
+            lengths = [f"{array}.len()" for array in unique]
+            print(f"{self.pretty()}let {length} = {lengths[0]}", end='')
+            for other in lengths[1:]:
+                print(f".min({other})", end='')
+            print(";")
+        for array in unique:
+            sliced = f"{array}[..{length}]" if length else array
+            print(f"{self.pretty()}let {array}_chunks = {sliced}.chunks_exact({REDUCTION_LANES});")
+            print(f"{self.pretty()}let {array}_rest = {array}_chunks.remainder();")
+        pattern = f"{unique[0]}_chunk"
+        iterator = f"{unique[0]}_chunks"
+        for array in unique[1:]:
+            pattern = f"({pattern}, {array}_chunk)"
+            iterator += f".zip({array}_chunks)"
+        print(f"{self.pretty()}for {pattern} in {iterator} {OPEN_BRACE}")
+        self.add_pretty(1)
+        print(f"{self.pretty()}for lane in 0..{REDUCTION_LANES} {OPEN_BRACE}")
+        self.add_pretty(1)
+        body([f"{array}_chunk" for array in arrays])
+        self.add_pretty(-1)
+        print(f"{self.pretty()}{CLOSE_BRACE}")
+        self.add_pretty(-1)
+        print(f"{self.pretty()}{CLOSE_BRACE}")
+        print(f"{self.pretty()}for lane in 0..{arrays[0]}_rest.len() {OPEN_BRACE}")
+        self.add_pretty(1)
+        body([f"{array}_rest" for array in arrays])
+        self.add_pretty(-1)
+        print(f"{self.pretty()}{CLOSE_BRACE}")
+
+    def visit_Reduction_For(self, node, arrays: List[str], targets: List[str]):
+        """
+        Not part of the visitor pattern. Only used if fast reductions
+        are enabled. A loop accumulating floats is written with several
+        independent accumulators, each summing every REDUCTION_LANES-th
+        element, which are combined at the end:
+
+            for x, y in zip(a, b):
+                total += x * y
+
+            {
+                let a_chunks = a.chunks_exact(8);
+                ...
+                let mut total_lanes = [0.0; 8];
+                for (a_chunk, b_chunk) in a_chunks.zip(b_chunks) {
+                    for lane in 0..8 {
+                        let (x, y) = (a_chunk[lane], b_chunk[lane]);
+                        total_lanes[lane] += x * y;
+                    }
+                }
+                ...
+                total += total_lanes.iter().sum::<f64>();
+            }
+
+        The accumulators are independent, so the additions can be done
+        in parallel by SIMD instructions. However, floating point
+        addition is not associative, so the result may differ from
+        Python's in the last few bits.
+        """
+        self.variables |= set(targets)
+        print(f"{self.pretty()}{OPEN_BRACE}")
+        self.add_pretty(1)
+        for line in node.body:
+            identity = REDUCTION_IDENTITIES[line.op.__class__.__name__]
+            name = line.target.id
+            print(f"{self.pretty()}let mut {name}_lanes = [{identity}; {REDUCTION_LANES}];")
+
+        def body(chunks: List[str]):
+            elements = [f"{chunk}[lane]" for chunk in chunks]
+            if len(targets) == 1:
+                print(f"{self.pretty()}let {targets[0]} = {elements[0]};")
+            else:
+                print(f"{self.pretty()}let ({', '.join(targets)}) = ({', '.join(elements)});")
+            for line in node.body:
+                print(f"{self.pretty()}{line.target.id}_lanes[lane]", end='')
+                self.in_aug_assign = True
+                self.visit(line.op)
+                self.in_aug_assign = False
+                self.precedence = 0
+                self.visit(line.value)
+                print(";")
+
+        self.print_reduction_lanes(arrays, body)
+        for line in node.body:
+            name = line.target.id
+            combine = "sum" if isinstance(line.op, ast.Add) else "product"
+            print(f"{self.pretty()}{name}", end='')
+            self.in_aug_assign = True
+            self.visit(line.op)
+            self.in_aug_assign = False
+            print(f"{name}_lanes.iter().{combine}::<f64>();")
+        self.add_pretty(-1)
+        print(f"{self.pretty()}{CLOSE_BRACE}")
+
+    def is_fast_sum(self, node) -> bool:
+        """
+        Not part of the visitor pattern. Should the sum of this list
+        of floats, or elementwise expression on lists of floats, be
+        split across several accumulators?
+        """
+        if not self.fast_reductions:
+            return False
+        if isinstance(node, ast.Name):
+            return float_slice(node, self.type_by_node)
+        arrays = self.elementwise_arrays(node)
+        return bool(arrays) and all(float_slice(n, self.type_by_node)
+            for n in ast.walk(node) if isinstance(n, ast.Name) and n.id in arrays)
+
+    def visit_Fast_Sum(self, node):
+        """
+        Not part of the visitor pattern. Writes the sum of a list of
+        floats, or of an elementwise expression on lists, as a block
+        with several independent accumulators. (See visit_Reduction_For.)
+        """
+        arrays = [node.id] if isinstance(node, ast.Name) else self.elementwise_arrays(node)
+        names = [n for n in ast.walk(node) if isinstance(n, ast.Name) and n.id in arrays]
+        scalars: List[object] = []
+        self.find_elementwise_arrays(node, [], scalars)
+        print(OPEN_BRACE)
+        self.add_pretty(1)
+        self.print_elementwise_scalars(scalars, False)
+        print(f"{self.pretty()}let mut lanes = [0.0; {REDUCTION_LANES}];")
+
+        def body(chunks: List[str]):
+            for n in names:
+                self.hoisted[n] = f"{chunks[arrays.index(n.id)]}[lane]"
+            print(f"{self.pretty()}lanes[lane] += ", end='')
+            self.unpacking = True
+            self.precedence = 0
+            self.visit(node)
+            self.unpacking = False
+            print(";")
+
+        self.print_reduction_lanes(arrays, body)
+        for n in names:
+            del self.hoisted[n]
+        self.forget_elementwise_scalars(scalars)
+        print(f"{self.pretty()}lanes.iter().sum::<f64>()")
+        self.add_pretty(-1)
+        print(f"{self.pretty()}{CLOSE_BRACE}", end='')
+
+    def visit_Elementwise_Assign(self, name: str, op, value):
+        """
+        Not part of the visitor pattern. Writes the result of an
+        elementwise expression into an existing list, rather than
+        allocating a new one:
+
+            d[:] = a * t + d        for (d, a) in d.iter_mut().zip(a.iter().copied()) {
+                                        *d = a * t + *d;
+                                    }
+            a *= 2.0                for a in a.iter_mut() {
+                                        *a *= 2.0;
+                                    }
+
+        The loop runs over slices in lockstep, with no bounds checks,
+        so is a good candidate for vectorisation. As with numpy, the
+        lists are assumed to be the same length.
+        """
+        arrays: List[str] = []
+        scalars: List[object] = []
+        self.find_elementwise_arrays(value, arrays, scalars)
+        self.print_elementwise_scalars(scalars, False)
+        types = {n.id: self.type_by_node[n] for n in ast.walk(value)
+            if isinstance(n, ast.Name) and n.id in arrays}
+        pattern = name
+        print(f"{self.pretty()}for ", end='')
+        iterator = f"{name}.iter_mut()"
+        for array in arrays:
+            if array != name:
+                iterator += f".zip({array}{iter_elements(types[array], False)})"
+                pattern = f"({pattern}, {array})"
+        print(f"{pattern} in {iterator} {OPEN_BRACE}")
+
+        # within the loop, the target is a mutable reference to an element
+        for n in ast.walk(value):
+            if isinstance(n, ast.Name) and n.id == name:
+                self.hoisted[n] = f"*{name}"
+        self.add_pretty(1)
+        print(f"{self.pretty()}*{name}", end='')
+        if op:
+            self.in_aug_assign = True
+            self.visit(op)
+            self.in_aug_assign = False
         else:
-            print("Warning: unhandled subnode of binary operator on lists", file=sys.stderr)
-            return None
+            print(" = ", end='')
+        self.unpacking = True
+        self.precedence = 0
+        self.visit(value)
+        self.unpacking = False
+        print(";")
+        self.add_pretty(-1)
+        print(f"{self.pretty()}{CLOSE_BRACE}")
+        self.forget_elementwise_scalars(scalars)
+
+    def visit_Elementwise(self, node):
+        """
+        Not part of the visitor pattern. Writes an elementwise expression
+        on lists as a single pass, collected into a new Vec.
+        """
+        self.print_elementwise_iterator(node, self.elementwise_arrays(node))
+        print(".collect::<Vec<_>>()", end='')
 
     def visit_ClassDef(self, node):
         # The variable analyser works out the member variables of
@@ -268,23 +676,35 @@ class RustGenerator(ast.NodeVisitor):
             self.add_pretty(1)
             self.in_trait = self.in_trait_definition = True
             for line in node.body:
-                self.visit(line)
+                if isinstance(line, ast.FunctionDef):
+                    self.visit_Trait_Method(classname, line)
+                else:
+                    self.visit(line)
             self.in_trait = self.in_trait_definition = False
             self.add_pretty(-1)
             print(f"{self.pretty()}{CLOSE_BRACE}")
             print()
+            if self.enum_dispatch:
+                self.visit_Trait_Enum(classname)
+            self.current_self = ""
             return
 
-        # class definition
+        # class definition. Plain data classes derive the standard traits
+        if classdef.derives:
+            print(f"{self.pretty()}#[derive({', '.join(classdef.derives)})]")
         print(f"{self.pretty()}pub struct {classname} {OPEN_BRACE}")
         self.add_pretty(1)
 
         # For now we make all member variables public,
         # because Python doesn't allow any different. Maybe make
-        # this a user option in future.
+        # this a user option in future. The fields of frozen
+        # dataclasses are private, so cannot be changed from outside
+        # this module, and the variable analyser rejects changes
+        # from within it.
+        pub = "" if classdef.frozen else "pub "
         for member, member_type in classdef.instance_attributes.items():
-            typed = container_type(member_type)
-            print(f"{self.pretty()}pub {member}: {typed},")
+            typed = self.member_type(member_type)
+            print(f"{self.pretty()}{pub}{member}: {typed},")
 
         self.add_pretty(-1)
         print(f"{self.pretty()}{CLOSE_BRACE}")
@@ -293,10 +713,18 @@ class RustGenerator(ast.NodeVisitor):
         print(f"{self.pretty()}impl {classname} {OPEN_BRACE}")
         self.add_pretty(1)
 
+        # dataclasses may leave us to write the constructor
+        if classdef.dataclass and "__init__" not in [
+                line.name for line in node.body if isinstance(line, ast.FunctionDef)]:
+            self.visit_Dataclass_New(classname, classdef)
+
         # if there are methods that match base classes, treat them as
         # traits to be implemented. Otherwise write them out now.
         traits : Dict[str, List[ast.FunctionDef]] = {} 
         for line in node.body:
+            # field annotations and __slots__ are already in the struct
+            if isinstance(line, (ast.AnnAssign, ast.Assign)):
+                continue
             trait = self.find_trait_implementation(line)
             if trait:
                 if trait not in traits:
@@ -322,8 +750,289 @@ class RustGenerator(ast.NodeVisitor):
             print(f"{self.pretty()}{CLOSE_BRACE}")
             print()
 
+        if classdef.columnar:
+            self.visit_Columns(classname, classdef)
+
         self.current_self = ""
 
+    def member_type(self, typed: str) -> str:
+        """
+        Not part of the visitor pattern. Given the type of a member
+        variable as it would be passed to __init__, returns the type
+        held in the struct. Members that are our own classes are held
+        by value.
+        """
+        return container_type(self.member_arg_type(typed))
+
+    def visit_Dataclass_New(self, classname: str, classdef: ClassHeader):
+        """
+        Not part of the visitor pattern. Writes the constructor of a
+        dataclass, which takes each field in order:
+
+            @dataclass(frozen=True)
+            class Point:
+                x: float
+                y: float
+
+            pub fn new(x: f64, y: f64) -> Point {
+                Point {
+                    x: x,
+                    y: y,
+                }
+            }
+        """
+        fields = classdef.instance_attributes
+        args = ", ".join(f"{name}: {self.member_arg_type(typed)}"
+            for name, typed in fields.items())
+        print(f"{self.pretty()}pub fn new({args}) -> {classname} {OPEN_BRACE}")
+        print(f"{self.pretty()}    {classname} {OPEN_BRACE}")
+        for name, typed in fields.items():
+            conversion = CONTAINER_CONVERSIONS.get(typed, "")
+            if is_list(typed) and is_reference_type(typed):
+                conversion = ".to_vec()"
+            print(f"{self.pretty()}        {name}: {name}{conversion},")
+        print(f"{self.pretty()}    {CLOSE_BRACE}")
+        print(f"{self.pretty()}{CLOSE_BRACE}")
+        print()
+
+    def member_arg_type(self, typed: str) -> str:
+        """
+        Not part of the visitor pattern. The type of an argument to a
+        generated constructor. Our own classes are moved into the new
+        object, everything else is passed as usual.
+        """
+        if is_reference_type(typed) and dereference(typed) in self.class_headers:
+            return dereference(typed)
+        return typed
+
+    def visit_Columns(self, classname: str, classdef: ClassHeader):
+        """
+        Not part of the visitor pattern. A class marked __columnar__ has
+        its lists held as a struct of arrays, with one Vec per field, so
+        loops reading a few fields only stream through those columns:
+
+            class Position:
+                __columnar__ = True
+                ...
+
+            pub struct PositionColumns {
+                pub quantity: Vec<f64>,
+                pub price: Vec<f64>,
+            }
+
+        Items are added with push, and read back by index with get.
+        """
+        columns = f"{classname}Columns"
+        fields = {name: self.member_type(typed)
+            for name, typed in classdef.instance_attributes.items()}
+        first = next(iter(fields))
+
+        print(f"{self.pretty()}pub struct {columns} {OPEN_BRACE}")
+        for name, typed in fields.items():
+            print(f"{self.pretty()}    pub {name}: Vec<{typed}>,")
+        print(f"{self.pretty()}{CLOSE_BRACE}")
+        print()
+
+        print(f"{self.pretty()}impl {columns} {OPEN_BRACE}")
+        self.add_pretty(1)
+        print(f"{self.pretty()}pub fn new() -> {columns} {OPEN_BRACE}")
+        print(f"{self.pretty()}    {columns} {OPEN_BRACE}")
+        for name in fields:
+            print(f"{self.pretty()}        {name}: Vec::new(),")
+        print(f"{self.pretty()}    {CLOSE_BRACE}")
+        print(f"{self.pretty()}{CLOSE_BRACE}")
+        print()
+        print(f"{self.pretty()}pub fn len(&self) -> usize {OPEN_BRACE}")
+        print(f"{self.pretty()}    self.{first}.len()")
+        print(f"{self.pretty()}{CLOSE_BRACE}")
+        print()
+        print(f"{self.pretty()}pub fn push(&mut self, item: {classname}) {OPEN_BRACE}")
+        for name in fields:
+            print(f"{self.pretty()}    self.{name}.push(item.{name});")
+        print(f"{self.pretty()}{CLOSE_BRACE}")
+        print()
+        print(f"{self.pretty()}pub fn get(&self, i: usize) -> {classname} {OPEN_BRACE}")
+        print(f"{self.pretty()}    {classname} {OPEN_BRACE}")
+        for name, typed in fields.items():
+            clone = "" if is_copy_type(typed) or self.is_copy_class(typed) else ".clone()"
+            print(f"{self.pretty()}        {name}: self.{name}[i]{clone},")
+        print(f"{self.pretty()}    {CLOSE_BRACE}")
+        print(f"{self.pretty()}{CLOSE_BRACE}")
+        print()
+        self.add_pretty(-1)
+        print(f"{self.pretty()}{CLOSE_BRACE}")
+        print()
+
+        print(f"{self.pretty()}impl std::iter::FromIterator<{classname}> for {columns} {OPEN_BRACE}")
+        print(f"{self.pretty()}    fn from_iter<I: IntoIterator<Item = {classname}>>(items: I) -> {columns} {OPEN_BRACE}")
+        print(f"{self.pretty()}        let mut columns = {columns}::new();")
+        print(f"{self.pretty()}        for item in items {OPEN_BRACE}")
+        print(f"{self.pretty()}            columns.push(item);")
+        print(f"{self.pretty()}        {CLOSE_BRACE}")
+        print(f"{self.pretty()}        columns")
+        print(f"{self.pretty()}    {CLOSE_BRACE}")
+        print(f"{self.pretty()}{CLOSE_BRACE}")
+        print()
+
+    def columnar_class(self, typed: str) -> str:
+        """
+        Not part of the visitor pattern. If the given type is a list of
+        a class held as a struct of arrays, returns the class name.
+        """
+        if not typed or not is_list(typed):
+            return ""
+        element = strip_container(typed)
+        if element in self.class_headers and self.class_headers[element].columnar:
+            return element
+        return ""
+
+    def visit_Columns_For(self, node, classname: str):
+        """
+        Not part of the visitor pattern. Writes a loop over a list held
+        as a struct of arrays. If the body only reads fields of each
+        item, we zip together just the columns it needs:
+
+            for p in positions:
+                total += p.quantity * p.price
+
+            for (p_quantity, p_price) in positions.quantity.iter().copied()
+                    .zip(positions.price.iter().copied()) {
+                total += p_quantity * p_price;
+            }
+
+        Otherwise each item is put back together from the columns.
+        """
+        target = node.target.id
+        fields = self.class_headers[classname].instance_attributes
+        call_funcs = {n.func for n in ast.walk(node) if isinstance(n, ast.Call)}
+        reads = [n for line in node.body for n in ast.walk(line)
+            if isinstance(n, ast.Attribute) and isinstance(n.value, ast.Name) and
+                n.value.id == target and n.attr in fields and
+                isinstance(n.ctx, ast.Load) and n not in call_funcs]
+        uses = [n for line in node.body for n in ast.walk(line)
+            if isinstance(n, ast.Name) and n.id == target]
+
+        print(f"{self.pretty()}for ", end='')
+        if len(reads) != len(uses):
+            self.variables.add(target)
+            print(f"{target} in (0..", end='')
+            self.visit(node.iter)
+            print(".len()).map(|i| ", end='')
+            self.visit(node.iter)
+            print(".get(i))", end='')
+        else:
+            used = [name for name in fields if any(n.attr == name for n in reads)]
+            for n in reads:
+                self.hoisted[n] = f"{target}_{n.attr}"
+            if not used:
+                print("_ in 0..", end='')
+                self.visit(node.iter)
+                print(".len()", end='')
+            else:
+                names = [f"{target}_{name}" for name in used]
+                pattern = names[-1]
+                for name in reversed(names[:-1]):
+                    pattern = f"({name}, {pattern})"
+                print(f"{pattern} in ", end='')
+                for i, name in enumerate(used):
+                    if i > 0:
+                        print(".zip(", end='')
+                    self.visit(node.iter)
+                    typed = self.member_type(fields[name])
+                    print(f".{name}{iter_elements(f'[{typed}]', False)}", end='')
+                print(")" * (len(used) - 1), end='')
+        print(" {")
+        self.add_pretty(1)
+        for line in node.body:
+            self.visit(line)
+        self.add_pretty(-1)
+        print(f"{self.pretty()}{CLOSE_BRACE}")
+
+    def visit_Trait_Method(self, trait: str, node):
+        """
+        Not part of the visitor pattern. Writes a method of a trait
+        definition, recording its signature so that the enum
+        implementing the trait can declare the method identically.
+        """
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.visit(node)
+        text = output.getvalue()
+        print(text, end='')
+        signature = text.lstrip().split("\n")[0]
+        signature = signature[:-1] if signature.endswith(";") else signature[:-len(" {")]
+        self.trait_signatures.setdefault(trait, {})[node.name] = signature
+
+    def visit_Trait_Enum(self, trait: str):
+        """
+        Not part of the visitor pattern. Given a trait whose implementors
+        are all defined in this module, writes an enum with a variant for
+        each of them, which also implements the trait by matching on the
+        variant. Calls through the enum are static, so can be inlined,
+        and a Vec of the enum holds its items inline rather than boxed:
+
+            pub enum WaddleEnum {
+                Duck(Duck),
+            }
+
+            impl Waddle for WaddleEnum {
+                fn waddle(&self, elegant: bool) {
+                    match self {
+                        WaddleEnum::Duck(inner) => inner.waddle(elegant),
+                    }
+                }
+            }
+        """
+        implementors = [name for name, header in self.class_headers.items()
+            if trait in header.bases and not header.is_trait()]
+        if not implementors:
+            return
+        enum = f"{trait}Enum"
+
+        # the enum can derive whatever all of its variants derive
+        derives = [derive for derive in self.class_headers[implementors[0]].derives
+            if all(derive in self.class_headers[name].derives for name in implementors)]
+        if derives:
+            print(f"{self.pretty()}#[derive({', '.join(derives)})]")
+        print(f"{self.pretty()}pub enum {enum} {OPEN_BRACE}")
+        for name in implementors:
+            print(f"{self.pretty()}    {name}({name}),")
+        print(f"{self.pretty()}{CLOSE_BRACE}")
+        print()
+
+        for name in implementors:
+            print(f"{self.pretty()}impl From<{name}> for {enum} {OPEN_BRACE}")
+            print(f"{self.pretty()}    fn from(inner: {name}) -> {enum} {OPEN_BRACE}")
+            print(f"{self.pretty()}        {enum}::{name}(inner)")
+            print(f"{self.pretty()}    {CLOSE_BRACE}")
+            print(f"{self.pretty()}{CLOSE_BRACE}")
+            print()
+
+        print(f"{self.pretty()}impl {trait} for {enum} {OPEN_BRACE}")
+        self.add_pretty(1)
+        for method_name, method in self.class_headers[trait].methods.items():
+            if not method.args or method.args[0][0] != "self":
+                continue
+            args = method.args[1:]
+            names = [arg for arg, _ in args]
+            inner = "inner"
+            i = 0
+            while inner in names:
+                inner = f"inner{i}"
+                i += 1
+            signature = self.trait_signatures[trait][method_name]
+            print(f"{self.pretty()}{signature} {OPEN_BRACE}")
+            print(f"{self.pretty()}    match self {OPEN_BRACE}")
+            for name in implementors:
+                print(f"{self.pretty()}        {enum}::{name}({inner}) => "
+                    f"{inner}.{method_name}({', '.join(names)}),")
+            print(f"{self.pretty()}    {CLOSE_BRACE}")
+            print(f"{self.pretty()}{CLOSE_BRACE}")
+            print()
+        self.add_pretty(-1)
+        print(f"{self.pretty()}{CLOSE_BRACE}")
+        print()
+
     def visit_FunctionDef(self, node):
         # Analyse the variables in this function to see which need
         # to be predeclared or marked as mutable
@@ -331,29 +1040,72 @@ class RustGenerator(ast.NodeVisitor):
         analyser.visit(node)
         self.type_by_node = analyser.get_type_by_node()
 
+        # start with a clean set of variables 
+        # (do we need to worry about nested functions?)
+        self.variables.clear()
+        self.mutable_vars = analyser.get_mutable_vars()
+        self.mutable_ref_vars = analyser.get_mutable_ref_vars()
+        self.constant_containers = analyser.get_constant_containers()
+        self.array_vars = analyser.get_array_vars()
+        self.in_place_loops = analyser.get_in_place_loops()
+
+        # generators are written as iterator structs
+        if self.current_self:
+            header = self.class_headers[self.current_self].methods.get(node.name)
+        else:
+            header = self.headers.get(node.name)
+        if not self.current_self and header and header.yields:
+            self.visit_Generator(node, analyser, header.yields)
+            return
+
+        # collections created afresh in each iteration of a loop
+        self.scratch = find_scratch_collections(node)
+
+        # rectangular matrices that can be stored as one flat Vec
+        self.matrices = find_flat_matrices(node)
+
+        # numpy arrays, as opposed to lists, act elementwise in a += b
+        self.numpy_arrays = find_numpy_arrays(node)
+
+        # strings that are borrowed rather than copied. If we return
+        # a borrowed string, it must live as long as the str args.
+        self.borrowed_strings = find_borrowed_strings(node, static_functions(self.headers))
+        self.string_return = header.string_return if header else ""
+        borrows = self.string_return in (BORROWED_STRING, COW_STRING)
+        self.lifetime = "'a " if borrows else ""
+
+        # functions that build up a collection fill one owned by the
+        # caller, and are wrapped by a function returning a new one
+        buffer = None if self.current_self else output_buffer(node)
+        if buffer is not None:
+            self.output_buffer = self.buffer_name(node)
+            if buffer:
+                self.renamed_vars[buffer] = self.output_buffer
+        suffix = "" if buffer is None else "_into"
+
         # function name. Always public, as Python has no
         # private functions. Special handling for __init__,
         # which we always call "new".
         self.is_init = node.name == "__init__"
         name = "new" if self.is_init else node.name
         pub = "" if self.in_trait else "pub " 
-        print(f"{self.pretty()}{pub}fn {name}(", end='')
-
-        # start with a clean set of variables 
-        # (do we need to worry about nested functions?)
-        self.variables.clear()
-        self.mutable_vars = analyser.get_mutable_vars()
-        self.mutable_ref_vars = analyser.get_mutable_ref_vars()
+        generics = "<'a>" if borrows else ""
+        print(f"{self.pretty()}{pub}fn {name}{suffix}{generics}(", end='')
 
         # function arg list
         self.next_separator = ""
         self.generic_visit(node.args)
 
         # return value
-        if self.is_init:
+        if buffer is not None:
+            typed = type_from_annotation(node.returns, "return", True)
+            print(f"{self.next_separator}{self.output_buffer}: &mut {typed})", end='')
+        elif self.is_init:
             print(f") -> {self.current_self}", end='')
         elif node.returns is not None:
-            typed = type_from_annotation(node.returns, "return", True)
+            typed = self.string_return or type_from_annotation(node.returns, "return", True)
+            if self.columnar_class(typed):
+                typed = f"{self.columnar_class(typed)}Columns"
             print(f") -> {typed}", end='')
         else:
             print(")", end='')        
@@ -373,9 +1125,25 @@ class RustGenerator(ast.NodeVisitor):
             self.variables.add(var)
             print(f"{self.pretty()}let mut {var}: {typed} = {default};")
 
+        # strings that are sliced by bytes must be ASCII. Each is checked
+        # once, here for arguments and for locals when they are assigned.
+        self.ascii_strings = {v for v in find_checked_strings(node)
+            if v in analyser.vars and is_string(analyser.vars[v].typed)}
+        for arg in node.args.args:
+            self.print_ascii_check(arg.arg)
+
         # body of the function, but special handling for __init__
-        for expr in node.body:
-            self.visit(expr)
+        # and for functions filling a buffer
+        if buffer == "":
+            self.visit_Buffer_Fill(node.body[0].value)
+        elif buffer:
+            print(f"{self.pretty()}{self.output_buffer}.clear();")
+            self.variables.add(buffer)
+            for expr in node.body[1:-1]:
+                self.visit(expr)
+        else:
+            for expr in node.body:
+                self.visit(expr)
 
         # in the case of __init__, we now want to return the object
         if self.is_init:
@@ -391,11 +1159,405 @@ class RustGenerator(ast.NodeVisitor):
         print(f"{self.pretty()}{CLOSE_BRACE}")
         print()
 
+        if buffer is not None:
+            self.visit_Buffer_Wrapper(node, buffer)
+
         # clean the set of variables. The names do not leak past here
         self.variables.clear()
+        self.output_buffer = ""
+        self.borrowed_strings = set()
+        self.ascii_strings = set()
+        self.string_return = ""
+        self.lifetime = ""
+        self.hoisted.clear()
+        self.scratch = {}
+        self.matrices = {}
+        self.numpy_arrays = set()
+        self.renamed_vars.clear()
+
+    def buffer_name(self, node) -> str:
+        """
+        Not part of the visitor pattern. Returns a name for the buffer
+        argument of a function, which does not clash with its variables.
+        """
+        names = names_in([node]) | {a.arg for a in node.args.args}
+        name = "out"
+        i = 0
+        while name in names:
+            name = f"out{i}"
+            i += 1
+        return name
+
+    def visit_Buffer_Fill(self, node):
+        """
+        Not part of the visitor pattern. Writes the body of a function
+        that just returns a comprehension, refilling the caller's buffer
+        rather than collecting into a new one:
+
+            def squares(a: int) -> List[int]:
+                return [x * x for x in range(a)]
+
+            pub fn squares_into(a: i64, out: &mut Vec<i64>) {
+                out.clear();
+                out.extend((0..a).map(|x| (x * x)));
+            }
+        """
+        print(f"{self.pretty()}{self.output_buffer}.clear();")
+        print(f"{self.pretty()}{self.output_buffer}.extend(", end='')
+        self.precedence = 0
+        if isinstance(node, ast.DictComp):
+            self.do_visit_DictComp(node)
+        else:
+            self.do_visit_Comprehension(node)
+        print(");")
+
+    def visit_Buffer_Wrapper(self, node, buffer: str):
+        """
+        Not part of the visitor pattern. Writes the function returning
+        a new collection, as a thin wrapper around its _into variant.
+        Filtered comprehensions with a known bound reserve room up
+        front, as they would if collected directly.
+        """
+        typed = type_from_annotation(node.returns, "return", True)
+        out = self.output_buffer
+        self.mutable_vars = set()
+        print(f"{self.pretty()}pub fn {node.name}(", end='')
+        self.next_separator = ""
+        self.generic_visit(node.args)
+        print(f") -> {typed} {OPEN_BRACE}")
+        self.add_pretty(1)
+
+        container = typed.split("<")[0]
+        print(f"{self.pretty()}let mut {out} = {container}::", end='')
+        generator = node.body[0].value.generators[0] if buffer == "" else None
+        if generator and generator.ifs and self.has_size_bound(generator.iter):
+            print("with_capacity(", end='')
+            self.print_size_bound(generator.iter)
+            print(");")
+        else:
+            print("new();")
+        args = [a.arg for a in node.args.args] + [f"&mut {out}"]
+        print(f"{self.pretty()}{node.name}_into({', '.join(args)});")
+        print(f"{self.pretty()}return {out};")
+
+        self.add_pretty(-1)
+        print(f"{self.pretty()}{CLOSE_BRACE}")
+        print()
+
+    def visit_Generator(self, node, analyser, item: str):
+        """
+        Not part of the visitor pattern. A generator function such as
+
+            def evens(a: List[int]) -> Iterator[int]:
+                for x in a:
+                    if x % 2 == 0:
+                        yield x
+
+        is written as a struct holding the state of the generator, which
+        implements Iterator, and a function that creates it:
+
+            pub struct Evens<'a> {
+                iter: std::iter::Copied<std::slice::Iter<'a, i64>>,
+            }
+
+            impl<'a> Iterator for Evens<'a> {
+                type Item = i64;
+
+                fn next(&mut self) -> Option<i64> {
+                    while let Some(x) = self.iter.next() {
+                        if x % 2 == 0 {
+                            return Some(x);
+                        }
+                    }
+                    None
+                }
+            }
+
+            pub fn evens<'a>(a: &'a [i64]) -> Evens<'a> { ... }
+
+        Variables used within the loop become members of the struct. If
+        the loop carries on after a yield, next has to resume from there,
+        so we record where we got to in a state member and match on it.
+        """
+        shape = analyse_generator(node)
+        loop = shape.loop
+        simple = shape.is_simple()
+        struct = "".join(part[:1].upper() + part[1:] for part in node.name.split("_"))
+
+        # Work out the members. Arguments and variables from before the
+        # loop are kept if the loop uses them. Unless the loop always
+        # starts from the top, anything it assigns must be kept too.
+        args = [a.arg for a in node.args.args]
+        used = names_in(loop.body + ([loop.test] if isinstance(loop, ast.While) else []))
+        wanted = (set(args) | names_in(shape.init, True)) & used
+        defaulted = set()
+        if not simple:
+            targets = [loop.target] if isinstance(loop, ast.For) else []
+            defaulted = names_in(loop.body + targets, True) - wanted
+        members = [v for v in analyser.vars if v in wanted or v in defaulted]
+
+        # Iterators are held as they are rather than boxed, so the struct
+        # is generic over their types. An iterator passed in keeps the
+        # caller's type; any other is whatever the creating function
+        # builds, which it returns as an impl Iterator.
+        generics: Dict[str, str] = {}
+        concrete: Dict[str, str] = {}
+        arg_types = {}
+        for a in node.args.args:
+            typed = type_from_annotation(a.annotation, a.arg, False)
+            if not is_iterator_type(typed):
+                arg_types[a.arg] = generator_member_type(typed)
+            elif a.arg in members or (isinstance(loop, ast.For) and
+                    isinstance(loop.iter, ast.Name) and loop.iter.id == a.arg):
+                arg_types[a.arg] = generator_parameter(generics, typed)
+                concrete[arg_types[a.arg]] = arg_types[a.arg]
+            else:
+                arg_types[a.arg] = f"impl Iterator<Item = {strip_container(typed)}>"
+        member_types = {}
+        for v in members:
+            typed = analyser.vars[v].typed
+            if v in arg_types:
+                member_types[v] = arg_types[v]
+            elif is_iterator_type(typed):
+                member_types[v] = generator_parameter(generics, typed)
+            else:
+                member_types[v] = generator_member_type(typed)
+
+        # the iterator for a for loop is also a member
+        iter_type = ""
+        if isinstance(loop, ast.For):
+            if isinstance(loop.iter, ast.Name) and arg_types.get(loop.iter.id) in concrete:
+                iter_type = arg_types[loop.iter.id]
+            else:
+                iter_type = (self.generator_iter_type(loop.iter) or
+                    generator_parameter(generics, self.type_by_node[loop.iter]))
+            member_types = {"iter": iter_type, **member_types}
+        if not simple:
+            member_types = {"state": "usize", **member_types}
+        borrows = any("'a" in t for t in member_types.values())
+        lifetimes = ["'a"] if borrows else []
+        declared = generic_list(lifetimes + [f"{g}: {b}" for g, b in generics.items()])
+        used = generic_list(lifetimes + list(generics))
+        borrows |= any("'a" in t for t in arg_types.values())
+        bound = " + 'a" if borrows else ""
+        returned = generic_list(lifetimes +
+            [concrete.get(g, f"impl {b}{bound}") for g, b in generics.items()])
+        creator = generic_list((["'a"] if borrows else []) +
+            [f"{g}: {generics[g]}" for g in concrete])
+
+        # the struct itself
+        print(f"{self.pretty()}pub struct {struct}{declared} {OPEN_BRACE}")
+        self.add_pretty(1)
+        for member, typed in member_types.items():
+            print(f"{self.pretty()}{member}: {typed},")
+        self.add_pretty(-1)
+        print(f"{self.pretty()}{CLOSE_BRACE}")
+        print()
+        self.generator_structs[node.name] = None if generics else f"{struct}{used}"
+
+        # the implementation of Iterator, with members renamed to self.x
+        print(f"{self.pretty()}impl{declared} Iterator for {struct}{used} {OPEN_BRACE}")
+        self.add_pretty(1)
+        print(f"{self.pretty()}type Item = {item};")
+        print()
+        print(f"{self.pretty()}fn next(&mut self) -> Option<{item}> {OPEN_BRACE}")
+        self.add_pretty(1)
+        self.renamed_vars = {v: f"self.{v}" for v in members}
+        self.variables = set(members)
+        self.in_generator = True
+        if simple:
+            self.visit_Simple_Generator_Loop(loop)
+        else:
+            self.visit_Generator_States(shape)
+        self.in_generator = False
+        self.renamed_vars = {}
+        self.add_pretty(-1)
+        print(f"{self.pretty()}{CLOSE_BRACE}")
+        self.add_pretty(-1)
+        print(f"{self.pretty()}{CLOSE_BRACE}")
+        print()
+
+        # the function that creates the generator. Only what it changes
+        # itself is mutable, not what the loop changes.
+        assigned = names_in(shape.init, True)
+        mutated = mutated_names(shape.init)
+        self.mutable_vars &= mutated
+        self.mutable_ref_vars &= mutated
+        self.variables = set(args)
+        print(f"{self.pretty()}pub fn {node.name}{creator}(", end='')
+        separator = ""
+        for arg, typed in arg_types.items():
+            mutable = "mut " if arg in assigned else ""
+            print(f"{separator}{mutable}{arg}: {typed}", end='')
+            separator = ", "
+        print(f") -> {struct}{returned} {OPEN_BRACE}")
+        self.add_pretty(1)
+        for line in shape.init:
+            self.visit(line)
+        print(f"{self.pretty()}{struct} {OPEN_BRACE}")
+        self.add_pretty(1)
+        for member, typed in member_types.items():
+            print(f"{self.pretty()}{member}", end='')
+            if member == "state":
+                print(": 0", end='')
+            elif member == "iter":
+                print(": ", end='')
+                self.visit_Generator_Iter(loop.iter, iter_type)
+            elif member in defaulted:
+                print(": Default::default()", end='')
+            print(",")
+        self.add_pretty(-1)
+        print(f"{self.pretty()}{CLOSE_BRACE}")
+        self.add_pretty(-1)
+        print(f"{self.pretty()}{CLOSE_BRACE}")
+        print()
+
+        self.variables.clear()
+        self.hoisted.clear()
+
+    def generator_iter_type(self, node) -> Optional[str]:
+        """
+        Not part of the visitor pattern. Returns the Rust type of the
+        iterator that a generator's for loop runs over, or None where we
+        cannot name the type, so the generator must be generic over it.
+        """
+        typed = self.type_by_node[node]
+        element = strip_container(typed)
+        path = get_node_path(node.func) if isinstance(node, ast.Call) else []
+        if path == ["range"] and len(node.args) in (1, 2):
+            return "std::ops::Range<i64>"
+        elif path and path[0] in self.generator_structs and len(path) == 1:
+            return self.generator_structs[path[0]]
+        elif isinstance(node, ast.Name) and typed.startswith("&["):
+            adaptor = "Copied" if is_copy_type(element) else "Cloned"
+            return f"std::iter::{adaptor}<std::slice::Iter<'a, {element}>>"
+        else:
+            return None
+
+    def visit_Generator_Iter(self, node, iter_type: str):
+        """
+        Not part of the visitor pattern. Writes the initial value of the
+        iterator that a generator's for loop runs over.
+        """
+        self.precedence = 0
+        if iter_type.startswith("std::iter::"):
+            self.print_lazy_iterator(node)
+        else:
+            self.visit(node)
+
+    def visit_Simple_Generator_Loop(self, loop):
+        """
+        Not part of the visitor pattern. Writes the body of the next
+        method of a generator where the yield is the last thing in the
+        loop, so each call simply carries on with the loop.
+        """
+        self.precedence = 0
+        print(f"{self.pretty()}", end='')
+        if isinstance(loop, ast.For):
+            self.variables |= names_in([loop.target])
+            print(f"while let Some({target_as_string(loop.target)}) = self.iter.next()", end='')
+        elif isinstance(loop.test, ast.Constant) and loop.test.value is True:
+            print("loop", end='')
+        else:
+            print("while ", end='')
+            self.visit(loop.test)
+        print(f" {OPEN_BRACE}")
+        self.add_pretty(1)
+        for line in loop.body:
+            self.visit(line)
+        self.add_pretty(-1)
+        print(f"{self.pretty()}{CLOSE_BRACE}")
+        print(f"{self.pretty()}None")
+
+    def visit_Generator_States(self, shape):
+        """
+        Not part of the visitor pattern. Writes the body of the next
+        method of a generator that must resume after a yield. State 0
+        starts a new iteration of the loop, and state n resumes after
+        the nth yield. A continue goes back to state 0, and a break
+        moves to a final state, in which the generator is finished.
+        """
+        segments = shape.segments
+        self.generator_jumps = set(shape.jumps)
+        print(f"{self.pretty()}loop {OPEN_BRACE}")
+        self.add_pretty(1)
+        print(f"{self.pretty()}match self.state {OPEN_BRACE}")
+        self.add_pretty(1)
+        if any(isinstance(jump, ast.Break) for jump in shape.jumps):
+            self.finished_state = shape.finished_state()
+            print(f"{self.pretty()}{self.finished_state} => return None,")
+        for state, segment in enumerate(segments):
+            last = state == len(segments) - 1
+            label = "_" if last else state
+            print(f"{self.pretty()}{label} => {OPEN_BRACE}")
+            self.add_pretty(1)
+            if state == 0:
+                self.visit_Generator_Loop_Start(shape.loop)
+            self.generator_state = state
+            self.yield_state = 0 if last else state + 1
+            for line in segment:
+                self.visit(line)
+            if not segment or not is_jump_statement(segment[-1]):
+                print(f"{self.pretty()}self.state = {self.yield_state};")
+            self.add_pretty(-1)
+            print(f"{self.pretty()}{CLOSE_BRACE}")
+        self.yield_state = None
+        self.generator_state = None
+        self.generator_jumps = set()
+        self.finished_state = None
+        self.add_pretty(-1)
+        print(f"{self.pretty()}{CLOSE_BRACE}")
+        self.add_pretty(-1)
+        print(f"{self.pretty()}{CLOSE_BRACE}")
+
+    def visit_Generator_Loop_Start(self, loop):
+        """
+        Not part of the visitor pattern. Writes the start of an iteration
+        of a generator's loop, which ends the generator if the loop is
+        finished.
+        """
+        if isinstance(loop, ast.For):
+            if isinstance(loop.target, ast.Name):
+                print(f"{self.pretty()}self.{loop.target.id} = self.iter.next()?;")
+            else:
+                tmp = self.temp_variable()
+                print(f"{self.pretty()}let {tmp} = self.iter.next()?;")
+                self.assign_tuple(loop.target, tmp)
+        elif not (isinstance(loop.test, ast.Constant) and loop.test.value is True):
+            print(f"{self.pretty()}if !(", end='')
+            self.precedence = 0
+            self.visit(loop.test)
+            print(f") {OPEN_BRACE}")
+            print(f"{self.pretty()}    return None;")
+            print(f"{self.pretty()}{CLOSE_BRACE}")
+
+    def visit_Yield(self, node):
+        """
+        Within the next method of a generator, a yield returns the
+        next item, first recording where to resume if needed.
+        """
+        if self.yield_state is not None:
+            print(f"self.state = {self.yield_state};")
+            print(f"{self.pretty()}", end='')
+        print("return Some(", end='')
+        self.precedence = 0
+        value = node.value
+        if (isinstance(value, ast.Name) and value.id in self.renamed_vars and
+                not is_copy_type(self.type_by_node[value])):
+            self.visit(value)
+            print(".clone()", end='')
+        else:
+            self.visit_and_optionally_convert(value)
+        print(")", end='')
 
     def visit_Lambda(self, node):
-        print("&|", end='')
+        """
+        Lambdas are passed by value, so the function they are passed to
+        is specialised for each one, and can inline it. A lambda that is
+        stored or returned is boxed, and takes ownership of what it uses.
+        """
+        boxed = is_boxed_function_type(self.type_by_node.get(node, ""))
+        print("Box::new(move |" if boxed else "|", end='')
         # don't visit the arg using the standard visitor, as it will whinge
         # about the lack of a type
         sep = ""
@@ -405,7 +1567,9 @@ class RustGenerator(ast.NodeVisitor):
             sep = ", "
 
         print("| ", end='')
+        self.precedence = 0
         self.visit(node.body)
+        print(")" if boxed else "", end='')
 
         for arg in node.args.args:
             self.variables.remove(arg.arg)
@@ -414,22 +1578,46 @@ class RustGenerator(ast.NodeVisitor):
         if node.arg == "self":
             if not self.is_init:
                 ref_type = "&mut " if node.arg in self.mutable_ref_vars else "&"
+                if ref_type == "&" and self.is_copy_class(self.current_self):
+                    ref_type = ""   # small enough to pass by value
                 print(f"{ref_type}self", end='')
+                self.variables.add("self")
                 self.next_separator = ", "
         else:
             typed = type_from_annotation(node.annotation, node.arg, False)
+            if is_iterator_type(typed):
+                typed = f"impl Iterator<Item = {strip_container(typed)}>"
+            elif self.is_init:
+                typed = boxed_function_type(typed)  # to be stored in a field
             ref_type = "&mut " if node.arg in self.mutable_ref_vars else ""
             if ref_type:
                 typed = dereference(typed)
+            elif typed == "&str":
+                typed = f"&{self.lifetime}str"
+            elif is_reference_type(typed) and self.is_copy_class(dereference(typed)):
+                typed = dereference(typed)  # small enough to pass by value
+            elif self.columnar_class(typed):
+                typed = f"&{self.columnar_class(typed)}Columns"
             mutable = "mut " if node.arg in self.mutable_vars else ""
             print(f"{self.next_separator}{mutable}{node.arg}: {ref_type}{typed}", end='')
             self.variables.add(node.arg)
             self.next_separator = ", "
 
+    def is_copy_class(self, classname: str) -> bool:
+        """
+        Not part of the visitor pattern. Is this one of our own plain
+        data classes, which is cheaper to copy than to refer to? Traits
+        implemented by the class must keep taking self by reference.
+        """
+        return (classname in self.class_headers and self.class_headers[classname].is_copy() and
+            not self.in_trait)
+
     def visit_Expr(self, node):
         print(f"{self.pretty()}", end='')
+        self.block_statement = False
         self.generic_visit(node)
-        print(";")
+        # a statement written as a block, such as a for loop, needs no ;
+        print("" if self.block_statement else ";")
 
     def visit_Raise(self, node):
         print(f"{self.pretty()}panic!(", end='')
@@ -437,23 +1625,49 @@ class RustGenerator(ast.NodeVisitor):
         print(");")
 
     def visit_Return(self, node):
+        if self.in_generator:
+            print(f"{self.pretty()}return None;")
+            return
+        if self.output_buffer:
+            print(f"{self.pretty()}return;")
+            return
         print(f"{self.pretty()}return ", end='')
-        self.visit_and_optionally_convert(node.value)
+        if self.string_return == COW_STRING:
+            borrowed = is_borrowed_string(node.value, self.borrowed_strings)
+            print("Cow::Borrowed(" if borrowed else "Cow::Owned(", end='')
+            self.precedence = 0
+            self.visit_and_optionally_convert(node.value, not borrowed)
+            print(")", end='')
+        elif self.string_return:
+            self.visit(node.value)
+        else:
+            self.visit_and_optionally_convert(node.value)
         print(";")
 
     def visit_Call(self, node):
+        if normal_dist(node):
+            return handle_normal_dist(self, node)
         node_path = get_node_path(node.func)
-        # look for standard calls like len, abs etc
-        if node_path and len(node_path) == 1 and node_path[0] in STANDARD_FUNCTIONS:
+        # look for standard calls like len, abs etc, unless we have
+        # our own function of the same name
+        if (node_path and len(node_path) == 1 and node_path[0] in STANDARD_FUNCTIONS and
+                node_path[0] not in self.headers):
             return STANDARD_FUNCTIONS[node_path[0]](self, node)
-
-        # also treat standard calls in Math. the same, like exp and log
-        if node_path and len(node_path) == 2 and node_path[1] in STANDARD_FUNCTIONS:
-            return STANDARD_FUNCTIONS[node_path[1]](self, node)
+        if is_numpy_call(node):
+            return handle_numpy_call(self, node)
+        if is_statistics_call(node):
+            return handle_statistics_call(self, node)
+        if is_random_call(node):
+            return handle_random_call(self, node)
 
         # identify method calls, where the first item is a known variable
         is_method = len(node_path) > 1 and node_path[0] in self.variables
 
+        # also treat standard calls in Math. the same, like exp and log
+        if (node_path and len(node_path) == 2 and not is_method and
+                node_path[1] in STANDARD_FUNCTIONS):
+            return STANDARD_FUNCTIONS[node_path[1]](self, node)
+
         # Function name, with namespacing if required. Note that if
         # any namespacing is required, we first need an initial
         # :: so we start from the global namespace.
@@ -464,17 +1678,23 @@ class RustGenerator(ast.NodeVisitor):
         if is_method and node.func in self.type_by_node:
             func_type = self.type_by_node[node.func]
             method = (detemplatise(func_type), node_path[1])
+            if method in STANDARD_BLOCK_METHODS:
+                return STANDARD_BLOCK_METHODS[method](self, node)
             if method in STANDARD_METHODS:
-                print(node_path[0], end='')
+                print(self.renamed_vars.get(node_path[0], node_path[0]), end='')
                 return STANDARD_METHODS[method](self, node)
 
+        # a closure held in a field is called as (s.f)(x), not s.f(x)
+        closure = is_method and is_function_type(self.type_by_node.get(node.func, ""))
+        print("(" if closure else "", end='')
         separator = "." if is_method else "::"
         first = True
         for name in node_path:
             if not first:
                 print(separator, end='')
-            print(name, end='')
+            print(self.renamed_vars.get(name, name) if first else name, end='')
             first = False
+        print(")" if closure else "", end='')
 
         # Replace constructor calls of the form Foo(..) with Foo::new(..)
         # TODO handle class constructors in other modules etc.
@@ -485,12 +1705,45 @@ class RustGenerator(ast.NodeVisitor):
         sep = ""
         for a in node.args:
             print(sep, end='')
+            # closures we are given are passed on by reference, so
+            # we can go on using them, as are the columns of our own lists
+            typed = self.type_by_node.get(a, "")
+            if isinstance(a, ast.Name) and (is_function_type(typed) or
+                    self.columnar_class(typed) and not is_reference_type(typed)):
+                print("&", end='')
             self.visit(a)
             sep = ", "
+        if len(node_path) == 1 and node_path[0] in self.class_headers:
+            for a in self.dataclass_trailing_args(node_path[0], node):
+                print(sep, end='')
+                self.precedence = 0
+                self.visit(a)
+                sep = ", "
         print(")", end='')
 
+    def dataclass_trailing_args(self, classname: str, node) -> List[object]:
+        """
+        Not part of the visitor pattern. The generated constructor of a
+        dataclass takes every field, so a call that leaves out fields
+        with defaults, or passes them by keyword, has the rest of its
+        arguments filled in here, in field order.
+        """
+        classdef = self.class_headers[classname]
+        if not classdef.dataclass:
+            return []
+        keywords = {k.arg: k.value for k in node.keywords}
+        args = []
+        for name in list(classdef.instance_attributes)[len(node.args):]:
+            if name in keywords:
+                args.append(keywords[name])
+            elif name in classdef.defaults:
+                args.append(classdef.defaults[name])
+            else:
+                raise Exception(f"{classname} needs a value for field {name}")
+        return args
+
     def visit_Name(self, node):
-        print(f"{node.id}", end='')
+        print(f"{self.renamed_vars.get(node.id, node.id)}", end='')
 
     def visit_Attribute(self, node):
         """
@@ -508,6 +1761,9 @@ class RustGenerator(ast.NodeVisitor):
         if (self.is_init and isinstance(node.value, ast.Name) and
             node.value.id == "self"):
             print(f"tmp_{node.attr}", end='')
+        elif (isinstance(node.value, ast.Name) and node.value.id == "math" and
+                node.attr in MATH_CONSTANTS and "math" not in self.variables):
+            print(MATH_CONSTANTS[node.attr], end='')
         else:
             self.visit(node.value)
             print(f".{node.attr}", end='')
@@ -535,10 +1791,19 @@ class RustGenerator(ast.NodeVisitor):
 
     def visit_List(self, node):
 
+        # lists of a class held as a struct of arrays are collected
+        # into its columns
+        columns = self.columnar_class(self.type_by_node.get(node, ""))
+        if columns and not node.elts:
+            print(f"{columns}Columns::new()", end='')
+            return
+
         # Always make a Vec rather than just a slice. We do not know
         # how it will be used.
         print("vec!", end='')
         self.do_visit_List(node)
+        if columns:
+            print(f".into_iter().collect::<{columns}Columns>()", end='')
         
     def do_visit_List(self, node):
         print("[", end='')
@@ -568,15 +1833,15 @@ class RustGenerator(ast.NodeVisitor):
             self.add_pretty(-1)
 
     def visit_Set(self, node):
-        # first construct a list, though without the vec! (a slice
-        # is sufficient)
+        # construct an array, though without the vec!, and move its
+        # elements into a HashSet of exactly the right capacity
+        print("HashSet::from(", end='')
         self.do_visit_List(node)
-
-        # then convert it to a HashSet
-        print(".iter().cloned().collect::<HashSet<_>>()", end='')        
+        print(")", end='')
 
     def visit_Dict(self, node):
-        print("[", end='')
+        # as for sets, move the (key, value) pairs from an array
+        print("HashMap::from([", end='')
         
         # special-case empty or short lists for prettiness
         short = len(node.values) < 3
@@ -599,7 +1864,7 @@ class RustGenerator(ast.NodeVisitor):
                 print(",")
                 print(self.pretty(), end='')
         
-        print("].iter().cloned().collect::<HashMap<_, _>>()", end='')        
+        print("])", end='')
 
         if not short:
             self.add_pretty(-1)
@@ -610,6 +1875,18 @@ class RustGenerator(ast.NodeVisitor):
         subscript syntax in Rust is different for these two cases. We
         need to know which we are doing.
         """
+        if isinstance(node.slice, ast.Slice):
+            self.visit_Slice_Subscript(node, False)
+            return
+        indices = matrix_indices(node)
+        if indices is not None and indices[0].id in self.matrices:
+            self.visit_Matrix_Subscript(*indices)
+            return
+        dimension = shape_index(node)
+        if dimension is not None and node.value.value.id in self.matrices:
+            print(self.matrix_dimensions(node.value.value.id)[dimension], end='')
+            return
+
         self.visit(node.value)
         typed = self.type_by_node[node.value]
         if typed and typed[0] == '(':
@@ -620,6 +1897,139 @@ class RustGenerator(ast.NodeVisitor):
             self.visit(node.slice)
             print("]", end='')
 
+    def visit_Slice_Subscript(self, node, owned: bool):
+        """
+        Not part of the visitor pattern. A slice in Python is a copy, but
+        is usually only read, so instead we borrow a view of the original:
+
+            a[:-1]      &a[..a.len().saturating_sub(1)]
+            a[::2]      a.iter().copied().step_by(2)
+            s[1:]       { assert!(s.is_ascii()); &s[s.len().min(1)..] }
+
+        Python clamps the bounds of a slice to the container, where Rust
+        would panic, so the range is clamped as in print_slice_range.
+        Rust slices strings by bytes rather than characters, which only
+        gives the same result for ASCII text, hence the check. Strings
+        in ascii_strings were checked when bound, so are not checked
+        again here.
+
+        If owned is set, because the slice is modified or returned, we
+        copy it into a new Vec or String.
+        """
+        typed = self.type_by_node[node.value]
+        bounded = node.slice.lower or node.slice.upper
+        string = is_string(typed)
+        checked = isinstance(node.value, ast.Name) and node.value.id in self.ascii_strings
+        check = string and (bounded or not node.slice.step) and not checked
+        if check:
+            print(f"{OPEN_BRACE} assert!(", end='')
+            self.precedence = MAX_PRECEDENCE * 2
+            self.visit(node.value)
+            print(".is_ascii()); ", end='')
+
+        if node.slice.step:
+            self.visit_Stepped_Slice(node, string, owned or string)
+        else:
+            wrap = not owned and not string and self.precedence >= MAX_PRECEDENCE * 2
+            print("(" if wrap else "", end='')
+            print("" if owned else "&", end='')
+            self.visit(node.value)
+            self.print_slice_range(node.value, node.slice)
+            if owned:
+                print(".to_string()" if string else ".to_vec()", end='')
+            print(")" if wrap else "", end='')
+
+        if check:
+            print(f" {CLOSE_BRACE}", end='')
+
+    def visit_Stepped_Slice(self, node, string: bool, owned: bool):
+        """
+        Not part of the visitor pattern. A slice with a step is written
+        as an iterator over the elements, collected only if owned.
+        """
+        typed = self.type_by_node[node.value]
+        self.precedence = MAX_PRECEDENCE * 2
+        self.visit(node.value)
+        if node.slice.lower or node.slice.upper:
+            self.print_slice_range(node.value, node.slice)
+        print(".chars()" if string else iter_elements(typed, not owned), end='')
+
+        step = node.slice.step
+        if (isinstance(step, ast.UnaryOp) and isinstance(step.op, ast.USub) and
+                isinstance(step.operand, ast.Constant)):
+            if node.slice.lower or node.slice.upper:
+                raise Exception("We currently only handle negative steps over the whole of a list")
+            print(".rev()", end='')
+            if step.operand.value != 1:
+                print(f".step_by({step.operand.value})", end='')
+        elif isinstance(step, ast.Constant):
+            print(f".step_by({step.value})", end='')
+        else:
+            print(".step_by(", end='')
+            self.precedence = MAX_PRECEDENCE * 2
+            self.visit(step)
+            print(" as usize)", end='')
+
+        if owned:
+            print(".collect::<String>()" if string else ".collect::<Vec<_>>()", end='')
+
+    def print_slice_range(self, value, node: ast.Slice):
+        """
+        Not part of the visitor pattern. Writes the range of a slice,
+        such as [a.len().min(1)..a.len().saturating_sub(1).max(a.len().min(1))].
+        Like Python, bounds beyond the end of the container are clamped
+        to it, negative bounds count back from the end but not past the
+        start, and an end before the start gives an empty slice.
+        """
+        lower = node.lower
+        if isinstance(lower, ast.Constant) and lower.value == 0:
+            lower = None
+        print("[", end='')
+        if lower:
+            self.print_slice_bound(value, lower)
+        print("..", end='')
+        if node.upper:
+            self.print_slice_bound(value, node.upper)
+            ordered = (not lower or isinstance(lower, ast.Constant) and
+                isinstance(node.upper, ast.Constant) and lower.value <= node.upper.value)
+            if not ordered:
+                print(".max(", end='')
+                self.print_slice_bound(value, lower)
+                print(")", end='')
+        print("]", end='')
+
+    def print_slice_bound(self, value, bound):
+        """
+        Not part of the visitor pattern. Writes a bound of a slice of the
+        given container, clamped to lie within it. A bound that is not
+        constant may be negative, counting back from the end, so it is
+        clamped by the slice_bound helper.
+        """
+        self.precedence = MAX_PRECEDENCE * 2
+        if (isinstance(bound, ast.UnaryOp) and isinstance(bound.op, ast.USub) and
+                isinstance(bound.operand, ast.Constant)):
+            self.visit(value)
+            print(f".len().saturating_sub({bound.operand.value})", end='')
+        elif isinstance(bound, ast.Constant):
+            self.visit(value)
+            print(f".len().min({bound.value})", end='')
+        else:
+            print("slice_bound(", end='')
+            self.precedence = 0
+            self.visit(bound)
+            print(", ", end='')
+            self.precedence = MAX_PRECEDENCE * 2
+            self.visit(value)
+            print(".len())", end='')
+
+    def print_ascii_check(self, name: str):
+        """
+        Not part of the visitor pattern. If the given variable is a string
+        that is sliced, checks its new value is ASCII.
+        """
+        if name in self.ascii_strings:
+            print(f"{self.pretty()}assert!({self.renamed_vars.get(name, name)}.is_ascii());")
+
     def visit_BinOp(self, node):
         # There needs to be special handling for Lists.
         # Python treats A o B as element-wise operator o
@@ -632,26 +2042,16 @@ class RustGenerator(ast.NodeVisitor):
         #     (a + b) * c
         #     ).collect::<Vec<_>>();
         #
-        unpack = self.unpack_lists(node)
-        if unpack:
-            for i, var in enumerate(unpack):
-                if i > 0:
-                    print(".zip(", end='')
-                print(f"{var}.iter()", end='')
-            print(")" * i, end='')
-            print(".map(|(", end='')
-            n = len(unpack)
-            for i, var in enumerate(unpack):
-                if i == n - 1:
-                    print(", ", end='')
-                elif i > 0:
-                    print(",(", end='')
-                print(var, end='')
-            print(")" * i, end='')
-            print("|")
-            self.add_pretty(1)
-            print(self.pretty(), end='')
-            self.unpacking = True
+        if (isinstance(node.op, ast.Mult) and repeated_element(node) and
+                is_list(self.type_by_node.get(node) or " ")):
+            self.visit_List_Repeat(node)
+            return
+
+        if not self.unpacking and self.elementwise_arrays(node):
+            self.visit_Elementwise(node)
+            return
+        if not self.unpacking and is_list(self.type_by_node.get(node) or " "):
+            print("Warning: unhandled subnode of binary operator on lists", file=sys.stderr)
 
         # some binary operators such as '+' translate
         # into binary operators in Rust. However, pow needs
@@ -661,15 +2061,47 @@ class RustGenerator(ast.NodeVisitor):
             self.visit_PowOp(node)
         elif op == "Mult" and string_repeat_needed(self, node):
             self.visit_StringRepeat(node)
+        elif self.fused_multiply_add and self.multiply_add(node):
+            self.visit_Mul_Add(node)
         else:
             self.parens_if_needed(op, lambda: self.do_visit_BinOp(node))
 
-        # close the list special handling if needed
-        if unpack:
-            print()
-            print(f"{self.pretty()}).collect::<Vec<_>>()", end='')
-            self.add_pretty(-1)
-            self.unpacking = False
+    def multiply_add(self, node):
+        """
+        Not part of the visitor pattern. If this is a float expression
+        of the form a * b + c, c + a * b or a * b - c, returns the
+        product and the term added to it. Otherwise returns None.
+        """
+        if self.unpacking or not isinstance(node.op, (ast.Add, ast.Sub)):
+            return None
+        pairs = [(node.left, node.right)]
+        if isinstance(node.op, ast.Add):
+            pairs.append((node.right, node.left))
+        for product, addend in pairs:
+            if (isinstance(product, ast.BinOp) and isinstance(product.op, ast.Mult) and
+                    all(self.type_by_node.get(n) == "f64"
+                        for n in (node, product, product.left, product.right, addend))):
+                return product, addend
+        return None
+
+    def visit_Mul_Add(self, node):
+        """
+        Not part of the visitor pattern. Writes a * b + c as a fused
+        multiply-add, a.mul_add(b, c), which rounds only once.
+        """
+        product, addend = self.multiply_add(node)
+        old_prec = self.precedence
+        print_float_receiver(self, product.left)
+        print(".mul_add(", end='')
+        self.precedence = 0
+        self.visit(product.right)
+        print(", ", end='')
+        if isinstance(node.op, ast.Sub):
+            print("-", end='')
+            self.precedence = OPERATOR_PRECEDENCE["USub"] * 2
+        self.visit(addend)
+        print(")", end='')
+        self.precedence = old_prec
     
     def do_visit_BinOp(self, node):
         # We may need some type coercion, as Rust gets upset by mixed-mode arithmetic
@@ -677,6 +2109,14 @@ class RustGenerator(ast.NodeVisitor):
         right = self.type_by_node[node.right]
         this_type = self.type_by_node[node]
 
+        # when unpacking lists, we work with the types of the elements
+        if self.unpacking:
+            left, right, this_type = [strip_container(t) if is_list(t or " ") else t
+                for t in (left, right, this_type)]
+        elif this_type == "String" and is_string(left) and is_string(right):
+            self.visit_String_Concat(node, left, right)
+            return
+
         if left != this_type:
             self.parens_if_needed("as", lambda: self.visit(node.left))
             print(f" as {this_type}", end='')
@@ -694,25 +2134,132 @@ class RustGenerator(ast.NodeVisitor):
 
         self.precedence -= 1
 
+    def visit_String_Concat(self, node, left: str, right: str):
+        """
+        Not a standard visitor function, but one we invoke to handle
+        adding strings. In Rust, the left hand side must be an owned
+        String, which is extended by a borrowed &str on the right.
+        """
+        old_prec = self.precedence
+        if left != "String":
+            self.precedence = MAX_PRECEDENCE * 2
+            self.visit(node.left)
+            print(".to_string()", end='')
+        else:
+            self.visit(node.left)
+        self.visit(node.op)
+        if right == "String":
+            print("&", end='')
+            self.precedence = MAX_PRECEDENCE * 2
+        else:
+            self.precedence = old_prec + 1
+        self.visit(node.right)
+        self.precedence = old_prec
+
     def visit_PowOp(self, node):
         """
         Not a standard visitor function, but one we invoke
-        to handle the Pow operator "**"
+        to handle the Pow operator "**". What we write depends on the
+        types of the base and exponent:
+
+            x ** 2      x * x               small powers of a variable
+            x ** 0.5    x.sqrt()
+            x ** n      x.powi(n as i32)    float x, integer n
+            x ** y      x.powf(y)           float y
+            i ** 3      i.pow(3)            constant exponent
+            i ** n      i.checked_pow(u32::try_from(n).expect(...)).expect(...)
+
+        Integer powers with a variable exponent are checked, as Rust
+        integers overflow where Python's would just grow, and Rust
+        requires the exponent to be unsigned. An integer to a negative
+        power is a float in Python, which we cannot give an integer
+        type, so a negative constant exponent is rejected.
         """
+        base_type = self.type_by_node.get(node.left)
+        exponent_type = self.type_by_node.get(node.right)
+        float_result = self.type_by_node.get(node) == "f64"
+        try:
+            exponent = ast.literal_eval(node.right)
+        except ValueError:
+            exponent = None
+        if not isinstance(exponent, (int, float)) or isinstance(exponent, bool):
+            exponent = None
+        if (not float_result and isinstance(exponent, int) and exponent < 0 and
+                base_type == "i64"):
+            raise Exception("An integer to a negative power is a float: make the base a float")
+
+        if (isinstance(exponent, int) and 1 <= exponent <= MAX_INLINE_POWER and
+                isinstance(node.left, (ast.Name, ast.Attribute))):
+            self.visit_Power_Product(node.left, exponent, base_type)
+            return
+
         # ensure that any contained expression gets wrapped in
         # parentheses
         old_prec = self.precedence
         self.precedence = MAX_PRECEDENCE * 2
+        if float_result and base_type != "f64":
+            print("(", end='')
+            self.precedence = OPERATOR_PRECEDENCE["as"] * 2
+            self.visit(node.left)
+            print(" as f64)", end='')
+        elif isinstance(node.left, ast.Constant):
+            # Rust cannot call methods on a literal of unknown type
+            print(f"{node.left.value}_{base_type}", end='')
+        else:
+            self.visit(node.left)
 
-        # TODO decide between pow, powf and powi on the basis of type
-        # For now, assume the arguments are integer (i64). Note that
-        # Rust requires the rhs to be unsigned.
-        self.visit(node.left)
-        print(".pow((", end='')
         self.precedence = 0     # already have parentheses
-        self.visit(node.right)
-        print(") as u32)", end='')
+        if float_result and exponent == 0.5:
+            print(".sqrt()", end='')
+        elif float_result and exponent_type == "f64":
+            print(".powf(", end='')
+            self.visit(node.right)
+            print(")", end='')
+        elif float_result and isinstance(exponent, int):
+            print(f".powi({exponent})", end='')
+        elif float_result:
+            print(".powi((", end='')
+            self.visit(node.right)
+            print(") as i32)", end='')
+        elif isinstance(exponent, int) and exponent >= 0:
+            print(f".pow({exponent})", end='')
+        else:
+            print(".checked_pow(std::convert::TryFrom::try_from(", end='')
+            self.visit(node.right)
+            print(').expect("negative exponent in **")).expect("overflow in **")', end='')
+
+        self.precedence = old_prec
+
+    def visit_Power_Product(self, base, exponent: int, typed: str):
+        """
+        Not part of the visitor pattern. Writes a small constant power
+        of a variable as a product, such as x * x * x, which is quicker
+        than a call to powi.
+        """
+        def product():
+            for i in range(exponent):
+                if i > 0:
+                    print(" * ", end='')
+                self.visit(base)
+        if exponent == 1:
+            self.visit(base)
+        else:
+            self.parens_if_needed("Mult", product)
 
+    def visit_List_Repeat(self, node):
+        """
+        Not part of the visitor pattern. Writes a single element list
+        repeated, such as [0.0] * n, as vec![0.0; n as usize].
+        """
+        element, count = repeated_element(node)
+        old_prec = self.precedence
+        print("vec![", end='')
+        self.precedence = 0
+        self.visit_and_optionally_convert(element)
+        print("; ", end='')
+        self.precedence = OPERATOR_PRECEDENCE["as"] * 2
+        self.visit(count)
+        print(" as usize]", end='')
         self.precedence = old_prec
 
     def visit_StringRepeat(self, node):
@@ -773,6 +2320,9 @@ class RustGenerator(ast.NodeVisitor):
         self.print_operator("&")
     
     def visit_UnaryOp(self, node):
+        if not self.unpacking and self.elementwise_arrays(node):
+            self.visit_Elementwise(node)
+            return
         op = node.op.__class__.__name__
         self.parens_if_needed(op, lambda: self.generic_visit(node))
 
@@ -887,6 +2437,16 @@ class RustGenerator(ast.NodeVisitor):
         assert(len(node.ops) == 1)
         assert(len(node.comparators) == 1)
 
+        # membership of a constant literal, or a variable only ever
+        # holding one, can be tested without creating the container
+        comparator = node.comparators[0]
+        if isinstance(comparator, ast.Name) and comparator.id in self.constant_containers:
+            comparator = self.constant_containers[comparator.id]
+        elements = constant_elements(comparator)
+        if elements is not None:
+            self.visit_Constant_In_Compare(node.left, elements)
+            return
+
         self.visit(node.comparators[0])
         typed = extract_container(self.type_by_node[node.comparators[0]])
         use_position = False
@@ -910,6 +2470,67 @@ class RustGenerator(ast.NodeVisitor):
         if use_position:
             print(" != None", end='')
 
+    def visit_Constant_In_Compare(self, left, elements: List[ast.Constant]):
+        """
+        Not part of the visitor pattern. Writes an "in" test against
+        a list of constants, without allocating a container:
+
+            x in [1, 3, 5]      ->  matches!(x, 1 | 3 | 5)
+
+        Longer lists are sorted into a static array and binary searched.
+        Floats are not Ord in Rust, so they are searched linearly.
+        """
+        if not elements:
+            print("false", end='')
+            return
+
+        typed = self.type_by_node[left]
+        python_type = type(elements[0].value)
+        if python_type == str:
+            # compare as &str, which is what string literals are
+            suffix = "" if typed == "&str" else ".as_str()"
+            prefix = ""
+        else:
+            suffix = ""
+            prefix = "*" if is_reference_type(typed) else ""
+
+        if len(elements) <= MAX_MATCHED_ELEMENTS and python_type != float:
+            print("matches!(", end='')
+            self.precedence = MAX_PRECEDENCE * 2 if prefix or suffix else 0
+            print(prefix, end='')
+            self.visit(left)
+            print(f"{suffix}, ", end='')
+            separator = ""
+            for element in elements:
+                print(separator, end='')
+                self.visit(element)
+                separator = " | "
+            print(")", end='')
+            return
+
+        if python_type == float:
+            method = "contains"
+            ordered = elements
+        else:
+            method = "binary_search"
+            ordered = sorted(elements, key=lambda e: e.value)
+        print("[", end='')
+        separator = ""
+        for element in ordered:
+            print(separator, end='')
+            self.visit(element)
+            separator = ", "
+        print(f"].{method}(", end='')
+        if prefix:
+            prefix = ""     # already a reference
+        else:
+            prefix = "&"
+        self.precedence = MAX_PRECEDENCE * 2 if suffix else 0
+        print(prefix, end='')
+        self.visit(left)
+        print(suffix, end='')
+        print(")" if method == "contains" else ").is_ok()", end='')
+
     def visit_Eq(self, node):
         print(" == ", end='')
     
@@ -961,7 +2582,42 @@ class RustGenerator(ast.NodeVisitor):
             self.add_pretty(-1)
         print(f"{self.pretty()}{CLOSE_BRACE}")
 
+    def hoist_loop_invariants(self, node):
+        """
+        Not part of the visitor pattern. Before writing a loop, evaluate
+        any expressions within it that do not change from one iteration
+        to the next, such as len(a) or a literal list used in an "in"
+        test, and store them in temp variables. Also create any scratch
+        collections used within the loop, so they can be reused.
+        """
+        for expr in find_loop_invariants(node, self.type_by_node, self.hoisted):
+            name = self.temp_variable()
+            print(f"{self.pretty()}let {name} = ", end='')
+            self.precedence = 0     # don't need params around value
+            self.visit(expr)
+            print(";")
+            self.hoisted[expr] = name
+
+        # scratch collections are created once, and cleared on each iteration
+        for assign, loop in self.scratch.items():
+            if loop is node:
+                name = scratch_name(assign)
+                self.variables.add(name)
+                typed = ""
+                if isinstance(assign, ast.AnnAssign):
+                    typed = ": " + type_from_annotation(assign.annotation, name, True)
+                print(f"{self.pretty()}let mut {name}{typed} = ", end='')
+                self.precedence = 0
+                self.visit(assign.value)
+                print(";")
+
     def visit_While(self, node):
+        self.hoist_loop_invariants(node)
+        pop = draining_loop(node)
+        if (pop and is_dict(self.type_by_node.get(pop.value.func.value) or " ") and
+                not names_in(pop.targets) & self.variables):
+            self.visit_Drain_While(node, pop)
+            return
         print(f"{self.pretty()}while ", end='')
         self.precedence = 0     # don't need params around while condition
         self.visit(node.test)
@@ -973,24 +2629,99 @@ class RustGenerator(ast.NodeVisitor):
         assert(len(node.orelse) == 0)
         print(f"{self.pretty()}{CLOSE_BRACE}")
     
+    def visit_Drain_While(self, node, pop):
+        """
+        Not part of the visitor pattern. A loop emptying a dict one item
+        at a time is written as a single pass draining it, rather than
+        finding and removing each item in turn:
+
+            while d:                        for (k, v) in d.drain() {
+                k, v = d.popitem()              ...
+                ...                         }
+        """
+        targets = names_in(pop.targets)
+        self.variables |= targets
+        mutable = self.mutable_vars | self.mutable_ref_vars
+        print(f"{self.pretty()}for {target_as_string(pop.targets[0], mutable)} in ", end='')
+        self.precedence = MAX_PRECEDENCE * 2
+        self.visit(node.test)
+        print(".drain() {")
+        self.add_pretty(1)
+        for line in node.body[1:]:
+            self.visit(line)
+        self.add_pretty(-1)
+        self.variables -= targets
+        print(f"{self.pretty()}{CLOSE_BRACE}")
+
     def visit_For(self, node):
+        self.hoist_loop_invariants(node)
+        if self.fast_reductions:
+            reduction = reduction_loop(node, self.type_by_node)
+            if reduction:
+                self.visit_Reduction_For(node, *reduction)
+                return
+        if isinstance(node.target, ast.Name) and isinstance(node.iter, ast.Name):
+            classname = self.columnar_class(self.type_by_node.get(node.iter, ""))
+            if classname:
+                self.visit_Columns_For(node, classname)
+                return
         print(f"{self.pretty()}for ", end='')
         self.precedence = 0     # don't need params around for condition
-        self.visit(node.target)
+        # the targets are only in scope within the loop
+        targets = names_in([node.target]) - self.variables
+        self.variables |= targets
+        self.borrowing = targets_only_read(node.target, node.body)
+        # owned values may be changed in the body, as by v.append(x),
+        # unless they are changed in place in the container
+        in_place = node in self.in_place_loops
+        mutable = set() if self.borrowing or in_place else self.mutable_ref_vars
+        print(target_as_string(node.target, mutable), end='')
         print(" in ", end='')
-        self.visit(node.iter)
+        if in_place:
+            self.visit_In_Place_Iter(node.iter)
+        elif is_comprehension(node.iter):
+            self.do_visit_Comprehension(node.iter)
+        else:
+            self.visit(node.iter)
+        self.borrowing = False
         print(" {")
         self.add_pretty(1)
         for line in node.body:
             self.visit(line)
         self.add_pretty(-1)
+        self.variables -= targets
         assert(len(node.orelse) == 0)
         print(f"{self.pretty()}{CLOSE_BRACE}")
     
+    def visit_In_Place_Iter(self, node):
+        """
+        Not part of the visitor pattern. Writes the iterator for a loop
+        that changes the elements of a list or dict in place, which
+        borrows them mutably:
+
+            for v in a:                 for v in a.iter_mut()
+            for v in d.values():        for v in d.values_mut()
+            for k, v in d.items():      for (k, v) in d.iter_mut()
+        """
+        method = "iter_mut"
+        if isinstance(node, ast.Call):
+            method = "values_mut" if node.func.attr == "values" else "iter_mut"
+            node = node.func.value
+        self.precedence = MAX_PRECEDENCE * 2
+        self.visit(node)
+        print(f".{method}()", end='')
+
     def visit_Break(self, node):
+        if node in self.generator_jumps:
+            # from now on, the generator yields nothing
+            print(f"{self.pretty()}self.state = {self.finished_state};")
+            print(f"{self.pretty()}return None;")
+            return
         print(f"{self.pretty()}break;")
 
     def visit_Continue(self, node):
+        if node in self.generator_jumps and self.generator_state != 0:
+            print(f"{self.pretty()}self.state = 0;")
         print(f"{self.pretty()}continue;")
 
     def visit_ListComp(self, node):
@@ -1007,18 +2738,118 @@ class RustGenerator(ast.NodeVisitor):
         We leave the more unusual case of more than one generator as
         an exercise...
         """
-        self.do_visit_Comprehension(node)
-        print(".collect::<Vec<_>>()", end='')
+        self.collect_Comprehension(node, "Vec", lambda: self.do_visit_Comprehension(node))
+
+    def visit_GeneratorExp(self, node):
+        """
+        A generator expression is written as a lazy iterator chain where
+        it is consumed straight away, for example by sum, any or a for
+        loop. Anywhere else, such as when passed to a function, we have
+        to collect it.
+        """
+        self.collect_Comprehension(node, "Vec", lambda: self.do_visit_Comprehension(node))
 
     def visit_SetComp(self, node):
-        self.do_visit_Comprehension(node)
-        print(".collect::<HashSet<_>>()", end='')
+        self.collect_Comprehension(node, "HashSet", lambda: self.do_visit_Comprehension(node))
 
     def visit_DictComp(self, node):
+        self.collect_Comprehension(node, "HashMap", lambda: self.do_visit_DictComp(node))
+
+    def collect_Comprehension(self, node, container: str, visit_iterator):
+        """
+        Not part of the visitor pattern. Collects the iterator written by
+        visit_iterator into the given type of container.
+
+        Collecting grows the container as needed, starting from the lower
+        bound of the iterator's size hint. With no filter the size is
+        exact, so collect allocates just once. A filter makes the lower
+        bound zero, so if we know an upper bound from the source, we
+        allocate that up front instead:
+
+            [x for x in range(n) if foo(x)]
+
+            { let mut tmp = Vec::with_capacity((n as usize).min(1024)); tmp.extend(...); tmp }
+
+        The filter may pass only a few items of a huge source, so the
+        reservation is capped at MAX_RESERVED_CAPACITY.
+        """
+        generator = node.generators[0]
+        columns = self.columnar_class(self.type_by_node.get(node, "")) if container == "Vec" else ""
+        if columns:
+            visit_iterator()
+            print(f".collect::<{columns}Columns>()", end='')
+        elif (len(node.generators) == 1 and generator.ifs and
+                self.has_size_bound(generator.iter)):
+            tmp = self.temp_variable()
+            print(f"{OPEN_BRACE} let mut {tmp} = {container}::with_capacity(", end='')
+            self.print_size_bound(generator.iter)
+            print(f"); {tmp}.extend(", end='')
+            visit_iterator()
+            print(f"); {tmp} {CLOSE_BRACE}", end='')
+        else:
+            visit_iterator()
+            wildcards = "_, _" if container == "HashMap" else "_"
+            print(f".collect::<{container}<{wildcards}>>()", end='')
+
+    def has_size_bound(self, node) -> bool:
+        """
+        Not part of the visitor pattern. Can we tell how many items
+        the given source of a comprehension yields, at most?
+        """
+        if not isinstance(node, ast.Call):
+            return False
+        path = get_node_path(node.func)
+        if path == ["range"]:
+            return len(node.args) in (1, 2)
+        elif path == ["zip"]:
+            return all(isinstance(a, ast.Name) for a in node.args)
+        else:
+            return (len(path) == 2 and path[0] in self.variables and
+                path[1] in ("items", "keys", "values"))
+
+    def print_size_bound(self, node):
+        """
+        Not part of the visitor pattern. Writes the maximum number
+        of items that the given source of a comprehension yields, as
+        a usize, capped at MAX_RESERVED_CAPACITY.
+        """
+        path = get_node_path(node.func)
+        if path == ["range"]:
+            args = node.args if len(node.args) == 2 else [ast.Constant(0), node.args[0]]
+            if all(isinstance(a, ast.Constant) for a in args):
+                size = max(args[1].value - args[0].value, 0)
+                print(min(size, MAX_RESERVED_CAPACITY), end='')
+                return
+            print("((", end='')
+            self.precedence = 0
+            self.visit(args[1])
+            if not isinstance(args[0], ast.Constant) or args[0].value != 0:
+                print(" - ", end='')
+                self.precedence = OPERATOR_PRECEDENCE["Sub"] * 2 + 1
+                self.visit(args[0])
+            print(").max(0) as usize)", end='')
+        elif path == ["zip"]:
+            for i, arg in enumerate(node.args):
+                if i > 0:
+                    print(".min(", end='')
+                print(f"{arg.id}.len()", end='')
+                if i > 0:
+                    print(")", end='')
+        else:
+            print(f"{path[0]}.len()", end='')
+        print(f".min({MAX_RESERVED_CAPACITY})", end='')
+
+    def do_visit_DictComp(self, node):
+        """
+        Helper function for dictionary comprehensions. Does all the work
+        apart from the final collection into a HashMap.
+        """
         first = True
         for generator in node.generators:
             if not first:
                 print(", ", end='')
+            self.borrowing = targets_only_read(generator.target,
+                [node.key, node.value] + generator.ifs)
             self.visit(generator)
             first = False
 
@@ -1029,23 +2860,52 @@ class RustGenerator(ast.NodeVisitor):
             print(", ", end='')
             self.visit(node.value)
             print("))", end='')
-        print(".collect::<HashMap<_, _>>()", end='')
 
-    def do_visit_Comprehension(self, node):
+    def print_lazy_iterator(self, node):
+        """
+        Not part of the visitor pattern. Writes an iterator over the
+        items of the given container, generator or comprehension, to be
+        consumed just once. Comprehensions are written as an iterator
+        chain, with no intermediate collection:
+
+            sum([x * x for x in a])
+
+            a.iter().copied().map(|x| (x * x)).sum::<f64>()
+        """
+        if is_comprehension(node):
+            self.do_visit_Comprehension(node)
+            return
+        arrays = self.elementwise_arrays(node)
+        if arrays:
+            self.print_elementwise_iterator(node, arrays)
+            return
+        if isinstance(node, ast.Name) and node.id in self.matrices:
+            print(f"{node.id}.iter().copied()", end='')     # held flat
+            return
+        typed = self.type_by_node[node]
+        self.precedence = MAX_PRECEDENCE * 2
+        self.visit(node)
+        if not is_iterator_type(typed):
+            print(iter_elements(typed, self.borrowing), end='')
+
+    def do_visit_Comprehension(self, node, consumer: str = "map"):
         """
         Helper function for comprehensions. Does all the work apart 
-        from the final collection into the desired type.
+        from the final collection into the desired type. The element
+        is passed to the consumer as a closure, which is normally map,
+        but may be a method such as any that ends the iterator chain.
         """
         if len(node.generators) != 1:
             print("Warning: comprehensions with more than one generator not supported")
 
         # writes (0..100).filter(|x| bar(x))
         for generator in node.generators:
+            self.borrowing = targets_only_read(generator.target, [node.elt] + generator.ifs)
             self.visit(generator)
 
         # shortcut if elt is just a variable name, otherwise need a map
-        if not isinstance(node.elt, ast.Name):
-            print(f".map(|{self.target}| ", end='')
+        if consumer != "map" or not isinstance(node.elt, ast.Name):
+            print(f".{consumer}(|{self.target}| ", end='')
             self.visit(node.elt)
             print(")", end='')
 
@@ -1065,17 +2925,22 @@ class RustGenerator(ast.NodeVisitor):
             (0..100).filter(|x| bar(x))
         """
 
-        # first find out the target. This is either a variable
-        # (Name) or a Tuple.
-        self.target = target_as_string(node.target)
-
-        # iterator e.g. (0..100)
+        # iterator e.g. (0..100), or a.iter() for a container
         self.precedence = MAX_PRECEDENCE * 2
-        self.visit(node.iter)    # (0..100)
+        self.print_lazy_iterator(node.iter)    # (0..100)
+        self.borrowing = False
 
-        # if statements e.g. .filter(|x| bar(x))
+        # find out the target. This is either a variable (Name) or
+        # a Tuple. Set this after writing the iterator, which may be
+        # a comprehension with its own target.
+        self.target = target_as_string(node.target)
+
+        # if statements e.g. .filter(|x| bar(x)). The filter is passed
+        # a reference to each item, so dereference Copy types.
+        element = strip_container(self.type_by_node[node.iter])
+        pattern = f"&{self.target}" if is_copy_type(element) else self.target
         for i in node.ifs:
-            print(f".filter(|{self.target} ", end='')
+            print(f".filter(|{pattern}| ", end='')
             self.visit(i)
             print(")", end='')
 
@@ -1121,8 +2986,32 @@ class RustGenerator(ast.NodeVisitor):
         Note that Rust does not handle multiple assignments on one
         line, so we write a line for each one.
         """
+        if node in self.scratch:
+            print(f"{self.pretty()}{node.targets[0].id}.clear();")
+            return
+        if self.is_matrix_assign(node, node.targets[0]):
+            self.visit_Matrix_Assign(node.targets[0].id)
+            return
+        target = node.targets[0]
+        if (len(node.targets) == 1 and isinstance(target, ast.Subscript) and
+                isinstance(target.value, ast.Name) and isinstance(target.slice, ast.Slice) and
+                not (target.slice.lower or target.slice.upper or target.slice.step) and
+                float_slice(target.value, self.type_by_node) and
+                self.find_elementwise_arrays(node.value, [])):
+            self.visit_Elementwise_Assign(target.value.id, None, node.value)
+            return
+
         first = True
         for target in node.targets:
+            # constant containers only used for "in" tests are never created
+            if isinstance(target, ast.Name) and target.id in self.constant_containers:
+                continue
+
+            # lists that are never resized are created as arrays
+            if isinstance(target, ast.Name) and target.id in self.array_vars:
+                self.visit_Array_Assign(target.id, node.value)
+                continue
+
             print(f"{self.pretty()}", end='')
 
             # treatment depends on whether it is the first time we
@@ -1156,7 +3045,8 @@ class RustGenerator(ast.NodeVisitor):
 
             if first:
                 self.precedence = 0     # don't need params around value
-                self.visit_and_optionally_convert(node.value)
+                self.visit_and_optionally_convert(node.value,
+                    not self.is_borrowed_assignment(node.value, target))
                 first_target = target
                 first = False
             else:
@@ -1166,11 +3056,124 @@ class RustGenerator(ast.NodeVisitor):
             if isdict:
                 print(")", end='')
             print(";")
+            if isinstance(target, ast.Name):
+                self.print_ascii_check(target.id)
 
             # now we may need to assign what we originally wanted to
             if tmp_var_name:
                 self.assign_tuple(target, tmp_var_name)
 
+    def is_borrowed_assignment(self, value, target) -> bool:
+        """
+        Not part of the visitor pattern. Can this assignment borrow the
+        value rather than copying it? That is the case for strings that
+        are only ever borrowed, and for contiguous slices assigned to a
+        variable that is never modified.
+        """
+        if not isinstance(target, ast.Name):
+            return False
+        elif target.id in self.borrowed_strings:
+            return True
+        return (isinstance(value, ast.Subscript) and isinstance(value.slice, ast.Slice) and
+            not value.slice.step and
+            target.id not in self.mutable_vars and target.id not in self.mutable_ref_vars)
+
+    def is_matrix_assign(self, node, target) -> bool:
+        return (isinstance(target, ast.Name) and target.id in self.matrices and
+            self.matrices[target.id][0] is node)
+
+    def visit_Matrix_Assign(self, name: str):
+        """
+        Not part of the visitor pattern. Creates a rectangular matrix as
+        a single Vec, holding the rows one after another:
+
+            a = [[0.0] * m for _ in range(n)]
+
+            let a_rows = n;
+            let a_cols = m;
+            let mut a = vec![0.0; (a_rows * a_cols) as usize];
+
+        The dimensions are fixed when the matrix is created, so later
+        changes to n or m do not affect how it is indexed.
+        """
+        shape = self.matrices[name][1]
+        rows, cols = self.matrix_dimensions(name)
+        for dimension, value in ((rows, shape.rows), (cols, shape.columns)):
+            self.variables.add(dimension)
+            print(f"{self.pretty()}let {dimension} = ", end='')
+            self.precedence = 0
+            self.visit(value)
+            print(";")
+        self.variables.add(name)
+        mut = "mut " if name in self.mutable_ref_vars else ""
+        print(f"{self.pretty()}let {mut}{name} = vec![", end='')
+        self.visit(shape.fill)
+        print(f"; ({rows} * {cols}) as usize];")
+
+    def matrix_dimensions(self, name: str) -> Tuple[str, str]:
+        """
+        Not part of the visitor pattern. Returns the names of the
+        variables holding the number of rows and columns of a matrix.
+        """
+        return f"{name}_rows", f"{name}_cols"
+
+    def matrix_dimension(self, node) -> str:
+        """
+        Not part of the visitor pattern. If the given expression is a
+        flat matrix or one of its rows, returns the name of the variable
+        holding its length, which is the number of rows or columns.
+        Otherwise returns "".
+        """
+        if isinstance(node, ast.Name) and node.id in self.matrices:
+            return self.matrix_dimensions(node.id)[0]
+        if (isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and
+                node.value.id in self.matrices):
+            return self.matrix_dimensions(node.value.id)[1]
+        return ""
+
+    def visit_Matrix_Subscript(self, matrix, row, column):
+        """
+        Not part of the visitor pattern. Writes a[i][j] or a[i, j] for a
+        flat matrix as a[flat_index(i, j, a_cols)]. The helper checks the
+        column is within the row in debug builds.
+        """
+        name = matrix.id
+        _, cols = self.matrix_dimensions(name)
+        print(f"{name}[flat_index(", end='')
+        self.precedence = 0
+        self.visit(row)
+        print(", ", end='')
+        self.precedence = 0
+        self.visit(column)
+        print(f", {cols})]", end='')
+
+    def visit_Array_Assign(self, name: str, value):
+        """
+        Not part of the visitor pattern. Declares a list that is never
+        resized as a fixed-size array, which lives on the stack rather
+        than the heap:
+
+            days = [a, b, c]        ->  let days: [i64; 3] = [a, b, c];
+
+        If the elements are all numeric constants and the array is never
+        modified, it is made static, so it costs nothing at run time:
+
+            days = [31, 28, 31]     ->  static DAYS: [i64; 3] = [31, 28, 31];
+        """
+        typed = self.array_vars[name]
+        self.variables.add(name)
+        elements = constant_elements(value)
+        if (elements is not None and not isinstance(elements[0].value, str) and
+                name not in self.mutable_ref_vars):
+            self.renamed_vars[name] = name.upper()
+            print(f"{self.pretty()}static {name.upper()}: {typed} = ", end='')
+        else:
+            mut = "mut " if name in self.mutable_ref_vars else ""
+            print(f"{self.pretty()}let {mut}{name}: {typed} = ", end='')
+        self.precedence = 0
+        self.do_visit_List(value)
+        print(";")
+
     def assign_tuple(self, node, tmp_var_name: str):
         """
         As Rust does not allow direct assignment to an unpacked
@@ -1194,6 +3197,13 @@ class RustGenerator(ast.NodeVisitor):
         We do not yet handle non-simple assignments such as
         (x): int = 42
         """
+        if node in self.scratch:
+            print(f"{self.pretty()}{node.target.id}.clear();")
+            return
+        if self.is_matrix_assign(node, node.target):
+            self.visit_Matrix_Assign(node.target.id)
+            return
+
         # treatment depends on whether it is the first time we
         # have seen this variable. (Do not use shadowing.)
         mutable, declared, _, _ = self.sex_variable(node.target)
@@ -1209,12 +3219,36 @@ class RustGenerator(ast.NodeVisitor):
 
         self.visit(node.target)
         typed = type_from_annotation(node.annotation, node.target, True)
+        columns = self.columnar_class(typed)
+        if columns:
+            typed = f"{columns}Columns"
         print(f": {typed} = ", end='')
         self.precedence = 0     # don't need params around value
-        self.visit_and_optionally_convert(node.value)
+        if columns and isinstance(node.value, ast.List) and not node.value.elts:
+            print(f"{columns}Columns::new()", end='')
+        else:
+            self.visit_and_optionally_convert(node.value)
         print(";")
+        if isinstance(node.target, ast.Name):
+            self.print_ascii_check(node.target.id)
 
     def visit_AugAssign(self, node):
+        # numpy arrays act elementwise, as do lists of floats where the
+        # value is itself elementwise, as in a += b * w. Otherwise a += b
+        # for a list is extend, whatever its elements.
+        arrays: List[str] = []
+        if (float_slice(node.target, self.type_by_node) and
+                self.find_elementwise_arrays(node.value, arrays) and
+                (node.target.id in self.numpy_arrays or
+                    arrays and not isinstance(node.value, ast.Name))):
+            self.visit_Elementwise_Assign(node.target.id, node.op, node.value)
+            return
+        if (isinstance(node.op, ast.Add) and isinstance(node.target, ast.Name) and
+                is_list(self.type_by_node.get(node.target) or " ")):
+            print(f"{self.pretty()}{node.target.id}.extend(", end='')
+            self.print_lazy_iterator(node.value)
+            print(");")
+            return
         print(self.pretty(), end='')
         self.visit(node.target)
         self.in_aug_assign = True
@@ -1224,7 +3258,8 @@ class RustGenerator(ast.NodeVisitor):
         self.visit(node.value)
         print(";")
 
-def test_compiler(filename: str):
+def test_compiler(filename: str, enum_dispatch: bool = False, fast_reductions: bool = False,
+        fused_multiply_add: bool = False):
     input_filename = f"tests/{filename}.py"
     output_filename = f"temp/{filename}.rs"
     baseline_filename = f"src/{filename}.rs"
@@ -1250,7 +3285,8 @@ def test_compiler(filename: str):
     dependencies.visit(tree)
     dependencies.write_preamble()
 
-    RustGenerator(ff.headers, ff.class_headers).visit(tree)
+    RustGenerator(ff.headers, ff.class_headers, enum_dispatch, fast_reductions,
+        fused_multiply_add).visit(tree)
     output_file.close()
     sys.stdout = old_stdout
 
@@ -1275,4 +3311,9 @@ if __name__ == "__main__":
     test_compiler("sets")
     test_compiler("dictionaries")
     test_compiler("classes")
-    test_compiler("traits")
+    test_compiler("traits", enum_dispatch=True)
+    test_compiler("generators")
+    test_compiler("numpy_arrays")
+    test_compiler("reductions", fast_reductions=True)
+    test_compiler("maths", fused_multiply_add=True)
+    test_compiler("monte_carlo")
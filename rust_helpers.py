@@ -0,0 +1,402 @@
+"""
+Module holding the Rust source of small helper functions, which stand
+in for Python library functions that have no equivalent in the Rust
+standard library. Each helper is written at the head of the output
+file, only if the Python source needs it, so the output has no
+dependencies beyond std.
+"""
+
+from typing import Dict, List, Set, Tuple
+
+# Mapping from helper name to the helpers it calls, and its source
+RUST_HELPERS: Dict[str, Tuple[List[str], str]] = {
+    "math_erf_series": ([], """\
+/// erf(x) for small x, as 2/sqrt(pi) exp(-x^2) sum 2^n x^(2n+1) / (2n+1)!!
+/// All the terms are positive, so there is no cancellation.
+fn math_erf_series(x: f64) -> f64 {
+    let x2 = x * x;
+    let mut term = x;
+    let mut total = x;
+    let mut n = 0.0;
+    while term.abs() > total.abs() * 1e-17 {
+        n += 1.0;
+        term *= 2.0 * x2 / (2.0 * n + 1.0);
+        total += term;
+    }
+    2.0 / std::f64::consts::PI.sqrt() * (-x2).exp() * total
+}
+"""),
+    "math_erfc_rational": ([], """\
+/// erfc(x) for x >= 1, from the rational approximations of W. J. Cody,
+/// Math. Comp. 23 (1969), which are good to about 1e-16. The factor
+/// exp(-x^2) is taken in two parts, so the rounding of x^2 is not
+/// magnified.
+fn math_erfc_rational(x: f64) -> f64 {
+    let ratio = if x <= 4.0 {
+        const C: [f64; 9] = [5.64188496988670089e-1, 8.88314979438837594e0,
+            6.61191906371416295e1, 2.98635138197400131e2, 8.81952221241769090e2,
+            1.71204761263407058e3, 2.05107837782607147e3, 1.23033935479799725e3,
+            2.15311535474403846e-8];
+        const D: [f64; 8] = [1.57449261107098347e1, 1.17693950891312499e2,
+            5.37181101862009858e2, 1.62138957456669019e3, 3.29079923573345963e3,
+            4.36261909014324716e3, 3.43936767414372164e3, 1.23033935480374942e3];
+        let mut num = C[8] * x;
+        let mut den = x;
+        for i in 0..7 {
+            num = (num + C[i]) * x;
+            den = (den + D[i]) * x;
+        }
+        (num + C[7]) / (den + D[7])
+    } else {
+        const P: [f64; 6] = [3.05326634961232344e-1, 3.60344899949804439e-1,
+            1.25781726111229246e-1, 1.60837851487422766e-2, 6.58749161529837803e-4,
+            1.63153871373020978e-2];
+        const Q: [f64; 5] = [2.56852019228982242e0, 1.87295284992346725e0,
+            5.27905102951428412e-1, 6.05183413124413191e-2, 2.33520497626869185e-3];
+        let z = 1.0 / (x * x);
+        let mut num = P[5] * z;
+        let mut den = z;
+        for i in 0..4 {
+            num = (num + P[i]) * z;
+            den = (den + Q[i]) * z;
+        }
+        (1.0 / std::f64::consts::PI.sqrt() - z * (num + P[4]) / (den + Q[4])) / x
+    };
+    let head = (x * 16.0).trunc() / 16.0;
+    (-head * head).exp() * (-(x - head) * (x + head)).exp() * ratio
+}
+"""),
+    "math_erf": (["math_erf_series", "math_erfc_rational"], """\
+fn math_erf(x: f64) -> f64 {
+    if x.abs() < 1.0 {
+        math_erf_series(x)
+    } else {
+        (1.0 - math_erfc_rational(x.abs())).copysign(x)
+    }
+}
+"""),
+    "math_erfc": (["math_erf_series", "math_erfc_rational"], """\
+fn math_erfc(x: f64) -> f64 {
+    if x.abs() < 1.0 {
+        1.0 - math_erf_series(x)
+    } else if x > 0.0 {
+        math_erfc_rational(x)
+    } else {
+        2.0 - math_erfc_rational(-x)
+    }
+}
+"""),
+    "math_fsum": ([], """\
+/// Shewchuk's algorithm, as used by Python's math.fsum. The running
+/// total is held exactly, as a list of non-overlapping partial sums.
+fn math_fsum<I: IntoIterator<Item = f64>>(values: I) -> f64 {
+    let mut partials: Vec<f64> = Vec::new();
+    let mut special = 0.0;
+    for mut x in values {
+        if !x.is_finite() {
+            special += x;
+            continue;
+        }
+        let mut i = 0;
+        for j in 0..partials.len() {
+            let mut y = partials[j];
+            if x.abs() < y.abs() {
+                std::mem::swap(&mut x, &mut y);
+            }
+            let hi = x + y;
+            let lo = y - (hi - x);
+            if lo != 0.0 {
+                partials[i] = lo;
+                i += 1;
+            }
+            x = hi;
+        }
+        partials.truncate(i);
+        partials.push(x);
+    }
+    if special != 0.0 || special.is_nan() {
+        return special;
+    }
+
+    // add up the partials from the top, correcting the final rounding
+    let mut n = partials.len();
+    let mut hi = 0.0;
+    let mut lo = 0.0;
+    if n > 0 {
+        n -= 1;
+        hi = partials[n];
+        while n > 0 {
+            let x = hi;
+            n -= 1;
+            let y = partials[n];
+            hi = x + y;
+            lo = y - (hi - x);
+            if lo != 0.0 {
+                break;
+            }
+        }
+        if n > 0 && ((lo < 0.0 && partials[n - 1] < 0.0) || (lo > 0.0 && partials[n - 1] > 0.0)) {
+            let y = lo * 2.0;
+            let x = hi + y;
+            if y == x - hi {
+                hi = x;
+            }
+        }
+    }
+    hi
+}
+"""),
+    "math_isclose": ([], """\
+fn math_isclose(a: f64, b: f64, rel_tol: f64, abs_tol: f64) -> bool {
+    if a == b {
+        return true;
+    }
+    if a.is_infinite() || b.is_infinite() {
+        return false;
+    }
+    (a - b).abs() <= (rel_tol * a.abs().max(b.abs())).max(abs_tol)
+}
+"""),
+    "statistics_mean": ([], """\
+fn statistics_mean<I: IntoIterator<Item = f64>>(values: I) -> f64 {
+    let mut count = 0.0;
+    let mut total = 0.0;
+    for x in values {
+        count += 1.0;
+        total += x;
+    }
+    assert!(count > 0.0, "mean requires at least one data point");
+    total / count
+}
+"""),
+    "statistics_welford": ([], """\
+/// Welford's single pass algorithm. Returns the number of values, their
+/// mean and the sum of the squares of their deviations from the mean.
+fn statistics_welford<I: IntoIterator<Item = f64>>(values: I) -> (f64, f64, f64) {
+    let mut count = 0.0;
+    let mut mean = 0.0;
+    let mut m2 = 0.0;
+    for x in values {
+        count += 1.0;
+        let delta = x - mean;
+        mean += delta / count;
+        m2 += delta * (x - mean);
+    }
+    (count, mean, m2)
+}
+"""),
+    "statistics_variance": (["statistics_welford"], """\
+fn statistics_variance<I: IntoIterator<Item = f64>>(values: I) -> f64 {
+    let (count, _, m2) = statistics_welford(values);
+    assert!(count > 1.0, "variance requires at least two data points");
+    m2 / (count - 1.0)
+}
+"""),
+    "statistics_pvariance": (["statistics_welford"], """\
+fn statistics_pvariance<I: IntoIterator<Item = f64>>(values: I) -> f64 {
+    let (count, _, m2) = statistics_welford(values);
+    assert!(count > 0.0, "pvariance requires at least one data point");
+    m2 / count
+}
+"""),
+    "statistics_stdev": (["statistics_variance"], """\
+fn statistics_stdev<I: IntoIterator<Item = f64>>(values: I) -> f64 {
+    statistics_variance(values).sqrt()
+}
+"""),
+    "statistics_pstdev": (["statistics_pvariance"], """\
+fn statistics_pstdev<I: IntoIterator<Item = f64>>(values: I) -> f64 {
+    statistics_pvariance(values).sqrt()
+}
+"""),
+    "normal_cdf": (["math_erfc"], """\
+/// The cumulative distribution function of the standard normal
+fn normal_cdf(z: f64) -> f64 {
+    0.5 * math_erfc(-z / std::f64::consts::SQRT_2)
+}
+"""),
+    "normal_pdf": ([], """\
+/// The probability density function of the standard normal
+fn normal_pdf(z: f64) -> f64 {
+    (-0.5 * z * z).exp() / (2.0 * std::f64::consts::PI).sqrt()
+}
+"""),
+    "random_state_from_seed": ([], """\
+/// Expands a seed into a xoshiro256** state with splitmix64, so that
+/// similar seeds give unrelated streams
+fn random_state_from_seed(seed: u64) -> [u64; 4] {
+    let mut x = seed;
+    let mut state = [0; 4];
+    for word in state.iter_mut() {
+        x = x.wrapping_add(0x9e3779b97f4a7c15);
+        let mut z = x;
+        z = (z ^ (z >> 30)).wrapping_mul(0xbf58476d1ce4e5b9);
+        z = (z ^ (z >> 27)).wrapping_mul(0x94d049bb133111eb);
+        *word = z ^ (z >> 31);
+    }
+    state
+}
+"""),
+    "random_step": ([], """\
+/// One step of xoshiro256**, by Blackman and Vigna
+#[inline]
+fn random_step(s: &mut [u64; 4]) -> u64 {
+    let result = s[1].wrapping_mul(5).rotate_left(7).wrapping_mul(9);
+    let t = s[1] << 17;
+    s[2] ^= s[0];
+    s[3] ^= s[1];
+    s[1] ^= s[2];
+    s[0] ^= s[3];
+    s[2] ^= t;
+    s[3] = s[3].rotate_left(45);
+    result
+}
+"""),
+    "random_stream_state": (["random_state_from_seed", "random_step"], """\
+/// The start of the given stream of numbers from a seed. Each stream
+/// starts 2^128 steps after the one before, using the xoshiro256** jump,
+/// so streams never overlap.
+fn random_stream_state(seed: u64, stream: u64) -> [u64; 4] {
+    const JUMP: [u64; 4] = [0x180ec6d33cfd0aba, 0xd5a61266f0c9392c,
+        0xa9582618e03fc9aa, 0x39abdc4529b1661c];
+    let mut state = random_state_from_seed(seed);
+    for _ in 0..stream {
+        let mut jumped = [0; 4];
+        for word in JUMP.iter() {
+            for bit in 0..64 {
+                if word & (1_u64 << bit) != 0 {
+                    for (j, s) in jumped.iter_mut().zip(state.iter()) {
+                        *j ^= s;
+                    }
+                }
+                random_step(&mut state);
+            }
+        }
+        state = jumped;
+    }
+    state
+}
+"""),
+    "random_state": (["random_stream_state"], """\
+/// The seed that each thread's generator starts from
+static RANDOM_SEED: std::sync::atomic::AtomicU64 = std::sync::atomic::AtomicU64::new(0);
+/// The number of threads that have drawn without choosing a stream
+static RANDOM_THREADS: std::sync::atomic::AtomicU64 = std::sync::atomic::AtomicU64::new(0);
+
+thread_local! {
+    /// The stream this thread draws from. Unless chosen with random_stream,
+    /// the nth thread to draw takes stream n, which is only reproducible
+    /// if threads start drawing in the same order.
+    static RANDOM_STREAM: std::cell::Cell<u64> = std::cell::Cell::new(
+        RANDOM_THREADS.fetch_add(1, std::sync::atomic::Ordering::Relaxed));
+    /// The state of this thread's generator
+    static RANDOM_STATE: std::cell::Cell<[u64; 4]> = std::cell::Cell::new(random_stream_state(
+        RANDOM_SEED.load(std::sync::atomic::Ordering::Relaxed),
+        RANDOM_STREAM.with(|cell| cell.get())));
+    /// The second of the last pair of normal variates, not yet used
+    static RANDOM_NEXT_GAUSS: std::cell::Cell<Option<f64>> = std::cell::Cell::new(None);
+}
+
+/// Restarts this thread's generator on the given stream of the current
+/// seed. Threads that each choose a different stream, such as the index
+/// of the work they do, draw the same numbers whatever order they run in.
+pub fn random_stream(stream: u64) {
+    let seed = RANDOM_SEED.load(std::sync::atomic::Ordering::Relaxed);
+    RANDOM_STREAM.with(|cell| cell.set(stream));
+    RANDOM_STATE.with(|cell| cell.set(random_stream_state(seed, stream)));
+    RANDOM_NEXT_GAUSS.with(|cell| cell.set(None));
+}
+"""),
+    "random_next_u64": (["random_state", "random_step"], """\
+fn random_next_u64() -> u64 {
+    RANDOM_STATE.with(|cell| {
+        let mut s = cell.get();
+        let result = random_step(&mut s);
+        cell.set(s);
+        result
+    })
+}
+"""),
+    "random_random": (["random_next_u64"], """\
+/// A float uniformly distributed in [0, 1), from the top 53 bits
+fn random_random() -> f64 {
+    (random_next_u64() >> 11) as f64 * (1.0 / (1_u64 << 53) as f64)
+}
+"""),
+    "random_uniform": (["random_random"], """\
+fn random_uniform(a: f64, b: f64) -> f64 {
+    a + (b - a) * random_random()
+}
+"""),
+    "random_gauss": (["random_state", "random_random"], """\
+/// Box-Muller, which makes normal variates in pairs. The second is kept
+/// for the next call.
+fn random_gauss(mu: f64, sigma: f64) -> f64 {
+    let z = match RANDOM_NEXT_GAUSS.with(|cell| cell.replace(None)) {
+        Some(z) => z,
+        None => {
+            let r = (-2.0 * (1.0 - random_random()).ln()).sqrt();
+            let theta = 2.0 * std::f64::consts::PI * random_random();
+            RANDOM_NEXT_GAUSS.with(|cell| cell.set(Some(r * theta.sin())));
+            r * theta.cos()
+        }
+    };
+    mu + sigma * z
+}
+"""),
+    "random_seed": (["random_state"], """\
+/// Sets the seed, and restarts this thread's generator on its stream of
+/// it. Threads that have not yet drawn also start from this seed, each
+/// on its own stream, so no two threads draw the same numbers.
+fn random_seed(seed: i64) {
+    RANDOM_SEED.store(seed as u64, std::sync::atomic::Ordering::Relaxed);
+    random_stream(RANDOM_STREAM.with(|cell| cell.get()));
+}
+"""),
+    "slice_bound": ([], """\
+/// A bound of a slice of a container of the given length. As in Python,
+/// a negative bound counts back from the end, and any bound is clamped
+/// to the container.
+#[inline]
+fn slice_bound(bound: i64, len: usize) -> usize {
+    if bound < 0 {
+        len.saturating_sub(bound.unsigned_abs() as usize)
+    } else {
+        (bound as usize).min(len)
+    }
+}
+"""),
+    "flat_index": ([], """\
+/// The index of a[i][j] in a matrix stored flat, one row after another.
+/// A column outside the row would silently read a neighbouring row, so
+/// debug builds check for it.
+#[inline]
+fn flat_index(i: i64, j: i64, cols: i64) -> usize {
+    debug_assert!(0 <= j && j < cols, "column index out of range");
+    (i * cols + j) as usize
+}
+"""),
+}
+
+def with_dependencies(names: Set[str]) -> Set[str]:
+    """
+    Returns the given helpers, together with all the helpers they call.
+    """
+    needed = set()
+    pending = list(names)
+    while pending:
+        name = pending.pop()
+        if name not in needed:
+            needed.add(name)
+            pending.extend(RUST_HELPERS[name][0])
+    return needed
+
+def write_helpers(names: Set[str]):
+    """
+    Writes to stdout the source of the given helpers and those they
+    call, in a fixed order, so the output is stable.
+    """
+    needed = with_dependencies(names)
+    for name, (_, source) in RUST_HELPERS.items():
+        if name in needed:
+            print(source)
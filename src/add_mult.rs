@@ -15,7 +15,7 @@ pub fn bitwise(a: i64, b: i64, c: i64) -> i64 {
 }
 
 pub fn powers(a: i64, b: i64, c: i64) -> i64 {
-    return a * (a + b).pow(((b + c).pow((c + a) as u32)) as u32);
+    return a * (a + b).checked_pow(std::convert::TryFrom::try_from((b + c).checked_pow(std::convert::TryFrom::try_from(c + a).expect("negative exponent in **")).expect("overflow in **")).expect("negative exponent in **")).expect("overflow in **");
 }
 
 pub fn unaries(a: i64, b: i64, c: i64) -> i64 {
@@ -24,6 +24,15 @@ impl Foo {
         self.counter += x;
     }
 
+    pub fn add_twice(&mut self, x: i64) {
+        self.add(x);
+        self.add(x);
+    }
+
+    pub fn total(&self) -> i64 {
+        return self.a + self.counter;
+    }
+
 }
 
 pub fn create_foo(a: i64, b: &str) -> Foo {
@@ -51,3 +60,262 @@ pub fn examine_foo(foo: &Foo) {
     println!("{} {} {} {}", "a = ", a, "b = ", b);
 }
 
+pub fn total_foo(foo: &Foo) -> i64 {
+    return foo.total();
+}
+
+#[derive(Clone, Copy, PartialEq, Eq, Hash)]
+pub struct Cell {
+    pub row: i64,
+    pub col: i64,
+}
+
+impl Cell {
+    pub fn new(row: i64, col: i64) -> Cell {
+        let tmp_row = row;
+        let tmp_col = col;
+        Cell {
+            row: tmp_row,
+            col: tmp_col,
+        }
+    }
+
+    pub fn area(self) -> i64 {
+        return self.row * self.col;
+    }
+
+}
+
+#[derive(Clone, Copy, PartialEq)]
+pub struct Point {
+    pub x: f64,
+    pub y: f64,
+}
+
+impl Point {
+    pub fn new(x: f64, y: f64) -> Point {
+        let tmp_x = x;
+        let tmp_y = y;
+        Point {
+            x: tmp_x,
+            y: tmp_y,
+        }
+    }
+
+    pub fn norm(self) -> f64 {
+        return self.x * self.x + self.y * self.y;
+    }
+
+}
+
+pub fn cell_distance(a: Cell, b: Cell) -> i64 {
+    return (a.row - b.row).abs() + ((a.col - b.col)).abs();
+}
+
+pub fn further(a: Point, b: Point) -> bool {
+    return a.norm() > b.norm();
+}
+
+#[derive(Clone, Copy, PartialEq)]
+pub struct Vector {
+    x: f64,
+    y: f64,
+}
+
+impl Vector {
+    pub fn new(x: f64, y: f64) -> Vector {
+        Vector {
+            x: x,
+            y: y,
+        }
+    }
+
+    pub fn length_squared(self) -> f64 {
+        return self.x * self.x + self.y * self.y;
+    }
+
+}
+
+#[derive(Clone, Copy, PartialEq)]
+pub struct Quote {
+    pub strike: f64,
+    pub spot: f64,
+    pub rate: f64,
+}
+
+impl Quote {
+    pub fn new(strike: f64, spot: f64, rate: f64) -> Quote {
+        Quote {
+            strike: strike,
+            spot: spot,
+            rate: rate,
+        }
+    }
+
+}
+
+pub fn quotes(k: f64) -> f64 {
+    let a = Quote::new(k, 100.0, 0.05);
+    let b = Quote::new(k, 100.0, 0.01);
+    return a.spot + b.rate;
+}
+
+pub struct Account {
+    pub name: String,
+    pub balance: f64,
+}
+
+impl Account {
+    pub fn new(name: &str, balance: f64) -> Account {
+        Account {
+            name: name.to_string(),
+            balance: balance,
+        }
+    }
+
+    pub fn deposit(&mut self, amount: f64) {
+        self.balance += amount;
+    }
+
+}
+
+#[derive(Clone, Copy, PartialEq)]
+pub struct Sample {
+    pub count: i64,
+    pub scale: f64,
+}
+
+impl Sample {
+    pub fn new(count: i64, scale: f64) -> Sample {
+        let tmp_count = count;
+        let tmp_scale = scale * 2.0;
+        Sample {
+            count: tmp_count,
+            scale: tmp_scale,
+        }
+    }
+
+}
+
+pub fn vector_length(x: f64, y: f64) -> f64 {
+    let v = Vector::new(x, y);
+    return v.length_squared();
+}
+
+pub fn open_account(name: &str) -> Account {
+    let mut account = Account::new(name, 0.0);
+    account.deposit(10.0);
+    return account;
+}
+
+pub struct Position {
+    pub quantity: f64,
+    pub price: f64,
+    pub book: String,
+}
+
+impl Position {
+    pub fn new(quantity: f64, price: f64, book: &str) -> Position {
+        Position {
+            quantity: quantity,
+            price: price,
+            book: book.to_string(),
+        }
+    }
+
+    pub fn value(&self) -> f64 {
+        return self.quantity * self.price;
+    }
+
+}
+
+pub struct PositionColumns {
+    pub quantity: Vec<f64>,
+    pub price: Vec<f64>,
+    pub book: Vec<String>,
+}
+
+impl PositionColumns {
+    pub fn new() -> PositionColumns {
+        PositionColumns {
+            quantity: Vec::new(),
+            price: Vec::new(),
+            book: Vec::new(),
+        }
+    }
+
+    pub fn len(&self) -> usize {
+        self.quantity.len()
+    }
+
+    pub fn push(&mut self, item: Position) {
+        self.quantity.push(item.quantity);
+        self.price.push(item.price);
+        self.book.push(item.book);
+    }
+
+    pub fn get(&self, i: usize) -> Position {
+        Position {
+            quantity: self.quantity[i],
+            price: self.price[i],
+            book: self.book[i].clone(),
+        }
+    }
+
+}
+
+impl std::iter::FromIterator<Position> for PositionColumns {
+    fn from_iter<I: IntoIterator<Item = Position>>(items: I) -> PositionColumns {
+        let mut columns = PositionColumns::new();
+        for item in items {
+            columns.push(item);
+        }
+        columns
+    }
+}
+
+pub fn exposure(positions: &PositionColumns) -> f64 {
+    let mut total = 0.0;
+    for (p_quantity, p_price) in positions.quantity.iter().copied().zip(positions.price.iter().copied()) {
+        total += p_quantity * p_price;
+    }
+    return total;
+}
+
+pub fn total_value(positions: &PositionColumns) -> f64 {
+    let mut total = 0.0;
+    for p in (0..positions.len()).map(|i| positions.get(i)) {
+        total += p.value();
+    }
+    return total;
+}
+
+pub fn book_exposure(prices: &[f64], book: &str) -> f64 {
+    let ps = prices.iter().copied().map(|x| Position::new(1.0, x, book)).collect::<PositionColumns>();
+    let mut qs: PositionColumns = PositionColumns::new();
+    qs.push(Position::new(2.0, 3.0, book));
+    return exposure(&ps) + exposure(&qs);
+}
+
+#[derive(Clone, PartialEq)]
+pub struct Offset {
+    pub dx: f64,
+    pub dy: f64,
+}
+
+impl Offset {
+    pub fn new(dx: f64, dy: f64) -> Offset {
+        let tmp_dx = dx;
+        let tmp_dy = dy;
+        Offset {
+            dx: tmp_dx,
+            dy: tmp_dy,
+        }
+    }
+
+}
+
+pub fn nudge(o: &mut Offset, dx: f64) {
+    o.dx += dx;
+}
+
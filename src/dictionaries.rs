@@ -5,14 +5,30 @@ pub fn create_dict(keys: &[String], values: &[String]) -> HashMap<String, String
     return d;
 }
 
-pub fn access_dict(keys: &[String], dictionary: HashMap<String, String>) -> Vec<String> {
-    let mut result = vec![];
+pub fn create_filtered_dict_into(keys: &[String], values: &[String], out: &mut HashMap<String, String>) {
+    out.clear();
+    out.extend(keys.iter().cloned().zip(values.iter().cloned()).filter(|(k, v)| k != v));
+}
+
+pub fn create_filtered_dict(keys: &[String], values: &[String]) -> HashMap<String, String> {
+    let mut out = HashMap::with_capacity(keys.len().min(values.len()).min(1024));
+    create_filtered_dict_into(keys, values, &mut out);
+    return out;
+}
+
+pub fn access_dict_into(keys: &[String], dictionary: HashMap<String, String>, out: &mut Vec<String>) {
+    out.clear();
     for key in keys {
         if dictionary.contains_key(key) {
-            result.push(dictionary[key].clone());
+            out.push(dictionary[key].clone());
         }
     }
-    return result;
+}
+
+pub fn access_dict(keys: &[String], dictionary: HashMap<String, String>) -> Vec<String> {
+    let mut out = Vec::new();
+    access_dict_into(keys, dictionary, &mut out);
+    return out;
 }
 
 pub fn extend_dict(key: &str, value: &str, dictionary: &mut HashMap<String, String>) {
@@ -20,11 +36,11 @@ pub fn extend_dict(key: &str, value: &str, dictionary: &mut HashMap<String, Stri
 }
 
 pub fn static_dict() -> HashMap<String, i64> {
-    let d = [
+    let d = HashMap::from([
         ("foo".to_string(), 1),
         ("bar".to_string(), 2),
         ("wombat".to_string(), 3),
-        ].iter().cloned().collect::<HashMap<_, _>>();
+        ]);
     return d;
 }
 
@@ -34,20 +50,53 @@ pub fn dict_methods(dictionary: &mut HashMap<String, String>) {
     dictionary.insert("foo".to_string(), foobar.clone());
     assert!(dictionary.keys().position(|tmp| tmp == "foo") != None);
     assert!(dictionary.values().position(|tmp0| tmp0 == "bar") != None);
-    for (k, v) in dictionary.iter().map(|(ref k, ref v)| ((*k).clone(), (*v).clone())) {
+    for (k, v) in dictionary.iter() {
         println!("{} {} {}", k, ": ", v);
     }
-    let mut d = dictionary.iter().map(|(ref k, ref v)| ((*k).clone(), (*v).clone())).collect::<HashMap<_, _>>();
+    let mut d = dictionary.iter().map(|(k, v)| (k.clone(), v.clone())).collect::<HashMap<_, _>>();
     let mut bar = d.remove("foo").unwrap_or("bar".to_string());
     assert!(!d.contains_key("foo"));
     assert!(bar == "bar");
-    d.extend(dictionary.iter().map(|(ref k, ref v)| ((*k).clone(), (*v).clone())));
+    d.extend(dictionary.iter().map(|(k, v)| (k.clone(), v.clone())));
     d.remove("foo");
-    let l = d.len();
+    let l = (d).len();
     assert!(l == 0);
     bar = d.entry("foo".to_string()).or_insert("bar".to_string()).clone();
     assert!(bar == "bar");
-    let (k, v) = d.drain().next().unwrap();
+    let (k, v) = { let tmp1 = d.keys().next().cloned().unwrap(); d.remove_entry(&tmp1).unwrap() };
     assert!(k == "foo" && v == "bar");
 }
 
+pub fn weighted_matches(keys: &[String], others: &[String], dictionary: HashMap<String, String>, weights: HashMap<String, f64>) -> f64 {
+    let mut total = 0.0;
+    for (k, w) in weights.iter().map(|(k, v)| (k, *v)) {
+        if w > 0.0 && dictionary.contains_key(k) {
+            total += w;
+        }
+    }
+    for (key, other) in keys.iter().zip(others.iter()) {
+        if key == other {
+            println!("{}", key);
+        }
+    }
+    return total;
+}
+
+pub fn padded_groups(groups: &mut HashMap<String, Vec<String>>) {
+    for (k, v) in groups.iter_mut() {
+        v.push("padding".to_string());
+        if (v).len() > 2 {
+            println!("{}", k);
+        }
+    }
+}
+
+pub fn drain_weights(weights: &mut HashMap<String, f64>) -> f64 {
+    let mut total = 0.0;
+    for (k, w) in weights.drain() {
+        println!("{}", k);
+        total += w;
+    }
+    return total;
+}
+
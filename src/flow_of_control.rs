@@ -10,14 +10,14 @@ pub fn return_if_else(a: bool, c: i64) -> i64 {
     return if a { c } else { 42 };
 }
 
-pub fn if_elif_else(a: bool, b: bool, c: &str, d: &str) -> String {
+pub fn if_elif_else<'a>(a: bool, b: bool, c: &'a str, d: &'a str) -> &'a str {
     if a && b {
-        return c.to_string();
+        return c;
     } else {
         if a || b {
-            return d.to_string();
+            return d;
         } else {
-            return "Neither".to_string();
+            return "Neither";
         }
     }
 }
@@ -49,3 +49,59 @@ pub fn for_loop(a: i64, b: i64) -> i64 {
     return total;
 }
 
+pub fn while_invariant(a: &[i64], b: i64) -> i64 {
+    let mut i = 0;
+    let mut found = 0;
+    let tmp = (a).len();
+    let tmp0 = vec![b, b + 1];
+    while i < tmp {
+        if matches!(b, 1 | 2 | 3) {
+            found += 1;
+        }
+        if tmp0.iter().position(|&tmp1| tmp1 == found) != None {
+            found += 1;
+        }
+        i += 1;
+    }
+    return found;
+}
+
+pub fn for_invariant(a: i64, b: f64) -> f64 {
+    let mut total = 0.0;
+    let tmp = (b).exp() * 2.0;
+    for i in 0..a {
+        total += tmp;
+    }
+    return total;
+}
+
+pub fn discounted_payoff(spot: f64, strike: f64, rate: f64, years: i64, vol: f64) -> f64 {
+    let payoff = ((spot - strike)).max(0.0).powi(2);
+    let discount = (1.0 + rate).powi((years) as i32);
+    return payoff / discount * vol.sqrt() * (years as f64).powf(1.5);
+}
+
+pub fn integer_powers(a: i64, b: i64) -> i64 {
+    return a * a * a + (a + 1).pow(2) + a.checked_pow(std::convert::TryFrom::try_from(b).expect("negative exponent in **")).expect("overflow in **");
+}
+
+pub fn guarded_max(a: &[f64], n: i64, lowest: f64) -> f64 {
+    let mut total = 0.0;
+    let tmp = (a).len();
+    let tmp0 = (lowest).max(1.0);
+    for i in 0..n {
+        if tmp > 0 {
+            total += a.iter().copied().reduce(f64::max).unwrap() + tmp0;
+        }
+    }
+    return total;
+}
+
+pub fn subsets(n: i64) -> i64 {
+    let mut total = 0;
+    for i in 0..2_i64.checked_pow(std::convert::TryFrom::try_from(n).expect("negative exponent in **")).expect("overflow in **") {
+        total += i;
+    }
+    return total;
+}
+
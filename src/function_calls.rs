@@ -20,3 +20,56 @@ pub fn call_local(a: i64, b: i64, c: i64) -> i64 {
     }
 }
 
+pub fn apply_twice(f: impl Fn(f64) -> f64, x: f64) -> f64 {
+    return f(f(x));
+}
+
+pub fn integrate(f: impl Fn(f64) -> f64, a: f64, b: f64, n: i64) -> f64 {
+    let h = (b - a) / n as f64;
+    let mut total = 0.0;
+    for i in 0..n {
+        total += f(a + h * i as f64);
+    }
+    return total * h + apply_twice(&f, a);
+}
+
+pub fn call_callbacks(a: f64) -> f64 {
+    let k = 2.0;
+    return integrate(|x| x * k, 0.0, a, 10);
+}
+
+pub fn compose_all(fs: &[Box<dyn Fn(f64) -> f64>], mut x: f64) -> f64 {
+    for f in fs {
+        x = f(x);
+    }
+    return x;
+}
+
+pub fn scaler(k: f64) -> Box<dyn Fn(f64) -> f64> {
+    return Box::new(move |x| x * k);
+}
+
+pub struct Stage {
+    pub transform: Box<dyn Fn(f64) -> f64>,
+}
+
+impl Stage {
+    pub fn new(transform: Box<dyn Fn(f64) -> f64>) -> Stage {
+        let tmp_transform = transform;
+        Stage {
+            transform: tmp_transform,
+        }
+    }
+
+    pub fn run(&self, x: f64) -> f64 {
+        return (self.transform)(x);
+    }
+
+}
+
+pub fn run_stage(x: f64) -> f64 {
+    let k = 3.0;
+    let s = Stage::new(Box::new(move |y| y * k));
+    return (s.transform)(x);
+}
+
@@ -0,0 +1,220 @@
+pub struct Fibonacci {
+    state: usize,
+    limit: i64,
+    a: i64,
+    b: i64,
+}
+
+impl Iterator for Fibonacci {
+    type Item = i64;
+
+    fn next(&mut self) -> Option<i64> {
+        loop {
+            match self.state {
+                0 => {
+                    if !(self.a < self.limit) {
+                        return None;
+                    }
+                    self.state = 1;
+                    return Some(self.a);
+                }
+                _ => {
+                    let tmp = (self.b, self.a + self.b);
+                    self.a = tmp.0;
+                    self.b = tmp.1;
+                    self.state = 0;
+                }
+            }
+        }
+    }
+}
+
+pub fn fibonacci(limit: i64) -> Fibonacci {
+    let (a, b) = (0, 1);
+    Fibonacci {
+        state: 0,
+        limit,
+        a,
+        b,
+    }
+}
+
+pub struct Evens<I: Iterator<Item = i64>> {
+    iter: I,
+    scale: i64,
+}
+
+impl<I: Iterator<Item = i64>> Iterator for Evens<I> {
+    type Item = i64;
+
+    fn next(&mut self) -> Option<i64> {
+        while let Some(x) = self.iter.next() {
+            if x % 2 == 0 {
+                return Some(x * self.scale);
+            }
+        }
+        None
+    }
+}
+
+pub fn evens<I: Iterator<Item = i64>>(source: I, scale: i64) -> Evens<I> {
+    Evens {
+        iter: source,
+        scale,
+    }
+}
+
+pub struct RunningTotal<'a> {
+    iter: std::iter::Copied<std::slice::Iter<'a, f64>>,
+    total: f64,
+}
+
+impl<'a> Iterator for RunningTotal<'a> {
+    type Item = f64;
+
+    fn next(&mut self) -> Option<f64> {
+        while let Some(v) = self.iter.next() {
+            self.total += v;
+            return Some(self.total);
+        }
+        None
+    }
+}
+
+pub fn running_total<'a>(values: &'a [f64]) -> RunningTotal<'a> {
+    let total = 0.0;
+    RunningTotal {
+        iter: values.iter().copied(),
+        total,
+    }
+}
+
+pub struct Squares {
+    iter: std::ops::Range<i64>,
+}
+
+impl Iterator for Squares {
+    type Item = i64;
+
+    fn next(&mut self) -> Option<i64> {
+        while let Some(i) = self.iter.next() {
+            return Some(i * i);
+        }
+        None
+    }
+}
+
+pub fn squares(n: i64) -> Squares {
+    Squares {
+        iter: 0..n,
+    }
+}
+
+pub struct PositivePairs<'a> {
+    state: usize,
+    iter: std::iter::Copied<std::slice::Iter<'a, i64>>,
+    limit: i64,
+    count: i64,
+    v: i64,
+}
+
+impl<'a> Iterator for PositivePairs<'a> {
+    type Item = i64;
+
+    fn next(&mut self) -> Option<i64> {
+        loop {
+            match self.state {
+                3 => return None,
+                0 => {
+                    self.v = self.iter.next()?;
+                    if self.v < 0 {
+                        continue;
+                    }
+                    self.state = 1;
+                    return Some(self.v);
+                }
+                1 => {
+                    self.count += 1;
+                    if self.v == 0 {
+                        self.state = 0;
+                        continue;
+                    }
+                    self.state = 2;
+                    return Some(self.v * 2);
+                }
+                _ => {
+                    if self.count >= self.limit {
+                        self.state = 3;
+                        return None;
+                    }
+                    self.state = 0;
+                }
+            }
+        }
+    }
+}
+
+pub fn positive_pairs<'a>(values: &'a [i64], limit: i64) -> PositivePairs<'a> {
+    let count = 0;
+    PositivePairs {
+        state: 0,
+        iter: values.iter().copied(),
+        limit,
+        count,
+        v: Default::default(),
+    }
+}
+
+pub struct UntilNegative<'a> {
+    state: usize,
+    iter: std::iter::Copied<std::slice::Iter<'a, i64>>,
+    v: i64,
+}
+
+impl<'a> Iterator for UntilNegative<'a> {
+    type Item = i64;
+
+    fn next(&mut self) -> Option<i64> {
+        loop {
+            match self.state {
+                2 => return None,
+                0 => {
+                    self.v = self.iter.next()?;
+                    if self.v < 0 {
+                        self.state = 2;
+                        return None;
+                    }
+                    self.state = 1;
+                    return Some(self.v);
+                }
+                _ => {
+                    self.state = 0;
+                }
+            }
+        }
+    }
+}
+
+pub fn until_negative<'a>(values: &'a [i64]) -> UntilNegative<'a> {
+    UntilNegative {
+        state: 0,
+        iter: values.iter().copied(),
+        v: Default::default(),
+    }
+}
+
+pub fn sum_even_fibonacci(limit: i64) -> i64 {
+    return evens(fibonacci(limit), 1).sum::<i64>();
+}
+
+pub fn consume(values: &[f64]) -> f64 {
+    let mut result = 0.0;
+    for t in running_total(values) {
+        result += t;
+    }
+    for s in squares(4) {
+        println!("{}", s);
+    }
+    return result;
+}
+
@@ -9,4 +9,9 @@ pub mod lists;
 pub mod sets;
 pub mod dictionaries;
 pub mod classes;
-pub mod traits;
\ No newline at end of file
+pub mod traits;
+pub mod generators;
+pub mod numpy_arrays;
+pub mod reductions;
+pub mod maths;
+pub mod monte_carlo;
\ No newline at end of file
@@ -1,15 +1,59 @@
+/// A bound of a slice of a container of the given length. As in Python,
+/// a negative bound counts back from the end, and any bound is clamped
+/// to the container.
+#[inline]
+fn slice_bound(bound: i64, len: usize) -> usize {
+    if bound < 0 {
+        len.saturating_sub(bound.unsigned_abs() as usize)
+    } else {
+        (bound as usize).min(len)
+    }
+}
+
+/// The index of a[i][j] in a matrix stored flat, one row after another.
+/// A column outside the row would silently read a neighbouring row, so
+/// debug builds check for it.
+#[inline]
+fn flat_index(i: i64, j: i64, cols: i64) -> usize {
+    debug_assert!(0 <= j && j < cols, "column index out of range");
+    (i * cols + j) as usize
+}
+
+pub fn create_list_into(a: i64, b: i64, out: &mut Vec<i64>) {
+    out.clear();
+    out.extend((a..b).map(|x| (x * x)));
+}
+
 pub fn create_list(a: i64, b: i64) -> Vec<i64> {
-    return (a..b).map(|x| (x * x)).collect::<Vec<_>>();
+    let mut out = Vec::new();
+    create_list_into(a, b, &mut out);
+    return out;
+}
+
+pub fn create_filtered_list_into(a: i64, b: i64, out: &mut Vec<i64>) {
+    out.clear();
+    out.extend((a..b).filter(|&x| (x % 3) != 0).map(|x| (x * x)));
+}
+
+pub fn create_filtered_list(a: i64, b: i64) -> Vec<i64> {
+    let mut out = Vec::with_capacity(((b - a).max(0) as usize).min(1024));
+    create_filtered_list_into(a, b, &mut out);
+    return out;
+}
+
+pub fn process_list_into(a: &[i64], b: &[i64], out: &mut Vec<(i64, i64)>) {
+    out.clear();
+    out.extend(a.iter().copied().zip(b.iter().copied()).map(|(x, y)| (x, y)));
 }
 
 pub fn process_list(a: &[i64], b: &[i64]) -> Vec<(i64, i64)> {
-    return a.iter().cloned().zip(b.iter().cloned()).map(|(x, y)| (x, y)).collect::<Vec<_>>();
+    let mut out = Vec::new();
+    process_list_into(a, b, &mut out);
+    return out;
 }
 
 pub fn add_mult_lists(a: &[f64], b: &[f64], c: &[f64]) -> Vec<f64> {
-    let d = a.iter().zip(b.iter().zip(c.iter())).map(|(a,(b, c))|
-        (a + b) * c
-        ).collect::<Vec<_>>();
+    let d = a.iter().copied().zip(b.iter().copied()).zip(c.iter().copied()).map(|((a, b), c)| (a + b) * c).collect::<Vec<_>>();
     return d;
 }
 
@@ -25,20 +69,102 @@ pub fn manual_iterator(a: &[f64]) -> (f64, f64) {
 
 pub fn manual_dot_product(a: &[f64], b: &[f64]) -> f64 {
     let mut sum = 0.0;
-    for (i, j) in a.iter().cloned().zip(b.iter().cloned()) {
+    for (i, j) in a.iter().copied().zip(b.iter().copied()) {
         sum += i * j;
     }
     return sum;
 }
 
+pub fn fused_reductions(a: &[f64], n: i64) -> f64 {
+    let mut total = a.iter().copied().map(|x| (x * x)).sum::<f64>();
+    let largest = a.iter().copied().map(|x| (x * 2.0)).reduce(f64::max).unwrap();
+    let smallest = a.iter().copied().filter(|&x| x > 0.0).reduce(f64::min).unwrap();
+    let count = (0..n).filter(|&i| (i % 3) == 0).count();
+    if a.iter().copied().any(|x| x > 10.0) && a.iter().copied().all(|x| x < 100.0) {
+        println!("{}", count);
+    }
+    for y in a.iter().copied().filter(|&x| x > 1.0).map(|x| (x + 1.0)) {
+        total += y;
+    }
+    return total + largest + smallest;
+}
+
+pub fn slices(a: &[i64], s: &str) -> i64 {
+    assert!(s.is_ascii());
+    let head = &a[..a.len().min(3)];
+    let tail = &a[a.len().min(1)..];
+    let middle = &a[a.len().min(1)..a.len().saturating_sub(1).max(a.len().min(1))];
+    let evens = a.iter().copied().step_by(2).collect::<Vec<_>>();
+    let word = &s[s.len().min(1)..s.len().min(4)];
+    println!("{} {}", word, (a[a.len().min(1)..].iter().copied().step_by(3)).len());
+    let mut total = head.iter().copied().sum::<i64>() + tail.iter().copied().sum::<i64>() + middle.iter().copied().sum::<i64>() + evens.iter().copied().sum::<i64>();
+    for x in a.iter().copied().rev() {
+        total += x;
+    }
+    return total;
+}
+
+pub fn copied_slice(a: &[i64], n: i64) -> Vec<i64> {
+    let mut b = a[a.len().min(1)..slice_bound(n, a.len()).max(a.len().min(1))].to_vec();
+    b.push(4);
+    return b;
+}
+
+pub fn ends(s: &str, n: i64) {
+    let word = s.repeat(2 as usize);
+    assert!(word.is_ascii());
+    println!("{} {}", &word[slice_bound(n, word.len())..], &word[..slice_bound(-n, word.len())]);
+}
+
+pub fn reversed_string(s: &str) -> String {
+    return s.chars().rev().collect::<String>();
+}
+
 pub fn static_lists(a: i64) -> bool {
-    let odd = vec![
-        1,
-        3,
-        5,
-        7,
+    return matches!(a, 1 | 3 | 5 | 7);
+}
+
+pub fn static_membership(a: i64, b: &str) -> bool {
+    if [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37].binary_search(&a).is_ok() {
+        return matches!(b, "foo" | "bar");
+    } else {
+        if ["eight", "five", "four", "nine", "one", "seven", "six", "three", "two"].binary_search(&b).is_ok() {
+            return false;
+        }
+    }
+    return !matches!(b, "wombat" | "bar");
+}
+
+pub fn lookup_lists(a: i64, b: i64) -> i64 {
+    static DAYS: [i64; 12] = [
+        31,
+        28,
+        31,
+        30,
+        31,
+        30,
+        31,
+        31,
+        30,
+        31,
+        30,
+        31,
         ];
-    return odd.iter().position(|&tmp| tmp == a) != None;
+    let mut scratch: [i64; 3] = [
+        a,
+        b,
+        a + b,
+        ];
+    scratch[0] = DAYS[1];
+    assert!((DAYS).len() == 12);
+    let mut total = 0;
+    for d in DAYS {
+        total += d;
+    }
+    if scratch[2] > total {
+        return scratch[2];
+    }
+    return total;
 }
 
 pub fn list_methods(a: i64, b: &str) {
@@ -66,3 +192,82 @@ pub fn list_methods(a: i64, b: &str) {
     l_str.remove(1);
 }
 
+pub fn count_multiples(a: i64, b: i64) -> i64 {
+    let mut total = 0;
+    let mut multiples: Vec<i64> = vec![];
+    for i in 1..a {
+        multiples.clear();
+        for j in 0..b {
+            if j % i == 0 {
+                multiples.push(j);
+            }
+        }
+        if (multiples).len() > 1 {
+            total += multiples[1];
+        }
+    }
+    return total;
+}
+
+pub fn zero_matrix_into(n: i64, m: i64, out: &mut Vec<Vec<f64>>) {
+    out.clear();
+    out.extend((0..n).map(|_| vec![0.0; m as usize]));
+}
+
+pub fn zero_matrix(n: i64, m: i64) -> Vec<Vec<f64>> {
+    let mut out = Vec::new();
+    zero_matrix_into(n, m, &mut out);
+    return out;
+}
+
+pub fn relax(n: i64, m: i64, steps: i64) -> f64 {
+    let grid_rows = n;
+    let grid_cols = m;
+    let mut grid = vec![0.0; (grid_rows * grid_cols) as usize];
+    for i in 0..n {
+        grid[flat_index(i, 0, grid_cols)] = 1.0;
+    }
+    for step in 0..steps {
+        for i in 1..n - 1 {
+            for j in 1..m - 1 {
+                grid[flat_index(i, j, grid_cols)] = (grid[flat_index(i - 1, j, grid_cols)] + grid[flat_index(i + 1, j, grid_cols)] + grid[flat_index(i, j - 1, grid_cols)] + grid[flat_index(i, j + 1, grid_cols)]) / 4.0;
+            }
+        }
+    }
+    let mut total = 0.0;
+    for i in 0..grid_rows {
+        for j in 0..grid_cols {
+            total += grid[flat_index(i, j, grid_cols)];
+        }
+    }
+    return total;
+}
+
+pub fn accumulate(total: &mut [f64], a: &[f64], weight: f64) {
+    for (total, a) in total.iter_mut().zip(a.iter().copied()) {
+        *total += a * weight;
+    }
+}
+
+pub fn blend(out: &mut [f64], a: &[f64], b: &[f64], t: f64) {
+    for ((out, a), b) in out.iter_mut().zip(a.iter().copied()).zip(b.iter().copied()) {
+        *out = a * (1.0 - t) + b * t;
+    }
+}
+
+pub fn offset_sums(a: &[i64], b: &[f64], base: i64) -> f64 {
+    return 2.0 * (0.5 + b.iter().copied().sum::<f64>()) + (base + a.iter().copied().sum::<i64>()) as f64;
+}
+
+pub fn joined(a: &[i64], b: &[i64]) -> Vec<i64> {
+    let mut c = a.iter().copied().collect::<Vec<_>>();
+    c.extend(b.iter().copied());
+    return c;
+}
+
+pub fn joined_floats(a: &[f64], b: &[f64]) -> Vec<f64> {
+    let mut c = a.iter().copied().collect::<Vec<_>>();
+    c.extend(b.iter().copied());
+    return c;
+}
+
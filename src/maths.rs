@@ -0,0 +1,236 @@
+/// erf(x) for small x, as 2/sqrt(pi) exp(-x^2) sum 2^n x^(2n+1) / (2n+1)!!
+/// All the terms are positive, so there is no cancellation.
+fn math_erf_series(x: f64) -> f64 {
+    let x2 = x * x;
+    let mut term = x;
+    let mut total = x;
+    let mut n = 0.0;
+    while term.abs() > total.abs() * 1e-17 {
+        n += 1.0;
+        term *= 2.0 * x2 / (2.0 * n + 1.0);
+        total += term;
+    }
+    2.0 / std::f64::consts::PI.sqrt() * (-x2).exp() * total
+}
+
+/// erfc(x) for x >= 1, from the rational approximations of W. J. Cody,
+/// Math. Comp. 23 (1969), which are good to about 1e-16. The factor
+/// exp(-x^2) is taken in two parts, so the rounding of x^2 is not
+/// magnified.
+fn math_erfc_rational(x: f64) -> f64 {
+    let ratio = if x <= 4.0 {
+        const C: [f64; 9] = [5.64188496988670089e-1, 8.88314979438837594e0,
+            6.61191906371416295e1, 2.98635138197400131e2, 8.81952221241769090e2,
+            1.71204761263407058e3, 2.05107837782607147e3, 1.23033935479799725e3,
+            2.15311535474403846e-8];
+        const D: [f64; 8] = [1.57449261107098347e1, 1.17693950891312499e2,
+            5.37181101862009858e2, 1.62138957456669019e3, 3.29079923573345963e3,
+            4.36261909014324716e3, 3.43936767414372164e3, 1.23033935480374942e3];
+        let mut num = C[8] * x;
+        let mut den = x;
+        for i in 0..7 {
+            num = (num + C[i]) * x;
+            den = (den + D[i]) * x;
+        }
+        (num + C[7]) / (den + D[7])
+    } else {
+        const P: [f64; 6] = [3.05326634961232344e-1, 3.60344899949804439e-1,
+            1.25781726111229246e-1, 1.60837851487422766e-2, 6.58749161529837803e-4,
+            1.63153871373020978e-2];
+        const Q: [f64; 5] = [2.56852019228982242e0, 1.87295284992346725e0,
+            5.27905102951428412e-1, 6.05183413124413191e-2, 2.33520497626869185e-3];
+        let z = 1.0 / (x * x);
+        let mut num = P[5] * z;
+        let mut den = z;
+        for i in 0..4 {
+            num = (num + P[i]) * z;
+            den = (den + Q[i]) * z;
+        }
+        (1.0 / std::f64::consts::PI.sqrt() - z * (num + P[4]) / (den + Q[4])) / x
+    };
+    let head = (x * 16.0).trunc() / 16.0;
+    (-head * head).exp() * (-(x - head) * (x + head)).exp() * ratio
+}
+
+fn math_erfc(x: f64) -> f64 {
+    if x.abs() < 1.0 {
+        1.0 - math_erf_series(x)
+    } else if x > 0.0 {
+        math_erfc_rational(x)
+    } else {
+        2.0 - math_erfc_rational(-x)
+    }
+}
+
+/// Shewchuk's algorithm, as used by Python's math.fsum. The running
+/// total is held exactly, as a list of non-overlapping partial sums.
+fn math_fsum<I: IntoIterator<Item = f64>>(values: I) -> f64 {
+    let mut partials: Vec<f64> = Vec::new();
+    let mut special = 0.0;
+    for mut x in values {
+        if !x.is_finite() {
+            special += x;
+            continue;
+        }
+        let mut i = 0;
+        for j in 0..partials.len() {
+            let mut y = partials[j];
+            if x.abs() < y.abs() {
+                std::mem::swap(&mut x, &mut y);
+            }
+            let hi = x + y;
+            let lo = y - (hi - x);
+            if lo != 0.0 {
+                partials[i] = lo;
+                i += 1;
+            }
+            x = hi;
+        }
+        partials.truncate(i);
+        partials.push(x);
+    }
+    if special != 0.0 || special.is_nan() {
+        return special;
+    }
+
+    // add up the partials from the top, correcting the final rounding
+    let mut n = partials.len();
+    let mut hi = 0.0;
+    let mut lo = 0.0;
+    if n > 0 {
+        n -= 1;
+        hi = partials[n];
+        while n > 0 {
+            let x = hi;
+            n -= 1;
+            let y = partials[n];
+            hi = x + y;
+            lo = y - (hi - x);
+            if lo != 0.0 {
+                break;
+            }
+        }
+        if n > 0 && ((lo < 0.0 && partials[n - 1] < 0.0) || (lo > 0.0 && partials[n - 1] > 0.0)) {
+            let y = lo * 2.0;
+            let x = hi + y;
+            if y == x - hi {
+                hi = x;
+            }
+        }
+    }
+    hi
+}
+
+fn math_isclose(a: f64, b: f64, rel_tol: f64, abs_tol: f64) -> bool {
+    if a == b {
+        return true;
+    }
+    if a.is_infinite() || b.is_infinite() {
+        return false;
+    }
+    (a - b).abs() <= (rel_tol * a.abs().max(b.abs())).max(abs_tol)
+}
+
+fn statistics_mean<I: IntoIterator<Item = f64>>(values: I) -> f64 {
+    let mut count = 0.0;
+    let mut total = 0.0;
+    for x in values {
+        count += 1.0;
+        total += x;
+    }
+    assert!(count > 0.0, "mean requires at least one data point");
+    total / count
+}
+
+/// Welford's single pass algorithm. Returns the number of values, their
+/// mean and the sum of the squares of their deviations from the mean.
+fn statistics_welford<I: IntoIterator<Item = f64>>(values: I) -> (f64, f64, f64) {
+    let mut count = 0.0;
+    let mut mean = 0.0;
+    let mut m2 = 0.0;
+    for x in values {
+        count += 1.0;
+        let delta = x - mean;
+        mean += delta / count;
+        m2 += delta * (x - mean);
+    }
+    (count, mean, m2)
+}
+
+fn statistics_variance<I: IntoIterator<Item = f64>>(values: I) -> f64 {
+    let (count, _, m2) = statistics_welford(values);
+    assert!(count > 1.0, "variance requires at least two data points");
+    m2 / (count - 1.0)
+}
+
+fn statistics_pvariance<I: IntoIterator<Item = f64>>(values: I) -> f64 {
+    let (count, _, m2) = statistics_welford(values);
+    assert!(count > 0.0, "pvariance requires at least one data point");
+    m2 / count
+}
+
+fn statistics_stdev<I: IntoIterator<Item = f64>>(values: I) -> f64 {
+    statistics_variance(values).sqrt()
+}
+
+/// The cumulative distribution function of the standard normal
+fn normal_cdf(z: f64) -> f64 {
+    0.5 * math_erfc(-z / std::f64::consts::SQRT_2)
+}
+
+/// The probability density function of the standard normal
+fn normal_pdf(z: f64) -> f64 {
+    (-0.5 * z * z).exp() / (2.0 * std::f64::consts::PI).sqrt()
+}
+
+pub fn black_scholes_call(spot: f64, strike: f64, rate: f64, vol: f64, t: f64) -> f64 {
+    let root_t = (t).sqrt();
+    let d1 = (0.5 * vol).mul_add(vol, rate).mul_add(t, (spot / strike).ln()) / (vol * root_t);
+    let d2 = d1 - vol * root_t;
+    return spot.mul_add(normal_cdf(d1), -(strike * (-rate * t).exp() * normal_cdf(d2)));
+}
+
+pub fn gaussian_density(x: f64, mu: f64, sigma: f64) -> f64 {
+    return normal_pdf((x - mu) / sigma) / sigma;
+}
+
+pub fn tail_probability(x: f64) -> f64 {
+    return 0.5 * math_erfc(x / 2.0_f64.sqrt());
+}
+
+pub fn polar(x: f64, y: f64) -> f64 {
+    return (x).hypot(y).mul_add(((y).atan2(x)).cos(), (std::f64::consts::PI / 6.0).sin());
+}
+
+pub fn compound(rate: f64, years: i64) -> f64 {
+    return (years as f64 * (rate).ln_1p()).exp_m1();
+}
+
+pub fn digits(n: i64) -> f64 {
+    return (n as f64).log(10.0) + 2.0_f64.log(n as f64);
+}
+
+pub fn buckets(x: f64, width: f64) -> i64 {
+    return (x / width).floor() as i64 + ((width).sqrt()).ceil() as i64;
+}
+
+pub fn summary(a: &[f64]) -> f64 {
+    return statistics_mean(a.iter().copied()) + statistics_stdev(a.iter().copied()) + statistics_pvariance(a.iter().copied());
+}
+
+pub fn exact_total(a: &[f64]) -> f64 {
+    return math_fsum(a.iter().copied().map(|x| (x * x)));
+}
+
+pub fn converged(a: f64, b: f64, tol: f64) -> bool {
+    return math_isclose(a, b, 1e-09, tol) && !(a).is_nan();
+}
+
+pub fn clamp_to_finite(x: f64) -> f64 {
+    return if (x).is_finite() { x } else { f64::INFINITY };
+}
+
+pub fn horner(x: f64, a: f64, b: f64, c: f64) -> f64 {
+    return a.mul_add(x, b).mul_add(x, c);
+}
+
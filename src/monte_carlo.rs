@@ -0,0 +1,154 @@
+/// Expands a seed into a xoshiro256** state with splitmix64, so that
+/// similar seeds give unrelated streams
+fn random_state_from_seed(seed: u64) -> [u64; 4] {
+    let mut x = seed;
+    let mut state = [0; 4];
+    for word in state.iter_mut() {
+        x = x.wrapping_add(0x9e3779b97f4a7c15);
+        let mut z = x;
+        z = (z ^ (z >> 30)).wrapping_mul(0xbf58476d1ce4e5b9);
+        z = (z ^ (z >> 27)).wrapping_mul(0x94d049bb133111eb);
+        *word = z ^ (z >> 31);
+    }
+    state
+}
+
+/// One step of xoshiro256**, by Blackman and Vigna
+#[inline]
+fn random_step(s: &mut [u64; 4]) -> u64 {
+    let result = s[1].wrapping_mul(5).rotate_left(7).wrapping_mul(9);
+    let t = s[1] << 17;
+    s[2] ^= s[0];
+    s[3] ^= s[1];
+    s[1] ^= s[2];
+    s[0] ^= s[3];
+    s[2] ^= t;
+    s[3] = s[3].rotate_left(45);
+    result
+}
+
+/// The start of the given stream of numbers from a seed. Each stream
+/// starts 2^128 steps after the one before, using the xoshiro256** jump,
+/// so streams never overlap.
+fn random_stream_state(seed: u64, stream: u64) -> [u64; 4] {
+    const JUMP: [u64; 4] = [0x180ec6d33cfd0aba, 0xd5a61266f0c9392c,
+        0xa9582618e03fc9aa, 0x39abdc4529b1661c];
+    let mut state = random_state_from_seed(seed);
+    for _ in 0..stream {
+        let mut jumped = [0; 4];
+        for word in JUMP.iter() {
+            for bit in 0..64 {
+                if word & (1_u64 << bit) != 0 {
+                    for (j, s) in jumped.iter_mut().zip(state.iter()) {
+                        *j ^= s;
+                    }
+                }
+                random_step(&mut state);
+            }
+        }
+        state = jumped;
+    }
+    state
+}
+
+/// The seed that each thread's generator starts from
+static RANDOM_SEED: std::sync::atomic::AtomicU64 = std::sync::atomic::AtomicU64::new(0);
+/// The number of threads that have drawn without choosing a stream
+static RANDOM_THREADS: std::sync::atomic::AtomicU64 = std::sync::atomic::AtomicU64::new(0);
+
+thread_local! {
+    /// The stream this thread draws from. Unless chosen with random_stream,
+    /// the nth thread to draw takes stream n, which is only reproducible
+    /// if threads start drawing in the same order.
+    static RANDOM_STREAM: std::cell::Cell<u64> = std::cell::Cell::new(
+        RANDOM_THREADS.fetch_add(1, std::sync::atomic::Ordering::Relaxed));
+    /// The state of this thread's generator
+    static RANDOM_STATE: std::cell::Cell<[u64; 4]> = std::cell::Cell::new(random_stream_state(
+        RANDOM_SEED.load(std::sync::atomic::Ordering::Relaxed),
+        RANDOM_STREAM.with(|cell| cell.get())));
+    /// The second of the last pair of normal variates, not yet used
+    static RANDOM_NEXT_GAUSS: std::cell::Cell<Option<f64>> = std::cell::Cell::new(None);
+}
+
+/// Restarts this thread's generator on the given stream of the current
+/// seed. Threads that each choose a different stream, such as the index
+/// of the work they do, draw the same numbers whatever order they run in.
+pub fn random_stream(stream: u64) {
+    let seed = RANDOM_SEED.load(std::sync::atomic::Ordering::Relaxed);
+    RANDOM_STREAM.with(|cell| cell.set(stream));
+    RANDOM_STATE.with(|cell| cell.set(random_stream_state(seed, stream)));
+    RANDOM_NEXT_GAUSS.with(|cell| cell.set(None));
+}
+
+fn random_next_u64() -> u64 {
+    RANDOM_STATE.with(|cell| {
+        let mut s = cell.get();
+        let result = random_step(&mut s);
+        cell.set(s);
+        result
+    })
+}
+
+/// A float uniformly distributed in [0, 1), from the top 53 bits
+fn random_random() -> f64 {
+    (random_next_u64() >> 11) as f64 * (1.0 / (1_u64 << 53) as f64)
+}
+
+fn random_uniform(a: f64, b: f64) -> f64 {
+    a + (b - a) * random_random()
+}
+
+/// Box-Muller, which makes normal variates in pairs. The second is kept
+/// for the next call.
+fn random_gauss(mu: f64, sigma: f64) -> f64 {
+    let z = match RANDOM_NEXT_GAUSS.with(|cell| cell.replace(None)) {
+        Some(z) => z,
+        None => {
+            let r = (-2.0 * (1.0 - random_random()).ln()).sqrt();
+            let theta = 2.0 * std::f64::consts::PI * random_random();
+            RANDOM_NEXT_GAUSS.with(|cell| cell.set(Some(r * theta.sin())));
+            r * theta.cos()
+        }
+    };
+    mu + sigma * z
+}
+
+/// Sets the seed, and restarts this thread's generator on its stream of
+/// it. Threads that have not yet drawn also start from this seed, each
+/// on its own stream, so no two threads draw the same numbers.
+fn random_seed(seed: i64) {
+    RANDOM_SEED.store(seed as u64, std::sync::atomic::Ordering::Relaxed);
+    random_stream(RANDOM_STREAM.with(|cell| cell.get()));
+}
+
+pub fn estimate_pi(samples: i64, seed: i64) -> f64 {
+    random_seed(seed);
+    let mut inside = 0;
+    for i in 0..samples {
+        let x = random_random();
+        let y = random_uniform(-1.0, 1.0);
+        if x * x + y * y <= 1.0 {
+            inside += 1;
+        }
+    }
+    return 4.0 * inside as f64 / samples as f64;
+}
+
+pub fn terminal_price(spot: f64, rate: f64, vol: f64, t: f64) -> f64 {
+    let drift = (rate - 0.5 * vol * vol) * t;
+    return spot * (drift + vol * (t).sqrt() * random_gauss(0.0, 1.0)).exp();
+}
+
+pub fn call_price(spot: f64, strike: f64, rate: f64, vol: f64, t: f64, paths: i64) -> f64 {
+    random_seed(42);
+    let mut total = 0.0;
+    for i in 0..paths {
+        total += (terminal_price(spot, rate, vol, t) - strike).max(0.0);
+    }
+    return (-rate * t).exp() * total / paths as f64;
+}
+
+pub fn noise(sigma: f64) -> f64 {
+    return random_gauss(0.0, sigma) + random_gauss(0.0, sigma);
+}
+
@@ -0,0 +1,73 @@
+/// The index of a[i][j] in a matrix stored flat, one row after another.
+/// A column outside the row would silently read a neighbouring row, so
+/// debug builds check for it.
+#[inline]
+fn flat_index(i: i64, j: i64, cols: i64) -> usize {
+    debug_assert!(0 <= j && j < cols, "column index out of range");
+    (i * cols + j) as usize
+}
+
+pub fn relu(a: &[f64]) -> Vec<f64> {
+    return a.iter().copied().map(|a| (a).max(0.0)).collect::<Vec<_>>();
+}
+
+pub fn scale_and_shift(a: &[f64], b: &[f64], scale: f64) -> Vec<f64> {
+    return a.iter().copied().zip(b.iter().copied()).map(|(a, b)| (a - b) * scale + 1.0).collect::<Vec<_>>();
+}
+
+pub fn softplus_total(a: &[f64]) -> f64 {
+    return a.iter().copied().map(|a| (1.0 + (-a).exp()).ln()).sum::<f64>();
+}
+
+pub fn weighted_mean(a: &[f64], w: &[f64]) -> f64 {
+    return a.iter().copied().zip(w.iter().copied()).map(|(a, w)| a * w).sum::<f64>() / w.iter().copied().sum::<f64>();
+}
+
+pub fn clip_negative(a: &[f64], floor: f64) -> Vec<f64> {
+    return a.iter().copied().map(|a| if a > floor { a } else { floor }).collect::<Vec<_>>();
+}
+
+pub fn centred(a: &[f64]) -> f64 {
+    let b = vec![0.0; (a).len() as usize];
+    let c = a.iter().copied().zip(b.iter().copied()).map(|(a, b)| a * 2.0 + b).collect::<Vec<_>>();
+    return (c.iter().copied().sum::<f64>() / c.len() as f64);
+}
+
+pub fn decay(a: &mut [f64], rate: f64) {
+    for a in a.iter_mut() {
+        *a *= (-rate).exp();
+    }
+    for a in a.iter_mut() {
+        *a = (*a).max(0.0);
+    }
+}
+
+pub fn standardise(a: &[f64]) -> Vec<f64> {
+    return { let tmp = (a.iter().copied().sum::<f64>() / a.len() as f64); let tmp0 = a.iter().copied().sum::<f64>(); a.iter().copied().map(move |a| (a - tmp) / tmp0) }.collect::<Vec<_>>();
+}
+
+pub fn recentre(a: &mut [f64], w: &[f64]) {
+    let tmp = a.iter().copied().zip(w.iter().copied()).map(|(a, w)| a * w).sum::<f64>();
+    let tmp0 = a[0];
+    for a in a.iter_mut() {
+        *a -= tmp * tmp0;
+    }
+}
+
+pub fn heat(n: i64, m: i64, steps: i64) -> f64 {
+    let t_rows = n;
+    let t_cols = m;
+    let mut t = vec![0.0; (t_rows * t_cols) as usize];
+    for i in 0..n {
+        t[flat_index(i, 0, t_cols)] = 1.0;
+    }
+    for step in 0..steps {
+        for i in 1..t_rows - 1 {
+            for j in 1..t_cols - 1 {
+                t[flat_index(i, j, t_cols)] = (t[flat_index(i - 1, j, t_cols)] + t[flat_index(i + 1, j, t_cols)] + t[flat_index(i, j - 1, t_cols)] + t[flat_index(i, j + 1, t_cols)]) / 4.0;
+            }
+        }
+    }
+    return t.iter().copied().sum::<f64>() / (t.iter().copied().sum::<f64>() / t.len() as f64);
+}
+
@@ -0,0 +1,135 @@
+pub fn dot_product(a: &[f64], b: &[f64]) -> f64 {
+    let mut total = 0.0;
+    {
+        let mut total_lanes = [0.0; 8];
+        let tmp = a.len().min(b.len());
+        let a_chunks = a[..tmp].chunks_exact(8);
+        let a_rest = a_chunks.remainder();
+        let b_chunks = b[..tmp].chunks_exact(8);
+        let b_rest = b_chunks.remainder();
+        for (a_chunk, b_chunk) in a_chunks.zip(b_chunks) {
+            for lane in 0..8 {
+                let (x, y) = (a_chunk[lane], b_chunk[lane]);
+                total_lanes[lane] += x * y;
+            }
+        }
+        for lane in 0..a_rest.len() {
+            let (x, y) = (a_rest[lane], b_rest[lane]);
+            total_lanes[lane] += x * y;
+        }
+        total += total_lanes.iter().sum::<f64>();
+    }
+    return total;
+}
+
+pub fn sum_and_product(a: &[f64]) -> (f64, f64) {
+    let mut total = 0.0;
+    let mut product = 1.0;
+    {
+        let mut total_lanes = [0.0; 8];
+        let mut product_lanes = [1.0; 8];
+        let a_chunks = a.chunks_exact(8);
+        let a_rest = a_chunks.remainder();
+        for a_chunk in a_chunks {
+            for lane in 0..8 {
+                let x = a_chunk[lane];
+                total_lanes[lane] += x;
+                product_lanes[lane] *= x;
+            }
+        }
+        for lane in 0..a_rest.len() {
+            let x = a_rest[lane];
+            total_lanes[lane] += x;
+            product_lanes[lane] *= x;
+        }
+        total += total_lanes.iter().sum::<f64>();
+        product *= product_lanes.iter().product::<f64>();
+    }
+    return (total, product);
+}
+
+pub fn total(a: &[f64]) -> f64 {
+    return {
+        let mut lanes = [0.0; 8];
+        let a_chunks = a.chunks_exact(8);
+        let a_rest = a_chunks.remainder();
+        for a_chunk in a_chunks {
+            for lane in 0..8 {
+                lanes[lane] += a_chunk[lane];
+            }
+        }
+        for lane in 0..a_rest.len() {
+            lanes[lane] += a_rest[lane];
+        }
+        lanes.iter().sum::<f64>()
+    };
+}
+
+pub fn norm_squared(a: &[f64]) -> f64 {
+    return {
+        let mut lanes = [0.0; 8];
+        let a_chunks = a.chunks_exact(8);
+        let a_rest = a_chunks.remainder();
+        for a_chunk in a_chunks {
+            for lane in 0..8 {
+                lanes[lane] += a_chunk[lane] * a_chunk[lane];
+            }
+        }
+        for lane in 0..a_rest.len() {
+            lanes[lane] += a_rest[lane] * a_rest[lane];
+        }
+        lanes.iter().sum::<f64>()
+    };
+}
+
+pub fn weighted_total(a: &[f64], w: &[f64], scale: f64) -> f64 {
+    return {
+        let mut lanes = [0.0; 8];
+        let tmp = a.len().min(w.len());
+        let a_chunks = a[..tmp].chunks_exact(8);
+        let a_rest = a_chunks.remainder();
+        let w_chunks = w[..tmp].chunks_exact(8);
+        let w_rest = w_chunks.remainder();
+        for (a_chunk, w_chunk) in a_chunks.zip(w_chunks) {
+            for lane in 0..8 {
+                lanes[lane] += a_chunk[lane] * w_chunk[lane] * scale;
+            }
+        }
+        for lane in 0..a_rest.len() {
+            lanes[lane] += a_rest[lane] * w_rest[lane] * scale;
+        }
+        lanes.iter().sum::<f64>()
+    };
+}
+
+pub fn mean(a: &[f64]) -> f64 {
+    let mut total = 0.0;
+    let mut count = 0;
+    for x in a {
+        total += x;
+        count += 1;
+    }
+    return total / count as f64;
+}
+
+pub fn sum_of_squares(a: &[f64]) -> f64 {
+    let mut total = 0.0;
+    {
+        let mut total_lanes = [0.0; 8];
+        let a_chunks = a.chunks_exact(8);
+        let a_rest = a_chunks.remainder();
+        for a_chunk in a_chunks {
+            for lane in 0..8 {
+                let (x, y) = (a_chunk[lane], a_chunk[lane]);
+                total_lanes[lane] += x * y;
+            }
+        }
+        for lane in 0..a_rest.len() {
+            let (x, y) = (a_rest[lane], a_rest[lane]);
+            total_lanes[lane] += x * y;
+        }
+        total += total_lanes.iter().sum::<f64>();
+    }
+    return total;
+}
+
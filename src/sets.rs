@@ -1,7 +1,25 @@
 use std::collections::HashSet;
 
+pub fn create_set_into(a: i64, b: i64, out: &mut HashSet<i64>) {
+    out.clear();
+    out.extend((a..b));
+}
+
 pub fn create_set(a: i64, b: i64) -> HashSet<i64> {
-    return (a..b).collect::<HashSet<_>>();
+    let mut out = HashSet::new();
+    create_set_into(a, b, &mut out);
+    return out;
+}
+
+pub fn create_filtered_set_into(a: i64, out: &mut HashSet<i64>) {
+    out.clear();
+    out.extend((0..a).filter(|&i| (i % 2) == 0));
+}
+
+pub fn create_filtered_set(a: i64) -> HashSet<i64> {
+    let mut out = HashSet::with_capacity(((a).max(0) as usize).min(1024));
+    create_filtered_set_into(a, &mut out);
+    return out;
 }
 
 pub fn set_check_and_add(a: &mut HashSet<String>, item: &str) -> bool {
@@ -14,11 +32,11 @@ pub fn set_check_and_add(a: &mut HashSet<String>, item: &str) -> bool {
 }
 
 pub fn create_static_set() -> HashSet<String> {
-    let a = [
+    let a = HashSet::from([
         "one".to_string(),
         "two".to_string(),
         "three".to_string(),
-        ].iter().cloned().collect::<HashSet<_>>();
+        ]);
     return a;
 }
 
@@ -31,28 +49,80 @@ pub fn set_methods(a: i64, b: &str) {
     assert!(copy_s_int == s_int);
     assert!(&copy_s_int as *const _ != &s_int as *const _);
     let mut diff_s_int = s_int.difference(&copy_s_int).cloned().collect::<HashSet<i64>>();
-    assert!(diff_s_int.len() == 0);
+    assert!((diff_s_int).len() == 0);
     copy_s_int.clear();
     assert!(copy_s_int != s_int);
-    diff_s_int.clear();
-    // TODO difference_update(s_int);
+    diff_s_int.retain(|tmp| !s_int.contains(tmp));
     assert!(diff_s_int == s_int);
     s_int.remove(&0);
     s_str.remove("baz");
-    let union_s_int = s_int.union(&copy_s_int).cloned().collect::<HashSet<i64>>();
+    let union_s_int = { let mut tmp0 = s_int.clone(); tmp0.extend(copy_s_int.iter()); tmp0 };
     assert!(copy_s_int == union_s_int);
-    let mut inter_s_int = s_int.intersection(&copy_s_int).cloned().collect::<HashSet<i64>>();
-    s_int.clear();
-    // TODO intersection_update(copy_s_int, inter_s_int);
+    let inter_s_int = s_int.intersection(&copy_s_int).cloned().collect::<HashSet<i64>>();
+    s_int.retain(|tmp1| copy_s_int.contains(tmp1) && inter_s_int.contains(tmp1));
     assert!(s_int != inter_s_int);
-    assert!(!s_int.is_disjoint(&inter_s_int));
+    assert!((!s_int.is_disjoint(&inter_s_int)));
     assert!(inter_s_int.is_subset(&s_int));
     assert!(s_int.is_superset(&inter_s_int));
     let sd_s_int = s_int.symmetric_difference(&copy_s_int).cloned().collect::<HashSet<i64>>();
-    s_int.clear();
-    // TODO symmetric_difference_update(copy_s_int, sd_s_int);
+    for tmp2 in sd_s_int.iter() {
+        if !s_int.remove(tmp2) {
+            s_int.insert(*tmp2);
+        }
+    }
     s_int.remove(&0);
     s_int.remove(&1);
     s_str.remove("foo");
 }
 
+pub fn set_update_methods() {
+    let mut s = HashSet::from([
+        1,
+        2,
+        3,
+        4,
+        ]);
+    let t = HashSet::from([
+        3,
+        4,
+        5,
+        6,
+        ]);
+    let u = { let mut tmp = s.clone(); tmp.extend(t.iter().chain([7].iter())); tmp };
+    assert!(u == HashSet::from([
+        1,
+        2,
+        3,
+        4,
+        5,
+        6,
+        7,
+        ]));
+    assert!(s.iter().filter(|tmp0| t.contains(tmp0) && u.contains(tmp0)).cloned().collect::<HashSet<i64>>() == HashSet::from([3, 4]));
+    assert!(u.iter().filter(|tmp1| !s.contains(tmp1) && !t.contains(tmp1)).cloned().collect::<HashSet<i64>>() == HashSet::from([7]));
+    s.retain(|tmp2| !t.contains(tmp2));
+    assert!(s == HashSet::from([1, 2]));
+    s.extend(t.iter().chain([7].iter()));
+    assert!(s == u);
+    s.retain(|tmp3| t.contains(tmp3) && [4, 5].contains(tmp3));
+    assert!(s == HashSet::from([4, 5]));
+    for tmp4 in t.iter() {
+        if !s.remove(tmp4) {
+            s.insert(*tmp4);
+        }
+    }
+    assert!(s == HashSet::from([3, 6]));
+}
+
+pub fn string_set_updates() {
+    let mut s = HashSet::from([
+        "a".to_string(),
+        "b".to_string(),
+        "c".to_string(),
+        ]);
+    s.retain(|tmp| matches!(&tmp[..], "a" | "b") && matches!(&tmp[..], "b" | "c"));
+    assert!(s == HashSet::from(["b".to_string()]));
+    s.retain(|tmp0| !matches!(&tmp0[..], "b"));
+    assert!((s).len() == 0);
+}
+
@@ -1,6 +1,41 @@
 trait Waddle {
     fn waddle(&self, elegant: bool);
-    fn run(&self, speed: i64);
+    fn run(&mut self, speed: i64);
+}
+
+#[derive(Clone, PartialEq, Eq, Hash)]
+pub enum WaddleEnum {
+    Duck(Duck),
+    Penguin(Penguin),
+}
+
+impl From<Duck> for WaddleEnum {
+    fn from(inner: Duck) -> WaddleEnum {
+        WaddleEnum::Duck(inner)
+    }
+}
+
+impl From<Penguin> for WaddleEnum {
+    fn from(inner: Penguin) -> WaddleEnum {
+        WaddleEnum::Penguin(inner)
+    }
+}
+
+impl Waddle for WaddleEnum {
+    fn waddle(&self, elegant: bool) {
+        match self {
+            WaddleEnum::Duck(inner) => inner.waddle(elegant),
+            WaddleEnum::Penguin(inner) => inner.waddle(elegant),
+        }
+    }
+
+    fn run(&mut self, speed: i64) {
+        match self {
+            WaddleEnum::Duck(inner) => inner.run(speed),
+            WaddleEnum::Penguin(inner) => inner.run(speed),
+        }
+    }
+
 }
 
 trait Quack {
@@ -8,6 +43,33 @@ trait Quack {
     fn echoes(&self) -> bool;
 }
 
+#[derive(Clone, PartialEq, Eq, Hash)]
+pub enum QuackEnum {
+    Duck(Duck),
+}
+
+impl From<Duck> for QuackEnum {
+    fn from(inner: Duck) -> QuackEnum {
+        QuackEnum::Duck(inner)
+    }
+}
+
+impl Quack for QuackEnum {
+    fn quack(&self, volume: f64) {
+        match self {
+            QuackEnum::Duck(inner) => inner.quack(volume),
+        }
+    }
+
+    fn echoes(&self) -> bool {
+        match self {
+            QuackEnum::Duck(inner) => inner.echoes(),
+        }
+    }
+
+}
+
+#[derive(Clone, PartialEq, Eq, Hash)]
 pub struct Duck {
     pub _echoes: bool,
 }
@@ -34,7 +96,7 @@ impl Waddle for Duck {
         println!("waddle");
     }
 
-    fn run(&self, speed: i64) {
+    fn run(&mut self, speed: i64) {
         println!("{} {}", "run", speed);
     }
 
@@ -51,11 +113,37 @@ impl Quack for Duck {
 
 }
 
-pub fn make_it_waddle(waddler: &mut Waddle) {
+#[derive(Clone, PartialEq, Eq, Hash)]
+pub struct Penguin {
+    pub speed: i64,
+}
+
+impl Penguin {
+    pub fn new(speed: i64) -> Penguin {
+        let tmp_speed = speed;
+        Penguin {
+            speed: tmp_speed,
+        }
+    }
+
+}
+
+impl Waddle for Penguin {
+    fn waddle(&self, elegant: bool) {
+        println!("{} {}", "shuffle", self.speed);
+    }
+
+    fn run(&mut self, speed: i64) {
+        self.speed = speed;
+    }
+
+}
+
+pub fn make_it_waddle(waddler: &Waddle) {
     waddler.waddle(false);
 }
 
-pub fn make_it_quack(quacker: &mut Quack) {
+pub fn make_it_quack(quacker: &Quack) {
     quacker.quack(10.0);
 }
 
@@ -1,6 +1,8 @@
+use std::borrow::Cow;
+
 pub fn assignment(a: bool, b: &str, c: i64, d: i64) -> i64 {
     let e = a;
-    let f = b.to_string();
+    let f = b;
     let g = c;
     let h = c + d;
     let j = c + d + g + h;
@@ -27,24 +29,44 @@ pub fn aug_assign(a: i64, b: i64) -> i64 {
     return c;
 }
 
-pub fn repeated_assign(a: &str, b: &str) -> String {
-    let mut c = a.to_string();
+pub fn repeated_assign<'a>(a: &'a str, b: &'a str) -> &'a str {
+    let mut c = a;
     if a != b {
-        c = b.to_string();
+        c = b;
     }
     if b == a {
-        c = "equal".to_string();
+        c = "equal";
     }
     return c;
 }
 
-pub fn pathological(a: bool, b: &str, c: &str) -> String {
-    let mut d: String = String::new();
+pub fn pathological<'a>(a: bool, b: &'a str, c: &'a str) -> &'a str {
+    let mut d: &str = "";
     if a {
-        d = b.to_string();
+        d = b;
     } else {
-        d = c.to_string();
+        d = c;
     }
     return d;
 }
 
+pub fn static_label(a: i64) -> &'static str {
+    if a > 0 {
+        return "positive";
+    }
+    return "negative";
+}
+
+pub fn maybe_suffixed<'a>(a: &'a str, b: bool) -> Cow<'a, str> {
+    if b {
+        return Cow::Owned(a.to_string() + "_suffix");
+    }
+    return Cow::Borrowed(a);
+}
+
+pub fn labels(a: i64, b: &str) -> bool {
+    let label = static_label(a);
+    let suffixed = maybe_suffixed(b, a > 0);
+    return label == "positive" && suffixed == b;
+}
+
@@ -0,0 +1,127 @@
+"""
+Module supporting analysis of the flow of strings through a function.
+Python strings are immutable and shared, so most are never modified,
+and there is no need to copy them into a new Rust String. Where
+lifetimes allow, we borrow them instead.
+"""
+
+import ast
+from typing import Dict, List, Set
+
+# How a function returning str hands back the string
+STATIC_STRING = "&'static str"     # always a literal
+BORROWED_STRING = "&'a str"        # a literal or borrowed from an argument
+COW_STRING = "Cow<'a, str>"        # sometimes borrowed, sometimes owned
+
+def str_args(node) -> Set[str]:
+    """
+    Returns the names of the arguments of the given function that are
+    annotated as str, so are passed as &str.
+    """
+    return {a.arg for a in node.args.args
+        if isinstance(a.annotation, ast.Name) and a.annotation.id == "str"}
+
+def is_borrowed_string(node, borrowed: Set[str], static_functions: Set[str] = set()) -> bool:
+    """
+    Is this expression a string that can be borrowed, rather than
+    copied? That is, a literal, a borrowed variable, a contiguous
+    slice of one, or the result of a function that returns a literal.
+    """
+    if isinstance(node, ast.Constant):
+        return isinstance(node.value, str)
+    elif isinstance(node, ast.Name):
+        return node.id in borrowed
+    elif isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Slice):
+        return not node.slice.step and is_borrowed_string(node.value, borrowed)
+    elif isinstance(node, ast.IfExp):
+        return (is_borrowed_string(node.body, borrowed, static_functions) and
+            is_borrowed_string(node.orelse, borrowed, static_functions))
+    elif isinstance(node, ast.Call):
+        return isinstance(node.func, ast.Name) and node.func.id in static_functions
+    else:
+        return False
+
+def find_borrowed_strings(node, static_functions: Set[str] = set()) -> Set[str]:
+    """
+    Given a function, returns the names of the str arguments and local
+    variables that only ever hold literals, other borrowed strings or
+    slices of them. These can all be &str. The static_functions are
+    those known to return literals.
+
+    Variables assigned in any other way, such as by augmented assignment,
+    unpacking or as the target of a loop, are assumed to be owned.
+    """
+    values: Dict[str, List[object]] = {}
+    simple = set()
+    for n in ast.walk(node):
+        if isinstance(n, ast.Assign):
+            for target in n.targets:
+                if isinstance(target, ast.Name):
+                    values.setdefault(target.id, []).append(n.value)
+                    simple.add(target)
+    for n in ast.walk(node):
+        if isinstance(n, ast.Name) and not isinstance(n.ctx, ast.Load) and n not in simple:
+            values.setdefault(n.id, []).append(None)
+
+    borrowed = {arg for arg in str_args(node) if arg not in values}
+    changed = True
+    while changed:
+        changed = False
+        for var, assigned in values.items():
+            if var not in borrowed and all(is_borrowed_string(v, borrowed, static_functions)
+                    for v in assigned):
+                borrowed.add(var)
+                changed = True
+    return borrowed
+
+def find_checked_strings(node) -> Set[str]:
+    """
+    Given a function, returns the names of the arguments and local
+    variables that are sliced by position, and are only ever bound by
+    being passed in or by simple assignment. Rust slices strings by
+    bytes, which only gives the same result as Python for ASCII text.
+    Strings are immutable, so for these it is enough to check each
+    value once, when it is bound, rather than at every slice.
+    """
+    sliced = {n.value.id for n in ast.walk(node)
+        if isinstance(n, ast.Subscript) and isinstance(n.slice, ast.Slice) and
+            isinstance(n.value, ast.Name) and
+            (n.slice.lower or n.slice.upper or not n.slice.step)}
+    simple = set()
+    for n in ast.walk(node):
+        if isinstance(n, ast.Assign):
+            simple.update(t for t in n.targets if isinstance(t, ast.Name))
+        elif isinstance(n, ast.AnnAssign) and isinstance(n.target, ast.Name) and n.value:
+            simple.add(n.target)
+    rebound = {n.id for n in ast.walk(node)
+        if isinstance(n, ast.Name) and not isinstance(n.ctx, ast.Load) and n not in simple}
+    return sliced - rebound
+
+def static_functions(headers) -> Set[str]:
+    """
+    Given the function headers of a module, returns the names of the
+    functions that always return string literals.
+    """
+    return {name for name, header in headers.items() if header.string_return == STATIC_STRING}
+
+def string_return(node) -> str:
+    """
+    If the given function returns str, returns how it can do so without
+    copying, as one of STATIC_STRING, BORROWED_STRING or COW_STRING.
+    Returns "" if the function must return an owned String.
+    """
+    if not isinstance(node.returns, ast.Name) or node.returns.id != "str":
+        return ""
+    returns = [n.value for n in ast.walk(node) if isinstance(n, ast.Return) and n.value]
+    if not returns:
+        return ""
+
+    borrowed = find_borrowed_strings(node)
+    if all(isinstance(r, ast.Constant) for r in returns):
+        return STATIC_STRING
+    elif all(is_borrowed_string(r, borrowed) for r in returns):
+        return BORROWED_STRING
+    elif any(is_borrowed_string(r, borrowed) for r in returns):
+        return COW_STRING
+    else:
+        return ""
@@ -1,3 +1,6 @@
+from dataclasses import dataclass
+from typing import List
+
 class Foo:
     def __init__(self, a: int, b: str):
         self.a = a
@@ -10,6 +13,13 @@ class Foo:
     def add(self, x: int):
         self.counter += x
 
+    def add_twice(self, x: int):
+        self.add(x)
+        self.add(x)
+
+    def total(self) -> int:
+        return self.a + self.counter
+
 def create_foo(a: int, b: str) -> Foo:
     foo = Foo(a, b)
     return foo
@@ -31,3 +41,108 @@ def examine_foo(foo: Foo):
     a = foo.a
     print("a = ", a, "b = ", b)
 
+
+def total_foo(foo: Foo) -> int:
+    return foo.total()
+
+class Cell:
+    def __init__(self, row: int, col: int):
+        self.row = row
+        self.col = col
+
+    def area(self) -> int:
+        return self.row * self.col
+
+class Point:
+    def __init__(self, x: float, y: float):
+        self.x = x
+        self.y = y
+
+    def norm(self) -> float:
+        return self.x * self.x + self.y * self.y
+
+def cell_distance(a: Cell, b: Cell) -> int:
+    return abs(a.row - b.row) + abs(a.col - b.col)
+
+def further(a: Point, b: Point) -> bool:
+    return a.norm() > b.norm()
+
+@dataclass(frozen=True)
+class Vector:
+    x: float
+    y: float
+
+    def length_squared(self) -> float:
+        return self.x * self.x + self.y * self.y
+
+@dataclass
+class Quote:
+    strike: float
+    spot: float = 100.0
+    rate: float = 0.05
+
+def quotes(k: float) -> float:
+    a = Quote(k)
+    b = Quote(k, rate=0.01)
+    return a.spot + b.rate
+
+@dataclass
+class Account:
+    name: str
+    balance: float
+
+    def deposit(self, amount: float):
+        self.balance += amount
+
+class Sample:
+    __slots__ = ("count", "scale")
+    scale: float
+
+    def __init__(self, count: int, scale: float):
+        self.count = count
+        self.scale = scale * 2.0
+
+def vector_length(x: float, y: float) -> float:
+    v = Vector(x, y)
+    return v.length_squared()
+
+def open_account(name: str) -> Account:
+    account = Account(name, 0.0)
+    account.deposit(10.0)
+    return account
+
+@dataclass
+class Position:
+    __columnar__ = True
+    quantity: float
+    price: float
+    book: str
+
+    def value(self) -> float:
+        return self.quantity * self.price
+
+def exposure(positions: List[Position]) -> float:
+    total = 0.0
+    for p in positions:
+        total += p.quantity * p.price
+    return total
+
+def total_value(positions: List[Position]) -> float:
+    total = 0.0
+    for p in positions:
+        total += p.value()
+    return total
+
+def book_exposure(prices: List[float], book: str) -> float:
+    ps = [Position(1.0, x, book) for x in prices]
+    qs: List[Position] = []
+    qs.append(Position(2.0, 3.0, book))
+    return exposure(ps) + exposure(qs)
+
+class Offset:
+    def __init__(self, dx: float, dy: float):
+        self.dx = dx
+        self.dy = dy
+
+def nudge(o: Offset, dx: float):
+    o.dx += dx
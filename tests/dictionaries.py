@@ -4,6 +4,9 @@ def create_dict(keys: List[str], values: List[str]) -> Dict[str, str]:
     d = { k: v for k, v in zip(keys, values)}
     return d
 
+def create_filtered_dict(keys: List[str], values: List[str]) -> Dict[str, str]:
+    return {k: v for k, v in zip(keys, values) if k != v}
+
 def access_dict(keys: List[str], dictionary: Dict[str, str]) -> List[str]:
     result = []
     for key in keys:
@@ -46,3 +49,27 @@ def dict_methods(dictionary: Dict[str, str]):
 
     (k, v) = d.popitem()
     assert(k == "foo" and v == "bar")
+
+def weighted_matches(keys: List[str], others: List[str], dictionary: Dict[str, str], weights: Dict[str, float]) -> float:
+    total = 0.0
+    for k, w in weights.items():
+        if w > 0.0 and k in dictionary:
+            total += w
+    for key, other in zip(keys, others):
+        if key == other:
+            print(key)
+    return total
+
+def padded_groups(groups: Dict[str, List[str]]):
+    for k, v in groups.items():
+        v.append("padding")
+        if len(v) > 2:
+            print(k)
+
+def drain_weights(weights: Dict[str, float]) -> float:
+    total = 0.0
+    while weights:
+        k, w = weights.popitem()
+        print(k)
+        total += w
+    return total
@@ -1,3 +1,6 @@
+from typing import List
+from math import exp
+
 def if_else(a: bool, c: int) -> int:
     if a:
         return c
@@ -33,3 +36,41 @@ def for_loop(a: int, b: int) -> int:
     for i in range(a, b):
         total += i
     return total
+
+def while_invariant(a: List[int], b: int) -> int:
+    i = 0
+    found = 0
+    while i < len(a):
+        if b in [1, 2, 3]:
+            found += 1
+        if found in [b, b + 1]:
+            found += 1
+        i += 1
+    return found
+
+def for_invariant(a: int, b: float) -> float:
+    total = 0.0
+    for i in range(a):
+        total += exp(b) * 2.0
+    return total
+
+def discounted_payoff(spot: float, strike: float, rate: float, years: int, vol: float) -> float:
+    payoff = max(spot - strike, 0.0) ** 2
+    discount = (1.0 + rate) ** years
+    return payoff / discount * (vol ** 0.5) * years ** 1.5
+
+def integer_powers(a: int, b: int) -> int:
+    return a ** 3 + (a + 1) ** 2 + a ** b
+
+def guarded_max(a: List[float], n: int, lowest: float) -> float:
+    total = 0.0
+    for i in range(n):
+        if len(a) > 0:
+            total += max(a) + max(lowest, 1.0)
+    return total
+
+def subsets(n: int) -> int:
+    total = 0
+    for i in range(2 ** n):
+        total += i
+    return total
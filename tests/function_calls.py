@@ -1,3 +1,4 @@
+from typing import Callable, List
 import flow_of_control
 import add_mult
 
@@ -19,3 +20,37 @@ def call_local(a: int, b: int, c: int) -> int:
     else:
         return call_add_mult(a, b, c)
 
+
+def apply_twice(f: Callable[[float], float], x: float) -> float:
+    return f(f(x))
+
+def integrate(f: Callable[[float], float], a: float, b: float, n: int) -> float:
+    h = (b - a) / n
+    total = 0.0
+    for i in range(n):
+        total += f(a + h * i)
+    return total * h + apply_twice(f, a)
+
+def call_callbacks(a: float) -> float:
+    k = 2.0
+    return integrate(lambda x: x * k, 0.0, a, 10)
+
+def compose_all(fs: List[Callable[[float], float]], x: float) -> float:
+    for f in fs:
+        x = f(x)
+    return x
+
+def scaler(k: float) -> Callable[[float], float]:
+    return lambda x: x * k
+
+class Stage:
+    def __init__(self, transform: Callable[[float], float]):
+        self.transform = transform
+
+    def run(self, x: float) -> float:
+        return self.transform(x)
+
+def run_stage(x: float) -> float:
+    k = 3.0
+    s = Stage(lambda y: y * k)
+    return s.transform(x)
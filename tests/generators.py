@@ -0,0 +1,52 @@
+from typing import List, Iterator
+
+def fibonacci(limit: int) -> Iterator[int]:
+    a, b = 0, 1
+    while a < limit:
+        yield a
+        a, b = b, a + b
+
+def evens(source: Iterator[int], scale: int) -> Iterator[int]:
+    for x in source:
+        if x % 2 == 0:
+            yield x * scale
+
+def running_total(values: List[float]) -> Iterator[float]:
+    total = 0.0
+    for v in values:
+        total += v
+        yield total
+
+def squares(n: int) -> Iterator[int]:
+    for i in range(n):
+        yield i * i
+
+def positive_pairs(values: List[int], limit: int) -> Iterator[int]:
+    count = 0
+    for v in values:
+        if v < 0:
+            continue
+        yield v
+        count += 1
+        if v == 0:
+            continue
+        yield v * 2
+        if count >= limit:
+            break
+
+def until_negative(values: List[int]) -> Iterator[int]:
+    for v in values:
+        if v < 0:
+            break
+        yield v
+
+def sum_even_fibonacci(limit: int) -> int:
+    return sum(evens(fibonacci(limit), 1))
+
+def consume(values: List[float]) -> float:
+    result = 0.0
+    for t in running_total(values):
+        result += t
+    for s in squares(4):
+        print(s)
+    return result
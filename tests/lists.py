@@ -3,6 +3,9 @@ from typing import List, Tuple
 def create_list(a: int, b: int) -> List[int]:
     return [x * x for x in range(a, b)]
 
+def create_filtered_list(a: int, b: int) -> List[int]:
+    return [x * x for x in range(a, b) if x % 3 != 0]
+
 def process_list(a: List[int], b: List[int]) -> List[Tuple[int, int]]:
     return [(x, y) for x, y in zip(a, b)]
 
@@ -24,10 +27,65 @@ def manual_dot_product(a: List[float], b: List[float]) -> float:
         sum += i * j
     return sum
     
+def fused_reductions(a: List[float], n: int) -> float:
+    total = sum([x * x for x in a])
+    largest = max(x * 2.0 for x in a)
+    smallest = min(x for x in a if x > 0.0)
+    count = len([i for i in range(n) if i % 3 == 0])
+    if any(x > 10.0 for x in a) and all(x < 100.0 for x in a):
+        print(count)
+    for y in [x + 1.0 for x in a if x > 1.0]:
+        total += y
+    return total + largest + smallest
+
+def slices(a: List[int], s: str) -> int:
+    head = a[:3]
+    tail = a[1:]
+    middle = a[1:-1]
+    evens = a[::2]
+    word = s[1:4]
+    print(word, len(a[1::3]))
+    total = sum(head) + sum(tail) + sum(middle) + sum(evens)
+    for x in a[::-1]:
+        total += x
+    return total
+
+def copied_slice(a: List[int], n: int) -> List[int]:
+    b = a[1:n]
+    b.append(4)
+    return b
+
+def ends(s: str, n: int):
+    word = s * 2
+    print(word[n:], word[:-n])
+
+def reversed_string(s: str) -> str:
+    return s[::-1]
+
 def static_lists(a: int) -> bool:
     odd = [1, 3, 5, 7]
     return a in odd
 
+def static_membership(a: int, b: str) -> bool:
+    primes = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37]
+    if a in primes:
+        return b in ("foo", "bar")
+    elif b in ["one", "two", "three", "four", "five", "six", "seven", "eight", "nine"]:
+        return False
+    return b not in {"wombat": 1, "bar": 2}
+
+def lookup_lists(a: int, b: int) -> int:
+    days = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+    scratch = [a, b, a + b]
+    scratch[0] = days[1]
+    assert(len(days) == 12)
+    total = 0
+    for d in days:
+        total += d
+    if scratch[2] > total:
+        return scratch[2]
+    return total
+
 def list_methods(a: int, b: str):
 
     l_int = [x for x in range(a)]
@@ -54,3 +112,50 @@ def list_methods(a: int, b: str):
     
     del l_int[0]
     l_str.remove(1)
+
+def count_multiples(a: int, b: int) -> int:
+    total = 0
+    for i in range(1, a):
+        multiples: List[int] = []
+        for j in range(b):
+            if j % i == 0:
+                multiples.append(j)
+        if len(multiples) > 1:
+            total += multiples[1]
+    return total
+
+def zero_matrix(n: int, m: int) -> List[List[float]]:
+    return [[0.0] * m for _ in range(n)]
+
+def relax(n: int, m: int, steps: int) -> float:
+    grid = [[0.0] * m for _ in range(n)]
+    for i in range(n):
+        grid[i][0] = 1.0
+    for step in range(steps):
+        for i in range(1, n - 1):
+            for j in range(1, m - 1):
+                grid[i][j] = (grid[i - 1][j] + grid[i + 1][j] + grid[i][j - 1] + grid[i][j + 1]) / 4.0
+    total = 0.0
+    for i in range(len(grid)):
+        for j in range(len(grid[i])):
+            total += grid[i][j]
+    return total
+
+def accumulate(total: List[float], a: List[float], weight: float):
+    total += a * weight
+
+def blend(out: List[float], a: List[float], b: List[float], t: float):
+    out[:] = a * (1.0 - t) + b * t
+
+def offset_sums(a: List[int], b: List[float], base: int) -> float:
+    return 2.0 * sum(b, start=0.5) + sum(a, base)
+
+def joined(a: List[int], b: List[int]) -> List[int]:
+    c = [x for x in a]
+    c += b
+    return c
+
+def joined_floats(a: List[float], b: List[float]) -> List[float]:
+    c = [x for x in a]
+    c += b
+    return c
@@ -0,0 +1,44 @@
+from typing import List
+import math
+import statistics
+from statistics import NormalDist
+from math import sqrt, floor
+
+def black_scholes_call(spot: float, strike: float, rate: float, vol: float, t: float) -> float:
+    root_t = math.sqrt(t)
+    d1 = (math.log(spot / strike) + (rate + 0.5 * vol * vol) * t) / (vol * root_t)
+    d2 = d1 - vol * root_t
+    return spot * NormalDist().cdf(d1) - strike * math.exp(-rate * t) * NormalDist().cdf(d2)
+
+def gaussian_density(x: float, mu: float, sigma: float) -> float:
+    return NormalDist(mu, sigma).pdf(x)
+
+def tail_probability(x: float) -> float:
+    return 0.5 * math.erfc(x / math.sqrt(2.0))
+
+def polar(x: float, y: float) -> float:
+    return math.hypot(x, y) * math.cos(math.atan2(y, x)) + math.sin(math.pi / 6.0)
+
+def compound(rate: float, years: int) -> float:
+    return math.expm1(years * math.log1p(rate))
+
+def digits(n: int) -> float:
+    return math.log(n, 10) + math.log(2.0, n)
+
+def buckets(x: float, width: float) -> int:
+    return floor(x / width) + math.ceil(sqrt(width))
+
+def summary(a: List[float]) -> float:
+    return statistics.mean(a) + statistics.stdev(a) + statistics.pvariance(a)
+
+def exact_total(a: List[float]) -> float:
+    return math.fsum(x * x for x in a)
+
+def converged(a: float, b: float, tol: float) -> bool:
+    return math.isclose(a, b, abs_tol=tol) and not math.isnan(a)
+
+def clamp_to_finite(x: float) -> float:
+    return x if math.isfinite(x) else math.inf
+
+def horner(x: float, a: float, b: float, c: float) -> float:
+    return (a * x + b) * x + c
@@ -0,0 +1,26 @@
+import math
+import random
+
+def estimate_pi(samples: int, seed: int) -> float:
+    random.seed(seed)
+    inside = 0
+    for i in range(samples):
+        x = random.random()
+        y = random.uniform(-1.0, 1.0)
+        if x * x + y * y <= 1.0:
+            inside += 1
+    return 4.0 * inside / samples
+
+def terminal_price(spot: float, rate: float, vol: float, t: float) -> float:
+    drift = (rate - 0.5 * vol * vol) * t
+    return spot * math.exp(drift + vol * math.sqrt(t) * random.gauss(0.0, 1.0))
+
+def call_price(spot: float, strike: float, rate: float, vol: float, t: float, paths: int) -> float:
+    random.seed(42)
+    total = 0.0
+    for i in range(paths):
+        total += max(terminal_price(spot, rate, vol, t) - strike, 0.0)
+    return math.exp(-rate * t) * total / paths
+
+def noise(sigma: float) -> float:
+    return random.gauss(sigma=sigma) + random.normalvariate(0.0, sigma)
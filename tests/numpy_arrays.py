@@ -0,0 +1,41 @@
+import numpy as np
+
+def relu(a: np.ndarray) -> np.ndarray:
+    return np.maximum(a, 0.0)
+
+def scale_and_shift(a: np.ndarray, b: np.ndarray, scale: float) -> np.ndarray:
+    return (a - b) * scale + 1.0
+
+def softplus_total(a: np.ndarray) -> float:
+    return np.sum(np.log(1.0 + np.exp(-a)))
+
+def weighted_mean(a: np.ndarray, w: np.ndarray) -> float:
+    return np.dot(a, w) / np.sum(w)
+
+def clip_negative(a: np.ndarray, floor: float) -> np.ndarray:
+    return np.where(a > floor, a, floor)
+
+def centred(a: np.ndarray) -> float:
+    b = np.zeros(len(a))
+    c = a * 2.0 + b
+    return np.mean(c)
+
+def decay(a: np.ndarray, rate: float):
+    a *= np.exp(-rate)
+    a[:] = np.maximum(a, 0.0)
+
+def standardise(a: np.ndarray) -> np.ndarray:
+    return (a - np.mean(a)) / np.sum(a)
+
+def recentre(a: np.ndarray, w: np.ndarray):
+    a -= np.dot(a, w) * a[0]
+
+def heat(n: int, m: int, steps: int) -> float:
+    t = np.zeros((n, m))
+    for i in range(n):
+        t[i, 0] = 1.0
+    for step in range(steps):
+        for i in range(1, t.shape[0] - 1):
+            for j in range(1, t.shape[1] - 1):
+                t[i, j] = (t[i - 1, j] + t[i + 1, j] + t[i, j - 1] + t[i, j + 1]) / 4.0
+    return np.sum(t) / np.mean(t)
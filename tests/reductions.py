@@ -0,0 +1,39 @@
+from typing import List, Tuple
+import numpy as np
+
+def dot_product(a: List[float], b: List[float]) -> float:
+    total = 0.0
+    for x, y in zip(a, b):
+        total += x * y
+    return total
+
+def sum_and_product(a: List[float]) -> Tuple[float, float]:
+    total = 0.0
+    product = 1.0
+    for x in a:
+        total += x
+        product *= x
+    return total, product
+
+def total(a: List[float]) -> float:
+    return sum(a)
+
+def norm_squared(a: np.ndarray) -> float:
+    return np.dot(a, a)
+
+def weighted_total(a: np.ndarray, w: np.ndarray, scale: float) -> float:
+    return np.sum(a * w * scale)
+
+def mean(a: List[float]) -> float:
+    total = 0.0
+    count = 0
+    for x in a:
+        total += x
+        count += 1
+    return total / count
+
+def sum_of_squares(a: List[float]) -> float:
+    total = 0.0
+    for x, y in zip(a, a):
+        total += x * y
+    return total
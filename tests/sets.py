@@ -3,6 +3,9 @@ from typing import Set
 def create_set(a: int, b: int) -> Set[int]:
     return {i for i in range(a, b)}
 
+def create_filtered_set(a: int) -> Set[int]:
+    return {i for i in range(a) if i % 2 == 0}
+
 def set_check_and_add(a: Set[str], item: str) -> bool:
     if item in a:
         return True
@@ -48,8 +51,31 @@ def set_methods(a: int, b: str):
     assert(s_int.issuperset(inter_s_int))
 
     sd_s_int = s_int.symmetric_difference(copy_s_int)
-    s_int.symmetric_difference_update(copy_s_int, sd_s_int)
+    s_int.symmetric_difference_update(sd_s_int)
     
     del s_int[0]
     s_int.remove(1)
     s_str.remove("foo")
+
+def set_update_methods():
+    s = {1, 2, 3, 4}
+    t = {3, 4, 5, 6}
+    u = s.union(t, {7})
+    assert(u == {1, 2, 3, 4, 5, 6, 7})
+    assert(s.intersection(t, u) == {3, 4})
+    assert(u.difference(s, t) == {7})
+    s.difference_update(t)
+    assert(s == {1, 2})
+    s.update(t, {7})
+    assert(s == u)
+    s.intersection_update(t, {4, 5})
+    assert(s == {4, 5})
+    s.symmetric_difference_update(t)
+    assert(s == {3, 6})
+
+def string_set_updates():
+    s = {"a", "b", "c"}
+    s.intersection_update({"a", "b"}, {"b", "c"})
+    assert(s == {"b"})
+    s.difference_update({"b"})
+    assert(len(s) == 0)
@@ -51,6 +51,16 @@ class Duck(Waddle, Quack):
     def fly(self):
         print("fly")
 
+class Penguin(Waddle):
+    def __init__(self, speed: int):
+        self.speed = speed
+
+    def waddle(self, elegant: bool):
+        print("shuffle", self.speed)
+
+    def run(self, speed: int):
+        self.speed = speed
+
 def make_it_waddle(waddler: Waddle):
     waddler.waddle(False)
 
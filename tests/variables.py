@@ -36,3 +36,18 @@ def pathological(a: bool, b: str, c: str) -> str:
     else:
         d = c
     return d
+
+def static_label(a: int) -> str:
+    if a > 0:
+        return "positive"
+    return "negative"
+
+def maybe_suffixed(a: str, b: bool) -> str:
+    if b:
+        return a + "_suffix"
+    return a
+
+def labels(a: int, b: str) -> bool:
+    label = static_label(a)
+    suffixed = maybe_suffixed(b, a > 0)
+    return label == "positive" and suffixed == b
@@ -4,14 +4,21 @@ Module supporting analysis of variable declaration and usage.
 
 import ast
 import sys
-from typing import Dict, Set, List, Tuple, get_type_hints
+from typing import Dict, Optional, Set, List, Tuple, get_type_hints
 import filecmp
 import os
 from importlib import import_module, invalidate_caches
-from library_functions import method_return_type, STANDARD_FUNCTION_RETURNS
+from library_functions import method_return_type, is_read_only_method, \
+    is_numpy_call, STANDARD_FUNCTION_RETURNS, NUMPY_FUNCTION_RETURNS, \
+    NUMPY_ELEMENTWISE_FUNCTIONS, NUMPY_MODULES, MATH_CONSTANTS, \
+    is_statistics_call, normal_dist, is_random_call, RANDOM_HELPERS
 from var_utils import type_from_annotation, merge_types, container_type, \
-    strip_container, UNKNOWN_TYPE, numeric_type, dereference
+    strip_container, UNKNOWN_TYPE, numeric_type, dereference, constant_elements, \
+    is_string, is_list, is_copy_type, is_function_type, is_boxed_function_type, \
+    function_arg_types
 from headers import FunctionHeader, FunctionHeaderFinder, ClassHeader
+from string_analyser import find_borrowed_strings, static_functions
+from matrix_analyser import matrix_indices
 
 # Mapping from Rust type to Rust default initialiser
 DEFAULT_VALUES = {
@@ -22,6 +29,13 @@ DEFAULT_VALUES = {
     "&str": '""'
 }
 
+# Methods on lists that do not change their length, so work equally
+# well on fixed-size arrays
+ARRAY_METHODS = { "index", "count", "sum", "min", "max", "reverse", "sort" }
+
+# Functions that only iterate over a single container argument
+ITERATING_FUNCTIONS = { "len", "sum", "min", "max", "any", "all" }
+
 def get_node_path(node) -> List[str]:
     """
     Returns the address of a node, starting from the global namespace
@@ -36,13 +50,36 @@ def get_node_path(node) -> List[str]:
     else:
         raise Exception("Cannot find path to node")
 
+def elements_iterated(node) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Given a for loop, returns the name bound to each element of the list
+    or dict it runs over, and the name of the container, as for v and d
+    in "for k, v in d.items()". Returns (None, None) for other loops.
+    """
+    target = node.target
+    container = node.iter
+    if (isinstance(container, ast.Call) and isinstance(container.func, ast.Attribute) and
+            not container.args):
+        method = container.func.attr
+        container = container.func.value
+        if (method == "items" and isinstance(target, ast.Tuple) and
+                len(target.elts) == 2):
+            target = target.elts[1]
+        elif method != "values":
+            return None, None
+    if isinstance(target, ast.Name) and isinstance(container, ast.Name):
+        return target.id, container.id
+    return None, None
+
 def function_return(functype: str) -> str:
     """
     Finds the return type of a function.
-    E.g. given "&Fn(i32) -> f64" it returns "f64"
+    E.g. given "impl Fn(i32) -> f64" it returns "f64"
     """
     arrow = functype.find(" -> ")
-    if arrow >= 0:
+    if arrow >= 0 and is_boxed_function_type(functype):
+        return functype[arrow + 4:-1]
+    elif arrow >= 0:
         return functype[arrow + 4:]
     else:
         return functype
@@ -57,6 +94,17 @@ def load_and_import_module(name: str) -> object:
     IMPORTED_MODULES[name] = module
     return module
 
+def slice_type(typed: str, node: ast.Slice) -> str:
+    """
+    Given the type of a list or string, returns the type of a slice of
+    it. Contiguous slices borrow from the original. Slices with a step
+    iterate over it, except for strings, which must be collected.
+    """
+    if is_string(typed):
+        return "String" if node.step else "&str"
+    element = strip_container(typed)
+    return f"[{element}]" if node.step else f"&[{element}]"
+
 class VariableInfo:
     """
     Class that represents the declaration and usage of a variable.
@@ -66,6 +114,10 @@ class VariableInfo:
         self.mutable = False
         self.mutable_ref = False
         self.typed = typed
+        self.literal = None         # literal container assigned, if any
+        self.reads = 0
+        self.membership_reads = 0   # reads as the container in an "in" test
+        self.array_reads = 0        # reads that would also work on an array
 class VariableAnalyser(ast.NodeVisitor):
     """
     Visitor of the Python AST which analyses variable declaration
@@ -90,6 +142,9 @@ class VariableAnalyser(ast.NodeVisitor):
         self.need_predeclaring: Dict[str, VariableInfo] = {}
         self.current_type = ""
         self.in_call = False
+        self.borrowed_strings: Set[str] = set()
+        self.returns = ""
+        self.in_place_loops: Set[object] = set()
 
     def get_predeclared_vars(self) -> List[Tuple[str, str, str]]:
         """ 
@@ -114,6 +169,45 @@ class VariableAnalyser(ast.NodeVisitor):
         """
         return {v for (v, i) in self.vars.items() if i.mutable_ref}
 
+    def get_in_place_loops(self) -> Set[object]:
+        """
+        After running visit, this returns the for loops that change the
+        elements of a list or dict in place, such as
+        "for v in d.values(): v.append(x)".
+        """
+        return self.in_place_loops
+
+    def get_constant_containers(self) -> Dict[str, object]:
+        """
+        After running visit, this returns a map from variable name to
+        literal value, for those variables that are assigned a constant
+        literal container, never modified, and only read as the container
+        in "in" tests. Such variables need never be created: the tests
+        can be made against the literal values.
+        """
+        return {v: i.literal for (v, i) in self.vars.items()
+            if constant_elements(i.literal) is not None
+            and not i.mutable and not i.mutable_ref
+            and i.reads == i.membership_reads and v not in self.need_predeclaring}
+
+    def get_array_vars(self) -> Dict[str, str]:
+        """
+        After running visit, this returns a map from variable name to
+        Rust array type (such as "[i64; 4]") for those variables that
+        are assigned a literal list and never resized, and so can be
+        held in an array rather than a Vec.
+        """
+        arrays = {}
+        for (v, i) in self.vars.items():
+            if (not isinstance(i.literal, ast.List) or not i.literal.elts or
+                    i.mutable or i.reads != i.array_reads or
+                    v in self.need_predeclaring):
+                continue
+            element = container_type(strip_container(self.type_by_node[i.literal]))
+            if element and element != UNKNOWN_TYPE:
+                arrays[v] = f"[{element}; {len(i.literal.elts)}]"
+        return arrays
+
     def get_type_by_node(self) -> Dict[object, str]:
         """
         After running visit, this returns a map from AST node
@@ -157,6 +251,14 @@ class VariableAnalyser(ast.NodeVisitor):
             self.vars[var].mutable = True
         self.type_by_node[node] = typed
 
+    def array_read(self, node):
+        """
+        Note a read of a variable in a way that would work just as well
+        if the variable were a fixed-size array
+        """
+        if isinstance(node, ast.Name) and node.id in self.vars:
+            self.vars[node.id].array_reads += 1
+
     def enter_scope(self) -> Dict[str, VariableInfo]:
         return self.vars.copy()
 
@@ -207,6 +309,62 @@ class VariableAnalyser(ast.NodeVisitor):
         super().generic_visit(node)
         self.type_by_node[node] = self.current_type
 
+    def visit_FunctionDef(self, node):
+        self.borrowed_strings = find_borrowed_strings(node, static_functions(self.headers))
+        if node.returns is not None:
+            self.returns = type_from_annotation(node.returns, f"{node.name} return", True)
+        self.generic_visit(node)
+
+        # a method takes &mut self if it, or any other implementation
+        # of the same trait method, modifies self
+        if self.current_self and "self" in self.vars:
+            method = self.find_method(self.current_self, node.name)
+            if method and method.mutates_self:
+                self.vars["self"].mutable_ref = True
+
+    def find_method(self, class_type: str, name: str) -> FunctionHeader:
+        """
+        Returns the header of the named method of the given class or
+        any of its base classes, or None if we cannot find it.
+        """
+        if class_type not in self.class_headers:
+            return None
+        class_header = self.class_headers[class_type]
+        if name in class_header.methods:
+            return class_header.methods[name]
+        for base in class_header.bases:
+            method = self.find_method(base, name)
+            if method:
+                return method
+        return None
+
+    def is_mutating_call(self, var: str, name: str) -> bool:
+        """
+        Does invoking the named method on the given variable modify it?
+        Methods of our own classes modify the object if they assign to
+        self. Standard methods are classified by READ_ONLY_METHODS.
+        Anything we cannot find is assumed to modify the object.
+        """
+        typed = self.vars[var].typed
+        class_type = self.current_self if var == "self" else dereference(typed) if typed else ""
+        if class_type in self.class_headers:
+            method = self.find_method(class_type, name)
+            if method:
+                return method.mutates_self
+            return not is_function_type(self.field_type(var, name))
+        return not is_read_only_method(typed, name)
+
+    def field_type(self, var: str, name: str) -> str:
+        """
+        Returns the type of the named field of the given variable, if it
+        holds one of our own classes, or "" if not.
+        """
+        typed = self.vars[var].typed
+        class_type = self.current_self if var == "self" else dereference(typed) if typed else ""
+        if class_type not in self.class_headers:
+            return ""
+        return self.class_headers[class_type].instance_attributes.get(name, "")
+
     def visit_arg(self, node):
         typed = type_from_annotation(node.annotation, node.arg, False)
         if node.arg in self.vars:
@@ -233,18 +391,32 @@ class VariableAnalyser(ast.NodeVisitor):
 
         path = get_node_path(node)
         assert(len(path) > 1)   # otherwise this would just be visit_Name
+        if path[0] in NUMPY_MODULES:
+            self.set_type("", node)     # e.g. the annotation np.ndarray
+            return
+        if path == ["math", path[-1]] and path[-1] in MATH_CONSTANTS:
+            self.set_type("f64", node)
+            return
+        if (len(path) == 2 and path[1] == "shape" and path[0] in self.vars and
+                is_list(self.vars[path[0]].typed)):
+            self.set_type("(i64, i64)", node)     # a two dimensional numpy array
+            return
         variables = {}
+        owner = ""
         first = True
         for segment in path[:-1]:
             if segment == "self":
-                variables = self.class_headers[self.current_self].instance_attributes
+                owner = self.current_self
+                variables = self.class_headers[owner].instance_attributes
             elif first and segment in self.vars:
                 class_type = dereference(self.vars[segment].typed)
                 if class_type in self.class_headers:
+                    owner = class_type
                     variables = self.class_headers[class_type].instance_attributes
             elif segment in variables:
                 class_type = variables[segment]
                 if class_type in self.class_headers:
+                    owner = class_type
                     variables = self.class_headers[class_type].instance_attributes
             else:
                 # Could be module names, but we do not yet handle these
@@ -252,6 +424,9 @@ class VariableAnalyser(ast.NodeVisitor):
             first = False
         
         var_name = path[-1]
+        if (not isinstance(node.ctx, ast.Load) and owner in self.class_headers and
+                self.class_headers[owner].frozen):
+            raise Exception(f"Cannot assign to field {var_name} of frozen dataclass {owner}")
         if var_name in variables:
             typed = variables[var_name]
         else:
@@ -262,6 +437,8 @@ class VariableAnalyser(ast.NodeVisitor):
 
     def visit_Name(self, node):
         typed = self.read_access(node.id)
+        if isinstance(node.ctx, ast.Load) and node.id in self.vars:
+            self.vars[node.id].reads += 1
         self.set_type(typed, node)
 
     def visit_Call(self, node):
@@ -269,20 +446,60 @@ class VariableAnalyser(ast.NodeVisitor):
         Try to find the return type of the function we are calling.
         Also assign the right types to the args.
         """
-        # recurse through the arguments
+        # NormalDist(mu, sigma).cdf(x) has no simple path
+        dist = normal_dist(node)
+        if dist:
+            for a in dist.args + [k.value for k in dist.keywords] + node.args:
+                self.visit(a)
+            self.set_type("f64", node)
+            return
+
+        # recurse through the arguments. Lambdas passed to our own
+        # functions take their types from the callable they are passed as.
+        func_path = get_node_path(node.func)
+        params = []
+        if len(func_path) == 1 and func_path[0] in self.headers:
+            params = [typed for _, typed in self.headers[func_path[0]].args]
+        elif (len(func_path) == 1 and func_path[0] in self.class_headers and
+                "__init__" in self.class_headers[func_path[0]].methods):
+            params = [typed for _, typed in self.class_headers[func_path[0]].methods["__init__"].args[1:]]
         prev = self.current_type
         arg_types = []
-        for a in node.args:
-            self.visit(a)
+        for i, a in enumerate(node.args):
+            if isinstance(a, ast.Lambda) and i < len(params) and is_function_type(params[i]):
+                self.visit_Typed_Lambda(a, params[i])
+            else:
+                self.visit(a)
             arg_types.append(self.current_type)
         self.current_type = prev
 
         # a few functions are well-known (and in any case, they
         # do not behave properly with the below code)
-        func_path = get_node_path(node.func)
-        if func_path and len(func_path) == 1 and func_path[0] in STANDARD_FUNCTION_RETURNS:
+        if (len(func_path) == 1 and func_path[0] in ITERATING_FUNCTIONS and
+                (len(node.args) == 1 or func_path[0] == "sum")):
+            self.array_read(node.args[0])
+        if (func_path and len(func_path) == 1 and func_path[0] in STANDARD_FUNCTION_RETURNS and
+                func_path[0] not in self.headers):
             self.set_type(STANDARD_FUNCTION_RETURNS[func_path[0]](arg_types), node)
             return
+        if (len(func_path) == 2 and func_path[0] == "math" and
+                func_path[1] in STANDARD_FUNCTION_RETURNS):
+            for k in node.keywords:
+                self.visit(k.value)     # e.g. the tolerances of isclose
+            self.set_type(STANDARD_FUNCTION_RETURNS[func_path[1]](arg_types), node)
+            return
+        if is_statistics_call(node):
+            self.set_type("f64", node)
+            return
+        if is_random_call(node):
+            for k in node.keywords:
+                self.visit(k.value)
+            seed = RANDOM_HELPERS[func_path[1]][0] == "random_seed"
+            self.set_type("()" if seed else "f64", node)
+            return
+        if is_numpy_call(node):
+            self.set_type(self.numpy_return(node, arg_types), node)
+            return
 
         # Assume function names with no module are defined locally
         if len(func_path) == 1:
@@ -290,6 +507,8 @@ class VariableAnalyser(ast.NodeVisitor):
                 self.set_type(function_return(self.vars[func_path[0]].typed), node)
             elif func_path[0] in self.headers and len(func_path) == 1:
                 self.set_type(self.headers[func_path[0]].returns, node)
+            elif func_path[0] in self.class_headers:
+                self.set_type(func_path[0], node)   # constructor
             else:
                 print(f"Warning: cannot find function return for: {func_path[0]}",
                     file = sys.stderr)
@@ -305,12 +524,20 @@ class VariableAnalyser(ast.NodeVisitor):
             self.in_call = True
             self.visit(node.func)
             self.in_call = False
+            if func_path[1] in ARRAY_METHODS:
+                self.array_read(node.func.value)
             typed = method_return_type(self.current_type, func_path[1])
             self.set_type(typed, node)
 
-            # for now, we assume that any method invoked on an object can
-            # mutate that object
-            self.vars[func_path[0]].mutable_ref = True
+            # a closure held in a field, rather than a method
+            field = self.field_type(func_path[0], func_path[1])
+            if is_function_type(field):
+                self.type_by_node[node.func] = field
+                self.set_type(function_return(field), node)
+
+            # only methods that modify the object need a mutable reference
+            if self.is_mutating_call(func_path[0], func_path[1]):
+                self.vars[func_path[0]].mutable_ref = True
             return
 
         # Locate the function. In order to do this, we actually load
@@ -328,6 +555,37 @@ class VariableAnalyser(ast.NodeVisitor):
             typed = type_from_annotation(types["return"],func_name, True)
             self.set_type(typed, node)
 
+    def numpy_return(self, node, arg_types: List[str]) -> str:
+        """
+        Returns the type of a call to a numpy function. Functions such
+        as np.exp act on each element of an array, but on a plain float
+        just return a float.
+        """
+        name = node.func.attr
+        if name in NUMPY_ELEMENTWISE_FUNCTIONS:
+            arrays = any(is_list(self.type_by_node.get(n) or " ")
+                for arg in node.args for n in ast.walk(arg))
+            return "Vec<f64>" if arrays else "f64"
+        return NUMPY_FUNCTION_RETURNS[name](arg_types)
+
+    def visit_Typed_Lambda(self, node, typed: str):
+        """
+        Not part of the visitor pattern. Visits a lambda being passed
+        as a callable of the given type, such as "impl Fn(f64) -> f64",
+        so its arguments have known types within its body.
+        """
+        hidden = {a.arg: self.vars.get(a.arg) for a in node.args.args}
+        for a, arg_type in zip(node.args.args, function_arg_types(typed)):
+            self.vars[a.arg] = VariableInfo(True, arg_type)
+            self.type_by_node[a] = arg_type
+        self.visit(node.body)
+        for name, info in hidden.items():
+            if info:
+                self.vars[name] = info
+            elif name in self.vars:
+                del self.vars[name]
+        self.set_type(typed, node)
+
     def visit_Raise(self, node):
         """
         Ignore any types within a raise command. In practice, we just raise strings
@@ -337,8 +595,13 @@ class VariableAnalyser(ast.NodeVisitor):
 
     def visit_Return(self, node):
         """
-        We always return a contained type
+        We always return a contained type. A returned lambda takes its
+        types from the return type.
         """
+        if isinstance(node.value, ast.Lambda) and is_function_type(self.returns):
+            self.visit_Typed_Lambda(node.value, self.returns)
+            self.set_type(self.returns, node)
+            return
         self.generic_visit(node)
         self.set_type_container(node)
 
@@ -403,14 +666,27 @@ class VariableAnalyser(ast.NodeVisitor):
 
         self.visit(node.slice)      # the integer type of the index
         self.visit(node.value)      # the name of the variable
+        if not isinstance(node.ctx, ast.Del):
+            self.array_read(node.value)
+
+        if isinstance(node.slice, ast.Slice):
+            self.set_type(slice_type(self.current_type, node.slice), node)
+            return
 
-        types = strip_container(self.current_type).split(", ")
+        container = self.current_type
+        if matrix_indices(node) is not None and node.value is matrix_indices(node)[0]:
+            container = strip_container(container)      # a[i, j] of a two dimensional array
+        types = strip_container(container).split(", ")
         try:
             index = ast.literal_eval(node.slice)
         except:
             index = 0   # if the index is not constant, just use the first
+        if not isinstance(index, int):
+            index = 0
 
-        self.set_type(f"&{types[index]}", node)
+        # indexing a list of Copy types, such as a[i] for Vec<f64>, copies the value
+        element = types[index]
+        self.set_type(element if is_copy_type(element) else f"&{element}", node)
 
     def visit_BinOp(self, node):
         """
@@ -425,6 +701,13 @@ class VariableAnalyser(ast.NodeVisitor):
         # special handling for integer / integer division. Python always returns float
         if isinstance(node.op, ast.Div) and self.current_type == "i64" and left == "i64":
             self.set_type("f64", node)
+
+        # a list combined with a scalar, such as [0.0] * n or a * 2.0,
+        # gives a list of the same type
+        elif left and is_list(left) and is_copy_type(self.current_type):
+            self.set_type(left, node)
+        elif self.current_type and is_list(self.current_type) and is_copy_type(left):
+            self.set_type(self.current_type, node)
         else:
             self.merge_type(left, node)
 
@@ -456,8 +739,12 @@ class VariableAnalyser(ast.NodeVisitor):
         # the result of a comparison is always a bool, regardless of
         # the contained values
         self.visit(node.left)
-        for comparator in node.comparators:
+        for op, comparator in zip(node.ops, node.comparators):
             self.visit(comparator)
+            if (isinstance(op, (ast.In, ast.NotIn)) and
+                    isinstance(comparator, ast.Name) and comparator.id in self.vars):
+                self.vars[comparator.id].membership_reads += 1
+                self.vars[comparator.id].array_reads += 1
         self.set_type("bool", node)
 
     def visit_IfExp(self, node):
@@ -494,12 +781,33 @@ class VariableAnalyser(ast.NodeVisitor):
         # the iterator should return some kind of container or iterator
         # type over the type of the target, a kind of repeated assignment
         self.visit(node.iter)
+        self.array_read(node.iter)
         typed = strip_container(self.current_type)
+        # the loop declares its own targets, so reusing the name of a
+        # variable from an earlier loop does not need it predeclaring
+        predeclared = set(self.need_predeclaring)
         self.handle_assignment(node.target, typed)
+        reused = {}
+        for n in ast.walk(node.target):
+            if isinstance(n, ast.Name) and n.id in self.out_of_scope:
+                if n.id not in predeclared:
+                    self.need_predeclaring.pop(n.id, None)
+                reused[n.id] = self.out_of_scope.pop(n.id)
         prev = self.enter_scope()
         for line in node.body:
             self.visit(line)
+
+        # a method changing an element, such as v.append(x), changes it
+        # in the container, unless the name is first bound to another
+        element, container = elements_iterated(node)
+        rebound = any(isinstance(n, ast.Name) and n.id == element and
+            not isinstance(n.ctx, ast.Load) for line in node.body for n in ast.walk(line))
+        if (element in self.vars and self.vars[element].mutable_ref and not rebound and
+                container in self.vars):
+            self.vars[container].mutable_ref = True
+            self.in_place_loops.add(node)
         self.exit_scope(prev)
+        self.out_of_scope.update(reused)
     
     def visit_ListComp(self, node):
         for generator in node.generators:
@@ -507,6 +815,12 @@ class VariableAnalyser(ast.NodeVisitor):
         self.visit(node.elt)
         self.set_type(f"&[{self.current_type}]", node)
 
+    def visit_GeneratorExp(self, node):
+        for generator in node.generators:
+            self.visit(generator)
+        self.visit(node.elt)
+        self.set_type(f"[{self.current_type}]", node)
+
     def visit_SetComp(self, node):
         for generator in node.generators:
             self.visit(generator)
@@ -540,12 +854,20 @@ class VariableAnalyser(ast.NodeVisitor):
         self.visit(node.value)
         for target in node.targets:
             self.handle_assignment(target, self.current_type)
+
+        # remember literal containers, which may not need creating
+        if (len(node.targets) == 1 and isinstance(node.targets[0], ast.Name) and
+                isinstance(node.value, (ast.List, ast.Tuple, ast.Set, ast.Dict))):
+            self.vars[node.targets[0].id].literal = node.value
         
     def handle_assignment(self, target, typed: str):
 
-        # May just be a single variable to assign
+        # May just be a single variable to assign. Strings are copied
+        # into a String, unless they can be borrowed.
         if isinstance(target, ast.Name):
-            self.write_access(target.id, container_type(typed), target)
+            if typed != "&str" or target.id not in self.borrowed_strings:
+                typed = container_type(typed)
+            self.write_access(target.id, typed, target)
 
         # May be a tuple. e.g. a, b = foo()
         elif isinstance(target, ast.Tuple):
@@ -557,10 +879,13 @@ class VariableAnalyser(ast.NodeVisitor):
             for e, subtype in zip(target.elts, subtypes):
                 self.handle_assignment(e, subtype)
         
-        # May be a Subscript. E.g. foo[0] = bar. Ensure the variable
-        # is mutable reference
+        # May be a Subscript. E.g. foo[0] = bar or foo[0][1] = bar. Ensure
+        # the variable is mutable reference
         elif isinstance(target, ast.Subscript):
-            container = target.value.id
+            container = target.value
+            while isinstance(container, ast.Subscript):
+                container = container.value
+            container = container.id
             self.vars[container].mutable_ref = True
             self.visit(target)
         
@@ -586,6 +911,11 @@ class VariableAnalyser(ast.NodeVisitor):
         typed = self.current_type
         self.set_type(typed, node.target)
         self.visit(node.value)
+
+        # lists are updated in place, element by element
+        if isinstance(node.target, ast.Name) and typed and is_list(typed):
+            self.vars[node.target.id].mutable_ref = True
+            return
         self.handle_assignment(node.target, typed)
 
 class TestTreePrinter(ast.NodeVisitor):
@@ -678,3 +1008,8 @@ if __name__ == "__main__":
     test_analyser("dictionaries")
     test_analyser("classes")
     test_analyser("traits")
+    test_analyser("generators")
+    test_analyser("numpy_arrays")
+    test_analyser("reductions")
+    test_analyser("maths")
+    test_analyser("monte_carlo")
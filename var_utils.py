@@ -34,8 +34,13 @@ TYPE_MAPPING = {
     "long": "i64",
     "float": "f64",
     "str": "&str",
+    "ndarray": "&[f64]",    # numpy arrays of floats
 }
 
+# Rust types that are Copy, so can be used any number of times
+# without being moved or cloned
+COPY_TYPES = { "bool", "i64", "f64" }
+
 CONTAINER_CONVERSIONS = {
     "&str": ".to_string()",
     "&String": ".clone()"
@@ -101,6 +106,12 @@ def is_int(text: str) -> bool:
     """
     return text == "i64"
 
+def is_copy_type(text: str) -> bool:
+    """
+    Does the given type represent a Copy type?
+    """
+    return text in COPY_TYPES
+
 def is_list(text: str) -> bool:
     """
     Does the given type represent a list?
@@ -119,6 +130,37 @@ def is_reference_type(text: str) -> bool:
     """
     return text[0] == "&"
 
+def is_function_type(text: str) -> bool:
+    """
+    Does the given type represent a function or closure, such as
+    "impl Fn(f64) -> f64" or "Box<dyn Fn(f64) -> f64>"?
+    """
+    return text.startswith("impl Fn(") or is_boxed_function_type(text)
+
+def is_boxed_function_type(text: str) -> bool:
+    """
+    Does the given type represent a closure held in a container or
+    struct, such as "Box<dyn Fn(f64) -> f64>"?
+    """
+    return text.startswith("Box<dyn Fn(")
+
+def boxed_function_type(text: str) -> str:
+    """
+    Given a function type such as "impl Fn(f64) -> f64", returns the
+    type that holds it in a struct, "Box<dyn Fn(f64) -> f64>".
+    """
+    if text.startswith("impl Fn("):
+        return f"Box<dyn {text[len('impl '):]}>"
+    return text
+
+def function_arg_types(text: str) -> List[str]:
+    """
+    Given a function type such as "impl Fn(i64, f64) -> f64", returns
+    the types of its arguments.
+    """
+    args = text[text.find("Fn(") + len("Fn("):text.find(") -> ")]
+    return args.split(", ") if args else []
+
 def is_iterator_type(text: str) -> bool:
     """
     Does the given type represent an iterator?
@@ -126,6 +168,35 @@ def is_iterator_type(text: str) -> bool:
     # TODO we need much tidier handling of iterators
     return text[0] == "["
 
+def constant_elements(node) -> List[ast.Constant]:
+    """
+    If the given node is a literal list, tuple or set (or dict, whose
+    keys are its elements for membership) and every element is a
+    constant of the same Python type, return the elements. Otherwise
+    return None.
+    """
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        elements = node.elts
+    elif isinstance(node, ast.Dict):
+        elements = node.keys
+    else:
+        return None
+
+    if not all(isinstance(e, ast.Constant) and e.value is not None for e in elements):
+        return None
+    if len({type(e.value) for e in elements}) > 1:
+        return None
+    return elements
+
+def constant_bound(node) -> bool:
+    """
+    Is this bound of a slice a constant, such as 2, or a negative
+    constant, such as -1?
+    """
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        node = node.operand
+    return isinstance(node, ast.Constant)
+
 def numeric_type(node: ast.Num) -> str:
     python_type = type(node.n).__name__
     if python_type == 'int' or python_type == 'long':
@@ -146,6 +217,8 @@ def type_from_annotation(annotation, arg: str, container: bool) -> str:
         id = annotation
     elif isinstance(annotation, ast.Name):
         id = annotation.id
+    elif isinstance(annotation, ast.Attribute):
+        id = annotation.attr    # e.g. np.ndarray
     elif isinstance(annotation, type):
         id = annotation.__name__
     elif isinstance(annotation, ast.Subscript):
@@ -190,7 +263,9 @@ def type_from_subscript(annotation: ast.Subscript, arg: str, container: bool) ->
     elif outer_type == "Dict":
         start, end = "HashMap<", ">"
     elif outer_type == "Callable":
-        return type_from_function_call(annotation, arg)
+        return type_from_function_call(annotation, arg, container)
+    elif outer_type in ("Iterator", "Iterable", "Generator"):
+        return type_from_iterator(annotation, arg)
     else:
         start, end = "<unknown>", "</unknown>"
 
@@ -211,15 +286,32 @@ def type_from_subscript(annotation: ast.Subscript, arg: str, container: bool) ->
     result = f"{start}{types}{end}"
     return container_type(result) if container else result
 
-def type_from_function_call(annotation: ast.Subscript, arg: str) -> str:
+def type_from_iterator(annotation: ast.Subscript, arg: str) -> str:
+    """
+    Iterators are represented as [T], whether they are passed as args
+    or returned. Generator also gives the types sent to and returned by
+    the generator, which we ignore.
+    """
     type_def = annotation.slice.value
     if isinstance(type_def, ast.Tuple):
-        type_str = [type_from_annotation(e, arg, False)
-            for e in type_def.elts]
-        if len(type_str) == 2:
-            return f"&dyn Fn({type_str[0]}) -> {type_str[1]}"
+        type_def = type_def.elts[0]
+    return f"[{type_from_annotation(type_def, arg, True)}]"
 
-    return "Fn() -> Unknown"
+def type_from_function_call(annotation: ast.Subscript, arg: str, container: bool) -> str:
+    """
+    Callables are passed as generic closures, impl Fn(A) -> R, rather
+    than as &dyn Fn(A) -> R, so each call can be inlined. A struct
+    field or container element cannot have a generic type, so it holds
+    a Box<dyn Fn(A) -> R> instead, as does a return value.
+    """
+    type_def = annotation.slice.value
+    if (not isinstance(type_def, ast.Tuple) or len(type_def.elts) != 2 or
+            not isinstance(type_def.elts[0], ast.List)):
+        raise Exception(f"Callable for '{arg}' must give its argument types and return type")
+    args, returns = [type_from_annotation(e, arg, False) for e in type_def.elts]
+    if container:
+        return f"Box<dyn Fn({args}) -> {returns}>"
+    return f"impl Fn({args}) -> {returns}"
 
 def merge_types(current_type: str, typed: str) -> str:
     if not typed: